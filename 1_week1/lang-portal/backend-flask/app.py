@@ -1,13 +1,22 @@
+import atexit
+
 from flask import Flask, g
 from flask_cors import CORS
 
+from lib.cache import ResultCache
 from lib.db import Db
+from lib.encoding import json_provider
+from lib.languages import LANGUAGES, Databases
+from lib import migrations
+from lib.profiler import SqlProfiler
+from lib.review_buffer import ReviewBuffer
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
+import routes.debug
 
 def get_allowed_origins(app):
     try:
@@ -28,18 +37,95 @@ def get_allowed_origins(app):
     except:
         return ["*"]  # Fallback to allow all origins if there's an error
 
-def create_app(test_config=None):
+# Serve every route under /<lang>/... too, e.g. /fr/words, with the same view.
+# The debug routes cover the whole process and are left alone.
+def add_language_routes(app):
+    codes = ','.join(db.language.code for db in app.db)
+    for rule in list(app.url_map.iter_rules()):
+        if rule.endpoint == 'static' or rule.rule.startswith('/_debug'):
+            continue
+        app.add_url_rule(
+            f'/<any({codes}):lang>{rule.rule}',
+            endpoint=rule.endpoint,
+            view_func=app.view_functions[rule.endpoint],
+            methods=rule.methods - {'HEAD', 'OPTIONS'}
+        )
+
+def create_app(test_config=None, migrate=True):
     app = Flask(__name__)
     
-    if test_config is None:
-        app.config.from_mapping(
-            DATABASE='words.db'
-        )
-    else:
+    app.config.from_mapping(
+        DATABASE='words.db',
+        LANGUAGE='ja',  # Language of DATABASE, see lib.languages
+        LANGUAGE_DATABASES={},  # More languages served under /<code>/..., e.g. {"fr": "french.db"}
+        DB_POOL_SIZE=8,  # Max open connections per process
+        DB_POOL_TIMEOUT=5.0,  # Seconds to wait for a free connection
+        DB_PRAGMAS={},  # Overrides for lib.db.DEFAULT_PRAGMAS
+        MIGRATIONS='check',  # At boot: 'check' (fail on pending migrations), 'apply' or 'off'
+        REVIEW_BUFFER_ENABLED=False,  # Queue review inserts and group-commit them
+        REVIEW_BUFFER_FLUSH_MS=50,  # Longest a review waits in the queue
+        REVIEW_BUFFER_MAX_ROWS=500,  # Flush early once this many reviews wait
+        REVIEW_BUFFER_DURABILITY='sync',  # 'sync' or 'buffered', see lib.review_buffer
+        REVIEW_BUFFER_WAIT_SECONDS=10.0,  # Longest a 'sync' review request waits for its commit
+        RESULT_CACHE_MAX_ENTRIES=256,  # Cached route responses, 0 turns the cache off
+        RESULT_CACHE_TTL=60.0,  # Seconds a cached response is served at most
+        DEBUG_ENDPOINTS=False,  # Serve the /_debug/* introspection routes
+        SQL_PROFILING=False,  # Time every query, see lib.profiler
+        SQL_SLOW_MS=100,  # Log queries slower than this with their query plan
+        JSON_ENCODER='auto'  # 'orjson', 'stdlib' or 'auto' (orjson if installed)
+    )
+    # Deployments configure the app through LANG_PORTAL_* environment
+    # variables, e.g. LANG_PORTAL_DATABASE=/srv/words.db (values parsed as JSON)
+    app.config.from_prefixed_env('LANG_PORTAL')
+    if test_config is not None:
         app.config.update(test_config)
     
-    # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
+    # Response encoder used by jsonify()
+    app.json = json_provider(app, app.config['JSON_ENCODER'])
+    
+    # Initialize database first since we need it for CORS configuration.
+    # Every language has its own database and connection pool; app.db
+    # forwards to the one of the language of the request.
+    databases = {app.config['LANGUAGE']: app.config['DATABASE']}
+    databases.update(app.config['LANGUAGE_DATABASES'])
+    app.db = Databases({
+        code: Db(
+            database=database,
+            pool_size=app.config['DB_POOL_SIZE'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pragmas=app.config['DB_PRAGMAS'],
+            language=LANGUAGES[code]
+        )
+        for code, database in databases.items()
+    }, app.config['LANGUAGE'])
+    
+    # Optional per-request query profiling
+    if app.config['SQL_PROFILING']:
+        profiler = SqlProfiler(slow_ms=app.config['SQL_SLOW_MS'])
+        profiler.init_app(app)
+        for db in app.db:
+            db.profiler = profiler
+    
+    # Cache of near-static route responses, emptied by the commits that
+    # change what they read
+    app.result_cache = ResultCache(
+        max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+        ttl=app.config['RESULT_CACHE_TTL']
+    )
+    app.db.on_commit(app.result_cache.invalidate)
+    
+    # Optional write-behind buffer for review inserts, one per language
+    # database, drained on shutdown
+    if app.config['REVIEW_BUFFER_ENABLED']:
+        for db in app.db:
+            db.review_buffer = ReviewBuffer(
+                db,
+                flush_interval_ms=app.config['REVIEW_BUFFER_FLUSH_MS'],
+                max_rows=app.config['REVIEW_BUFFER_MAX_ROWS'],
+                durability=app.config['REVIEW_BUFFER_DURABILITY'],
+                wait_timeout=app.config['REVIEW_BUFFER_WAIT_SECONDS']
+            )
+            atexit.register(db.review_buffer.close)
     
     # Get allowed origins from study_activities table
     allowed_origins = get_allowed_origins(app)
@@ -57,21 +143,58 @@ def create_app(test_config=None):
         }
     })
 
-    # Close database connection
+    # Return the database connections to their pools
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
 
+    # /<lang>/... picks the database of the request, see lib.languages
+    @app.url_value_preprocessor
+    def pick_language(endpoint, values):
+        if values and 'lang' in values:
+            g.language = values.pop('lang')
+
     # load routes -----------
     routes.words.load(app)
     routes.groups.load(app)
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
+    if app.config['DEBUG_ENDPOINTS']:
+        routes.debug.load(app)
+    add_language_routes(app)
+
+    # Prepare every registered statement once, so broken SQL fails at boot
+    for db in app.db:
+        db.statements.check()
+
+    if app.config['MIGRATIONS'] not in ('check', 'apply', 'off'):
+        raise ValueError(f"Unknown MIGRATIONS {app.config['MIGRATIONS']!r}, expected check, apply or off")
+    if migrate:
+        migrate_databases(app)
     
     return app
 
-app = create_app()
+# Make sure every database is on the schema the code expects: with
+# MIGRATIONS='check' raise MigrationError on pending migrations, with 'apply'
+# apply them
+def migrate_databases(app):
+    if app.config['MIGRATIONS'] == 'off':
+        return
+    with app.app_context():
+        for db in app.db:
+            if app.config['MIGRATIONS'] == 'apply':
+                db.migrate(db.cursor())
+            else:
+                migrations.check(db, db.cursor())
+
+# Importing the module must not depend on the state of whatever database the
+# current directory holds (tests and the bench import create_app from here),
+# so the serving entry points run the migrations check: the development
+# server below and post_worker_init in gunicorn.conf.py
+app = create_app(migrate=False)
 
+# Development server only, see gunicorn.conf.py for serving in production
 if __name__ == '__main__':
+    migrate_databases(app)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1 @@
+# Synthetic load benchmark for the lang-portal API, see bench/__main__.py
@@ -0,0 +1,118 @@
+import argparse
+import json
+import sys
+
+from bench import datagen, driver, encode
+
+# Usage (from backend-flask):
+#
+#   python -m bench generate bench.db --words 100000 --reviews 1000000
+#   python -m bench run bench.db --mode server --concurrency 8 --out before.json
+#   python -m bench scale bench.db --workers 1 2 4 8 --out scaling.json
+#   python -m bench encode bench.db --sizes 50 500 5000
+#
+# Compare the JSON reports of two commits to see what a change did.
+
+def parse_config(values):
+  config = {}
+  for value in values:
+    key, _, raw = value.partition('=')
+    try:
+      config[key] = json.loads(raw)
+    except ValueError:
+      config[key] = raw
+  return config
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m bench')
+  commands = parser.add_subparsers(dest='command', required=True)
+
+  generate = commands.add_parser('generate', help='build a synthetic database')
+  generate.add_argument('path')
+  generate.add_argument('--words', type=int, default=10000)
+  generate.add_argument('--groups', type=int, default=20)
+  generate.add_argument('--sessions', type=int, default=2000)
+  generate.add_argument('--reviews', type=int, default=50000)
+  generate.add_argument('--days', type=int, default=90, help='history length in days')
+  generate.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of word and group popularity')
+  generate.add_argument('--seed', type=int, default=42)
+
+  run = commands.add_parser('run', help='benchmark every route against a database')
+  run.add_argument('database')
+  run.add_argument('--mode', choices=sorted(driver.TRANSPORTS), default='client')
+  run.add_argument('--concurrency', type=int, default=4)
+  run.add_argument('--requests', type=int, default=200, help='requests per route')
+  run.add_argument('--warmup', type=int, default=10, help='untimed requests per route')
+  run.add_argument('--seed', type=int, default=42)
+  run.add_argument('--route', action='append', help='only this route rule (repeatable)')
+  run.add_argument('--config', action='append', default=[], metavar='KEY=VALUE', help='app config override, VALUE parsed as JSON')
+  run.add_argument('--workers', type=int, default=1, help='gunicorn worker processes (mode gunicorn)')
+  run.add_argument('--out', help='write the report here instead of stdout')
+
+  scale = commands.add_parser('scale', help='compare throughput on gunicorn across worker counts')
+  scale.add_argument('database')
+  scale.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+  scale.add_argument('--concurrency-per-worker', type=int, default=4)
+  scale.add_argument('--requests', type=int, default=200, help='requests per route')
+  scale.add_argument('--warmup', type=int, default=10, help='untimed requests per route')
+  scale.add_argument('--seed', type=int, default=42)
+  scale.add_argument('--route', action='append', help='only this route rule (repeatable)')
+  scale.add_argument('--config', action='append', default=[], metavar='KEY=VALUE', help='app config override, VALUE parsed as JSON')
+  scale.add_argument('--out', help='write the report here instead of stdout')
+
+  encoding = commands.add_parser('encode', help='time serializing /words pages with each JSON encoder')
+  encoding.add_argument('database')
+  encoding.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000], help='rows per page')
+  encoding.add_argument('--seconds', type=float, default=0.5, help='time spent per encoder and size')
+  encoding.add_argument('--out', help='write the report here instead of stdout')
+
+  args = parser.parse_args(argv)
+
+  if args.command == 'generate':
+    result = datagen.generate(
+      args.path,
+      words=args.words,
+      groups=args.groups,
+      sessions=args.sessions,
+      reviews=args.reviews,
+      days=args.days,
+      seed=args.seed,
+      skew=args.skew
+    )
+    print(json.dumps(result), file=sys.stderr)
+    return
+
+  if args.command == 'encode':
+    report = encode.run(args.database, sizes=args.sizes, seconds=args.seconds)
+  elif args.command == 'scale':
+    report = driver.scale(
+      args.database,
+      workers=args.workers,
+      concurrency_per_worker=args.concurrency_per_worker,
+      requests_per_route=args.requests,
+      warmup=args.warmup,
+      seed=args.seed,
+      config=parse_config(args.config),
+      routes=args.route
+    )
+  else:
+    report = driver.run(
+      args.database,
+      mode=args.mode,
+      concurrency=args.concurrency,
+      requests_per_route=args.requests,
+      warmup=args.warmup,
+      seed=args.seed,
+      config=parse_config(args.config),
+      routes=args.route,
+      workers=args.workers
+    )
+  output = json.dumps(report, indent=2)
+  if args.out:
+    with open(args.out, 'w') as file:
+      file.write(output + '\n')
+  else:
+    print(output)
+
+if __name__ == '__main__':
+  main()
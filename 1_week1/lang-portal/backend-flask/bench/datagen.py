@@ -0,0 +1,116 @@
+import itertools
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask
+
+from lib.db import Db
+from lib.languages import LANGUAGES
+
+# Build a SQLite file with the real schema and synthetic data of a given size.
+#
+# The data is skewed the way real usage is: a few groups get most of the
+# study sessions, sessions cluster on recent days, a small share of the words
+# gets most of the reviews (Zipf) and every word has its own difficulty. The
+# same seed always gives the same database.
+
+BATCH_SIZE = 10000
+
+# The text fields (and parts, for languages that have them) of word i, in the
+# order of Language.word_fields
+WORD_ROWS = {
+  'ja': lambda i: (f'漢{i}字', f'kanji{i}', f'word {i}', json.dumps([{'kanji': '漢', 'romaji': ['kan']}])),
+  'fr': lambda i: (f'mot{i}', f'word {i}')
+}
+
+def zipf_weights(count, exponent):
+  return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def batched(rows, size=BATCH_SIZE):
+  rows = iter(rows)
+  while True:
+    batch = list(itertools.islice(rows, size))
+    if not batch:
+      return
+    yield batch
+
+def generate(path, words=10000, groups=20, sessions=2000, reviews=50000, days=90, seed=42, skew=1.1, language=LANGUAGES['ja']):
+  if os.path.exists(path):
+    raise FileExistsError(f'{path} already exists')
+
+  rng = random.Random(seed)
+  app = Flask(__name__)
+  db = Db(path, language=language)
+  now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+  with app.app_context():
+    cursor = db.cursor()
+    db.setup_tables(cursor)
+    db.migrate(cursor)
+
+    cursor.executemany(
+      'INSERT INTO study_activities (name, url, preview_url) VALUES (?, ?, ?)',
+      [
+        ('Typing Tutor', 'http://localhost:8080', '/assets/study_activities/typing-tutor.png'),
+        ('Flashcards', 'http://localhost:8081', None),
+        ('Listening Practice', 'http://localhost:8082', None)
+      ]
+    )
+
+    columns = list(language.word_fields) + (['parts'] if language.parts else [])
+    insert_word = f'INSERT INTO words ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})'
+    for batch in batched(WORD_ROWS[language.code](i) for i in range(words)):
+      cursor.executemany(insert_word, batch)
+
+    # Every word is in one group, a tenth of them in a second one
+    cursor.executemany('INSERT INTO groups (name) VALUES (?)', [(f'Group {i + 1}',) for i in range(groups)])
+    memberships = {(word_id, (word_id - 1) % groups + 1) for word_id in range(1, words + 1)}
+    memberships.update(
+      (word_id, rng.randint(1, groups))
+      for word_id in rng.sample(range(1, words + 1), words // 10)
+    )
+    for batch in batched(sorted(memberships)):
+      cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', batch)
+
+    # Sessions: popular groups first, more of them on recent days
+    group_weights = zipf_weights(groups, skew)
+    session_times = sorted(
+      now - timedelta(days=min(rng.expovariate(3 / days), days), seconds=rng.randint(0, 86399))
+      for _ in range(sessions)
+    )
+    cursor.executemany(
+      'INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (?, ?, ?)',
+      [
+        (rng.choices(range(1, groups + 1), cum_weights=group_weights)[0], rng.randint(1, 3), created_at.strftime('%Y-%m-%d %H:%M:%S'))
+        for created_at in session_times
+      ]
+    )
+
+    # Reviews: Zipf over the words, each word with its own chance of being right
+    word_weights = zipf_weights(words, skew)
+    word_ids = list(range(1, words + 1))
+    rng.shuffle(word_ids)
+    difficulty = [rng.betavariate(5, 2) for _ in range(words + 1)]
+
+    def review_rows():
+      for _ in range(reviews):
+        word_id = rng.choices(word_ids, cum_weights=word_weights)[0]
+        session_id = rng.randint(1, sessions)
+        created_at = session_times[session_id - 1] + timedelta(seconds=rng.randint(0, 1800))
+        yield (word_id, session_id, rng.random() < difficulty[word_id], created_at.strftime('%Y-%m-%d %H:%M:%S'))
+
+    for batch in batched(review_rows()):
+      cursor.executemany(
+        'INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES (?, ?, ?, ?)',
+        batch
+      )
+
+    db.commit()
+    cursor.execute('ANALYZE')
+    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    db.close()
+  db.pool.close()
+
+  return {'words': words, 'groups': groups, 'sessions': sessions, 'reviews': reviews, 'days': days, 'seed': seed}
@@ -0,0 +1,374 @@
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from bench import datagen
+from lib.languages import LANGUAGES
+
+# Drive every route of the API against a database built by bench.datagen and
+# report latency percentiles and throughput per route.
+#
+# Requests go either through the Flask test client (mode 'client', measures
+# the app alone), over HTTP to a threaded WSGI server on a free local port
+# (mode 'server') or over HTTP to gunicorn with gunicorn.conf.py and a given
+# number of worker processes (mode 'gunicorn'). The database is copied first,
+# so the writes a run makes never change the input of the next run.
+
+# Routes that are not benchmarked, and why
+SKIPPED_ROUTES = {
+  ('POST', '/api/study-sessions/reset'): 'deletes the study history',
+}
+
+# (method, rule) -> request(rng, ids) returning (path, json body or None).
+# ids holds the row counts of the database to draw ids from.
+SCENARIOS = {
+  ('GET', '/words'): lambda rng, ids: (
+    f'/words?page={rng.randint(1, max(1, ids["words"] // 50))}&sort_by={rng.choice(["kanji", "romaji", "english", "correct_count"])}', None),
+  ('GET', '/words/search'): lambda rng, ids: (f'/words/search?q=kanji{rng.randint(1, 99)}', None),
+  ('GET', '/words/<int:word_id>'): lambda rng, ids: (f'/words/{rng.randint(1, ids["words"])}', None),
+  ('GET', '/groups'): lambda rng, ids: ('/groups', None),
+  ('GET', '/groups/<int:id>'): lambda rng, ids: (f'/groups/{rng.randint(1, ids["groups"])}', None),
+  ('GET', '/groups/<int:id>/words'): lambda rng, ids: (f'/groups/{rng.randint(1, ids["groups"])}/words', None),
+  ('GET', '/groups/<int:id>/words/raw'): lambda rng, ids: (f'/groups/{rng.randint(1, ids["groups"])}/words/raw', None),
+  ('GET', '/groups/<int:id>/due'): lambda rng, ids: (f'/groups/{rng.randint(1, ids["groups"])}/due?limit=20', None),
+  ('GET', '/groups/<int:id>/study_sessions'): lambda rng, ids: (f'/groups/{rng.randint(1, ids["groups"])}/study_sessions', None),
+  ('GET', '/api/study-activities'): lambda rng, ids: ('/api/study-activities', None),
+  ('GET', '/api/study-activities/<int:id>'): lambda rng, ids: (f'/api/study-activities/{rng.randint(1, ids["study_activities"])}', None),
+  ('GET', '/api/study-activities/<int:id>/sessions'): lambda rng, ids: (f'/api/study-activities/{rng.randint(1, ids["study_activities"])}/sessions', None),
+  ('GET', '/api/study-activities/<int:id>/launch'): lambda rng, ids: (f'/api/study-activities/{rng.randint(1, ids["study_activities"])}/launch', None),
+  ('GET', '/api/study-sessions'): lambda rng, ids: (f'/api/study-sessions?page={rng.randint(1, 5)}', None),
+  ('GET', '/api/study-sessions/<id>'): lambda rng, ids: (f'/api/study-sessions/{rng.randint(1, ids["study_sessions"])}', None),
+  ('POST', '/api/study-sessions'): lambda rng, ids: (
+    '/api/study-sessions', {'group_id': rng.randint(1, ids['groups']), 'study_activity_id': rng.randint(1, ids['study_activities'])}),
+  ('POST', '/api/study-sessions/<id>/review'): lambda rng, ids: (
+    f'/api/study-sessions/{rng.randint(1, ids["study_sessions"])}/review', {'word_id': rng.randint(1, ids['words']), 'correct': rng.random() < 0.7}),
+  ('POST', '/api/study-sessions/<int:id>/reviews'): lambda rng, ids: (
+    f'/api/study-sessions/{rng.randint(1, ids["study_sessions"])}/reviews',
+    [{'word_id': rng.randint(1, ids['words']), 'correct': rng.random() < 0.7} for _ in range(20)]),
+  ('GET', '/dashboard/recent-session'): lambda rng, ids: ('/dashboard/recent-session', None),
+  ('GET', '/dashboard/stats'): lambda rng, ids: ('/dashboard/stats', None),
+}
+
+# The /<lang>/... copies of the routes run the same views, each against the
+# connection pool of its language. These run under /fr against a French
+# database generated with the row counts of the benchmarked one.
+BENCH_LANGUAGE = 'fr'
+LANGUAGE_SCENARIOS = {
+  ('GET', '/words'): lambda rng, ids: (
+    f'/words?page={rng.randint(1, max(1, ids["words"] // 50))}&sort_by={rng.choice(["french", "english", "correct_count"])}', None),
+  ('GET', '/groups/<int:id>/words'): SCENARIOS[('GET', '/groups/<int:id>/words')],
+  ('POST', '/api/study-sessions/<id>/review'): SCENARIOS[('POST', '/api/study-sessions/<id>/review')],
+  ('GET', '/dashboard/stats'): SCENARIOS[('GET', '/dashboard/stats')],
+}
+
+def language_scenario(scenario, code):
+  def request(rng, ids):
+    path, body = scenario(rng, ids)
+    return f'/{code}{path}', body
+  return request
+
+# The routes of app that a run covers, failing on routes without a scenario
+# so new routes get benchmarked too. The /<lang>/... copies are covered by
+# LANGUAGE_SCENARIOS instead.
+def route_scenarios(app):
+  scenarios = []
+  for rule in app.url_map.iter_rules():
+    if rule.endpoint == 'static' or rule.rule.startswith('/_debug') or 'lang' in rule.arguments:
+      continue
+    for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+      key = (method, rule.rule)
+      if key in SKIPPED_ROUTES:
+        continue
+      if key not in SCENARIOS:
+        raise KeyError(f'No benchmark scenario for {method} {rule.rule}')
+      scenarios.append(key)
+  return sorted(scenarios)
+
+def row_counts(path):
+  connection = sqlite3.connect(path)
+  try:
+    return {
+      table: connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+      for table in ('words', 'groups', 'study_sessions', 'study_activities', 'word_review_items')
+    }
+  finally:
+    connection.close()
+
+# Nearest-rank percentile of sorted values
+def percentile(values, fraction):
+  if not values:
+    return None
+  return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+def summarize(latencies, errors, seconds):
+  latencies = sorted(latencies)
+  return {
+    'requests': len(latencies),
+    'errors': errors,
+    'throughput_rps': round(len(latencies) / seconds, 2) if seconds else None,
+    'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+    'p50_ms': round(percentile(latencies, 0.50), 3) if latencies else None,
+    'p95_ms': round(percentile(latencies, 0.95), 3) if latencies else None,
+    'p99_ms': round(percentile(latencies, 0.99), 3) if latencies else None,
+    'max_ms': round(latencies[-1], 3) if latencies else None
+  }
+
+def git_commit():
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', '--short', 'HEAD'],
+      capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+class ClientTransport:
+  def __init__(self, app):
+    self.app = app
+    self._local = threading.local()
+
+  def request(self, method, path, body):
+    client = getattr(self._local, 'client', None)
+    if client is None:
+      client = self._local.client = self.app.test_client()
+    response = client.open(path, method=method, json=body)
+    response.get_data()
+    return response.status_code
+
+  def close(self):
+    pass
+
+# Keeps the access log of the benchmark server out of the report
+class QuietRequestHandler(WSGIRequestHandler):
+  def log_request(self, *args, **kwargs):
+    pass
+
+class ServerTransport:
+  def __init__(self, app):
+    self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self.thread.start()
+
+  def request(self, method, path, body):
+    data = None
+    headers = {}
+    if body is not None:
+      data = json.dumps(body).encode('utf-8')
+      headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+    try:
+      with urllib.request.urlopen(request) as response:
+        response.read()
+        return response.status
+    except urllib.error.HTTPError as e:
+      e.read()
+      return e.code
+
+  def close(self):
+    self.server.shutdown()
+    self.thread.join()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+# Runs gunicorn as a child process, passing the app config as LANG_PORTAL_*
+# environment variables
+class GunicornTransport(ServerTransport):
+  def __init__(self, app, workers=1, config=None, startup_timeout=30.0):
+    port = free_port()
+    self.base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    for key, value in (config or {}).items():
+      env[f'LANG_PORTAL_{key}'] = json.dumps(value)
+    self.process = subprocess.Popen(
+      [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+      cwd=BACKEND_DIR, env=env
+    )
+    try:
+      self._wait_until_ready(startup_timeout)
+    except Exception:
+      self.close()
+      raise
+
+  def _wait_until_ready(self, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+      if self.process.poll() is not None:
+        raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+      try:
+        with urllib.request.urlopen(self.base_url + '/groups', timeout=1) as response:
+          response.read()
+        return
+      except (urllib.error.URLError, ConnectionError):
+        if time.monotonic() > deadline:
+          raise RuntimeError('gunicorn did not start in time')
+        time.sleep(0.1)
+
+  def close(self):
+    self.process.terminate()
+    try:
+      self.process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+      self.process.kill()
+      self.process.wait()
+
+TRANSPORTS = {'client': ClientTransport, 'server': ServerTransport, 'gunicorn': GunicornTransport}
+
+# Run requests_per_route requests against every route with concurrency
+# threads and return the report. config overrides the app config.
+# workers is the number of gunicorn worker processes and only applies to mode
+# 'gunicorn'.
+def run(database, mode='client', concurrency=4, requests_per_route=200, warmup=10, seed=42, config=None, routes=None, workers=1):
+  if mode not in TRANSPORTS:
+    raise ValueError(f'Unknown mode {mode!r}, expected one of {sorted(TRANSPORTS)}')
+
+  workdir = tempfile.mkdtemp(prefix='bench-')
+  try:
+    path = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(database, path)
+    ids = row_counts(path)
+    ids['study_activities'] = max(1, ids['study_activities'])
+
+    app_config = {'DATABASE': path, 'DB_POOL_SIZE': max(8, concurrency), **(config or {})}
+    language_scenarios = [
+      scenario for scenario in sorted(LANGUAGE_SCENARIOS)
+      if not routes or f'/{BENCH_LANGUAGE}{scenario[1]}' in routes
+    ]
+    if language_scenarios:
+      language_path = os.path.join(workdir, f'bench_{BENCH_LANGUAGE}.db')
+      datagen.generate(
+        language_path, words=ids['words'], groups=max(1, ids['groups']), sessions=max(1, ids['study_sessions']),
+        reviews=ids['word_review_items'], seed=seed, language=LANGUAGES[BENCH_LANGUAGE]
+      )
+      app_config['LANGUAGE_DATABASES'] = {BENCH_LANGUAGE: language_path}
+    app = create_app(app_config)
+    scenarios = [(method, rule, SCENARIOS[(method, rule)]) for method, rule in route_scenarios(app)]
+    if routes:
+      scenarios = [scenario for scenario in scenarios if scenario[1] in routes]
+    scenarios += [
+      (method, f'/{BENCH_LANGUAGE}{rule}', language_scenario(LANGUAGE_SCENARIOS[(method, rule)], BENCH_LANGUAGE))
+      for method, rule in language_scenarios
+    ]
+
+    if mode == 'gunicorn':
+      transport = GunicornTransport(app, workers=workers, config=app_config)
+    else:
+      transport = TRANSPORTS[mode](app)
+    try:
+      results = {}
+      started = time.perf_counter()
+      for method, rule, scenario in scenarios:
+        results[f'{method} {rule}'] = run_route(transport, scenario, method, ids, concurrency, requests_per_route, warmup, random.Random(seed))
+      total_seconds = time.perf_counter() - started
+    finally:
+      transport.close()
+      for db in app.db:
+        db.pool.close()
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+
+  return {
+    'meta': {
+      'commit': git_commit(),
+      'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+      'mode': mode,
+      'workers': workers if mode == 'gunicorn' else None,
+      'cpus': os.cpu_count(),
+      'concurrency': concurrency,
+      'requests_per_route': requests_per_route,
+      'warmup': warmup,
+      'seed': seed,
+      'config': config or {},
+      'database': os.path.basename(database),
+      'rows': ids,
+      'python': platform.python_version(),
+      'sqlite': sqlite3.sqlite_version
+    },
+    'total': {
+      'requests': sum(result['requests'] for result in results.values()),
+      'errors': sum(result['errors'] for result in results.values()),
+      'seconds': round(total_seconds, 3)
+    },
+    'routes': results
+  }
+
+def run_route(transport, scenario, method, ids, concurrency, count, warmup, rng):
+  requests = [scenario(rng, ids) for _ in range(warmup + count)]
+  for path, body in requests[:warmup]:
+    transport.request(method, path, body)
+
+  def timed(request):
+    path, body = request
+    start = time.perf_counter()
+    status = transport.request(method, path, body)
+    return (time.perf_counter() - start) * 1000, status
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    outcomes = list(pool.map(timed, requests[warmup:]))
+  seconds = time.perf_counter() - started
+
+  errors = sum(1 for _, status in outcomes if status >= 400)
+  return summarize([latency for latency, _ in outcomes], errors, seconds)
+
+# Run the benchmark on gunicorn once per worker count and report how the
+# throughput of every route scales against the first (smallest) count. Each
+# run gets concurrency_per_worker client threads per worker, so added workers
+# always have requests to serve.
+def scale(database, workers=(1, 2, 4), concurrency_per_worker=4, **options):
+  workers = sorted(workers)
+  runs = {}
+  for count in workers:
+    runs[count] = run(database, mode='gunicorn', workers=count, concurrency=concurrency_per_worker * count, **options)
+
+  def total_rps(report):
+    seconds = report['total']['seconds']
+    return round(report['total']['requests'] / seconds, 2) if seconds else None
+
+  base = runs[workers[0]]
+  scaling = {}
+  for route, result in base['routes'].items():
+    scaling[route] = {}
+    for count in workers:
+      rps = runs[count]['routes'][route]['throughput_rps']
+      scaling[route][count] = {
+        'throughput_rps': rps,
+        'speedup': round(rps / result['throughput_rps'], 2) if rps and result['throughput_rps'] else None,
+        'p95_ms': runs[count]['routes'][route]['p95_ms'],
+        'errors': runs[count]['routes'][route]['errors']
+      }
+
+  totals = {count: total_rps(runs[count]) for count in workers}
+  return {
+    'meta': dict(base['meta'], workers=workers, concurrency_per_worker=concurrency_per_worker, concurrency=None),
+    'total': {
+      count: {
+        'throughput_rps': totals[count],
+        'speedup': round(totals[count] / totals[workers[0]], 2) if totals[count] and totals[workers[0]] else None,
+        'errors': runs[count]['total']['errors']
+      }
+      for count in workers
+    },
+    'routes': scaling
+  }
@@ -0,0 +1,97 @@
+import os
+import platform
+import sqlite3
+import time
+
+from app import create_app
+from lib.encoding import PROVIDERS, orjson
+from lib.languages import LANGUAGES
+
+# Time only the serialization of a /words page: rows already fetched, turned
+# into the response body. SQL dominates the full route latency and hides the
+# difference, so this isolates what lib.encoding changes.
+#
+# Encoders compared per page size:
+#   dicts+stdlib     a dict built key by key per row, stdlib JSON (the old
+#                    route code)
+#   rowshape+stdlib  RowShape, stdlib JSON
+#   rowshape+orjson  RowShape, orjson (skipped without orjson)
+
+WORDS_SQL = '''
+  SELECT w.id, w.kanji, w.romaji, w.english,
+      COALESCE(r.correct_count, 0) AS correct_count,
+      COALESCE(r.wrong_count, 0) AS wrong_count
+  FROM words w
+  LEFT JOIN word_reviews r ON w.id = r.word_id
+  ORDER BY w.kanji ASC, w.id ASC
+  LIMIT ?
+'''
+
+def build_dicts(rows):
+  words_data = []
+  for word in rows:
+    words_data.append({
+      "id": word["id"],
+      "kanji": word["kanji"],
+      "romaji": word["romaji"],
+      "english": word["english"],
+      "correct_count": word["correct_count"],
+      "wrong_count": word["wrong_count"]
+    })
+  return words_data
+
+WORD_JSON = LANGUAGES['ja'].word_shape(correct_count='correct_count', wrong_count='wrong_count')
+
+def page(words):
+  return {'words': words, 'next_cursor': 'x' * 40, 'prev_cursor': None, 'total_words': 1, 'total_pages': 1, 'current_page': 1}
+
+def encoders(app):
+  stdlib = PROVIDERS['stdlib'](app)
+  result = {
+    'dicts+stdlib': lambda rows: stdlib.response(page(build_dicts(rows))).get_data(),
+    'rowshape+stdlib': lambda rows: stdlib.response(page(WORD_JSON.rows(rows))).get_data()
+  }
+  if orjson is not None:
+    fast = PROVIDERS['orjson'](app)
+    result['rowshape+orjson'] = lambda rows: fast.response(page(WORD_JSON.rows(rows))).get_data()
+  return result
+
+def run(database, sizes=(50, 500, 5000), seconds=0.5):
+  connection = sqlite3.connect(database)
+  connection.row_factory = sqlite3.Row
+  app = create_app({'DATABASE': database})
+  report = {}
+  try:
+    with app.app_context():
+      for size in sizes:
+        rows = connection.execute(WORDS_SQL, (size,)).fetchall()
+        report[size] = {}
+        for name, encode in encoders(app).items():
+          report[size][name] = time_encoder(encode, rows, seconds)
+        base = report[size]['dicts+stdlib']['us_per_page']
+        for result in report[size].values():
+          result['speedup'] = round(base / result['us_per_page'], 2)
+  finally:
+    connection.close()
+    for db in app.db:
+      db.pool.close()
+  return {
+    'meta': {
+      'database': os.path.basename(database),
+      'orjson': orjson.__version__ if orjson is not None else None,
+      'python': platform.python_version()
+    },
+    'sizes': report
+  }
+
+def time_encoder(encode, rows, seconds):
+  encode(rows)  # warm up
+  count = 0
+  started = time.perf_counter()
+  while True:
+    encode(rows)
+    count += 1
+    elapsed = time.perf_counter() - started
+    if elapsed >= seconds:
+      break
+  return {'pages': count, 'us_per_page': round(elapsed / count * 1e6, 1), 'bytes': len(encode(rows))}
@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+
+# Production serving: gunicorn -c gunicorn.conf.py (from backend-flask)
+#
+# SQLite work is blocking, so throughput comes from processes: each worker is
+# a separate process with its own app, connection pool and result cache, and
+# a few threads per worker overlap the time spent waiting on I/O and locks.
+# WAL mode lets the readers of every worker run alongside the one writer.
+#
+# The app is not preloaded, so every worker imports app.py itself and opens
+# its connections after the fork. Configure it with LANG_PORTAL_* variables,
+# e.g. LANG_PORTAL_DATABASE=/srv/words.db LANG_PORTAL_DB_POOL_SIZE=8.
+
+wsgi_app = 'app:app'
+bind = os.environ.get('BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+# Keep DB_POOL_SIZE at least this high, every thread may hold a connection
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = False
+timeout = 30
+graceful_timeout = 10
+
+# Open a first connection to every language database as soon as a worker is
+# up, so pragmas are applied and a missing or locked database fails the
+# worker at boot, not a request. The migrations check (MIGRATIONS) runs here
+# too, as importing app.py skips it.
+def post_worker_init(worker):
+  from app import migrate_databases
+  migrate_databases(worker.wsgi)
+  for db in worker.wsgi.db:
+    db.pool.release(db.pool.acquire())
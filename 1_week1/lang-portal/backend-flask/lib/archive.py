@@ -0,0 +1,89 @@
+import re
+from datetime import datetime, timedelta, UTC
+
+# Archival of old reviews.
+#
+# word_review_items only needs the recent reviews: everything the routes
+# aggregate is kept by triggers in word_reviews, daily_activity, the session
+# counters and word_schedule, which already hold the reviews folded in when
+# they were written. archive_reviews() moves the reviews older than a horizon
+# into one table per month (word_review_items_YYYY_MM) so the hot table and
+# its indexes stay small.
+#
+# The view word_review_items_all is the union of the hot table and every
+# archive table. Only what explicitly asks for the whole history reads it:
+# the maintenance scripts recomputing the aggregates and the session detail
+# with ?history=all.
+
+DEFAULT_HORIZON_DAYS = 365
+
+ALL_REVIEWS_VIEW = 'word_review_items_all'
+ARCHIVE_TABLE = re.compile(r'^word_review_items_\d{4}_\d{2}$')
+REVIEW_COLUMNS = 'id, word_id, study_session_id, correct, created_at'
+
+# Archive tables have the columns of word_review_items; their ids are the ids
+# the reviews had in it
+CREATE_ARCHIVE_TABLE_SQL = '''
+  CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    word_id INTEGER NOT NULL,
+    study_session_id INTEGER NOT NULL,
+    correct BOOLEAN NOT NULL,
+    created_at DATETIME,
+    FOREIGN KEY (word_id) REFERENCES words(id),
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+  )
+'''
+
+# Archive tables in month order
+def archive_tables(cursor):
+  cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'word_review_items_*'")
+  return sorted(row[0] for row in cursor.fetchall() if ARCHIVE_TABLE.match(row[0]))
+
+# Point word_review_items_all at the hot table and the given archive tables
+def create_union_view(cursor, tables):
+  selects = [f'SELECT {REVIEW_COLUMNS} FROM {table}' for table in ['word_review_items', *tables]]
+  cursor.execute(f'DROP VIEW IF EXISTS {ALL_REVIEWS_VIEW}')
+  cursor.execute(f'CREATE VIEW {ALL_REVIEWS_VIEW} AS ' + '\nUNION ALL\n'.join(selects))
+
+# Move the reviews written more than horizon_days before now into their
+# monthly archive tables, in one transaction. Returns {archive table: rows
+# moved}.
+#
+# Selecting the old reviews scans word_review_items once (created_at is not
+# indexed, to keep review inserts cheap); they are copied to a temp table
+# first so every month and the delete work off that.
+def archive_reviews(db, horizon_days=DEFAULT_HORIZON_DAYS, now=None):
+  now = (now or datetime.now(UTC)).astimezone(UTC).replace(tzinfo=None)
+  cutoff = (now - timedelta(days=horizon_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+  cursor = db.cursor()
+  cursor.execute('BEGIN IMMEDIATE')
+  try:
+    cursor.execute('DROP TABLE IF EXISTS temp.archive_batch')
+    cursor.execute(f'''
+      CREATE TEMP TABLE archive_batch AS
+      SELECT {REVIEW_COLUMNS}, strftime('%Y_%m', created_at) AS month
+      FROM word_review_items
+      WHERE created_at < ?
+    ''', (cutoff,))
+    cursor.execute('SELECT month, COUNT(*) FROM temp.archive_batch GROUP BY month ORDER BY month')
+    months = {f'word_review_items_{month}': count for month, count in cursor.fetchall()}
+
+    for table in months:
+      cursor.execute(CREATE_ARCHIVE_TABLE_SQL.format(table=table))
+      cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_study_session_id ON {table}(study_session_id)')
+      cursor.execute(f'''
+        INSERT INTO {table} ({REVIEW_COLUMNS})
+        SELECT {REVIEW_COLUMNS} FROM temp.archive_batch WHERE month = ?
+      ''', (table[-7:],))
+
+    if months:
+      cursor.execute('DELETE FROM word_review_items WHERE id IN (SELECT id FROM temp.archive_batch)')
+      create_union_view(cursor, archive_tables(cursor))
+    cursor.execute('DROP TABLE temp.archive_batch')
+    db.commit()
+  except Exception:
+    db.get().rollback()
+    raise
+  return months
@@ -0,0 +1,140 @@
+import collections
+import functools
+import threading
+import time
+
+from flask import current_app, g, make_response, request
+
+# In-process cache of route responses.
+#
+# A route decorated with @cached('groups') keeps its successful responses,
+# keyed on the language, the endpoint, its URL arguments, the (sorted) query
+# string and the data versions of the tables the route reads (see
+# Db.data_versions), so a commit made by another process (another WSGI
+# worker) is never answered from an entry computed before it. Entries are
+# also dropped as soon as a commit of this process writes to one of their
+# tables in any language (see Db.on_commit), besides the usual LRU eviction
+# once max_entries are held and expiry after ttl seconds.
+class ResultCache:
+  def __init__(self, max_entries=256, ttl=60.0):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._entries = collections.OrderedDict()  # key -> (expires_at, tables, value)
+    self._keys_by_table = collections.defaultdict(set)
+    self._generation = 0
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    self.invalidations = 0
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        self.misses += 1
+        return None
+      if entry[0] <= time.monotonic():
+        self._remove(key)
+        self.expirations += 1
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[2]
+
+  # Remember value unless the tables were written since generation (taken
+  # from generation() before the value was computed) or the cache is off
+  def put(self, key, value, tables, generation):
+    if self.max_entries <= 0:
+      return
+    with self._lock:
+      if generation != self._generation:
+        return
+      if key in self._entries:
+        self._remove(key)
+      self._entries[key] = (time.monotonic() + self.ttl, frozenset(tables), value)
+      for table in tables:
+        self._keys_by_table[table].add(key)
+      while len(self._entries) > self.max_entries:
+        self._remove(next(iter(self._entries)))
+        self.evictions += 1
+
+  def generation(self):
+    with self._lock:
+      return self._generation
+
+  # Commit listener: drop the entries that read any of the written tables
+  def invalidate(self, tables):
+    with self._lock:
+      self._generation += 1
+      for table in tables:
+        for key in list(self._keys_by_table.get(table, ())):
+          self._remove(key)
+          self.invalidations += 1
+
+  def clear(self):
+    with self._lock:
+      self._generation += 1
+      self._entries.clear()
+      self._keys_by_table.clear()
+
+  def _remove(self, key):
+    _, tables, _ = self._entries.pop(key)
+    for table in tables:
+      keys = self._keys_by_table[table]
+      keys.discard(key)
+      if not keys:
+        del self._keys_by_table[table]
+
+  def stats(self):
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        'entries': len(self._entries),
+        'max_entries': self.max_entries,
+        'ttl': self.ttl,
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / lookups if lookups else None,
+        'evictions': self.evictions,
+        'expirations': self.expirations,
+        'invalidations': self.invalidations
+      }
+
+def cached(*tables):
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      cache = current_app.result_cache
+      key = (
+        g.get('language'),
+        request.endpoint,
+        tuple(sorted(request.view_args.items())),
+        tuple(sorted(request.args.items(multi=True))),
+        table_versions(tables)
+      )
+
+      value = cache.get(key)
+      if value is not None:
+        body, mimetype = value
+        return current_app.response_class(body, mimetype=mimetype)
+
+      generation = cache.generation()
+      response = make_response(view(*args, **kwargs))
+      if response.status_code == 200 and not response.is_streamed:
+        cache.put(key, (response.get_data(), response.mimetype), tables, generation)
+      return response
+    return wrapper
+  return decorator
+
+# Data versions of tables, reusing the ones @conditional just read when it
+# covers them. None when the database does not track versions.
+def table_versions(tables):
+  versions = g.get('data_versions')
+  if versions is None or not set(tables) <= versions.keys():
+    versions = current_app.db.data_versions(tables)
+    if versions is None:
+      return None
+  return tuple(sorted((table, versions[table][0]) for table in tables))
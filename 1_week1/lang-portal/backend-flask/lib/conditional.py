@@ -0,0 +1,68 @@
+import functools
+import hashlib
+from datetime import datetime, timezone
+
+from flask import current_app, g, make_response, request
+
+# Conditional GET for read routes.
+#
+# A route decorated with @conditional('words', 'word_reviews') gets an ETag
+# derived from the request URL and the data versions of the tables it reads
+# (see Db.data_versions), and a Last-Modified of the newest of those tables.
+# A request whose If-None-Match still matches is answered with 304 Not
+# Modified after one primary key lookup, without running the route.
+# Responses carry Cache-Control: no-cache so clients revalidate on every poll.
+#
+# If-Modified-Since is not honoured: Last-Modified only has whole seconds, so
+# a write in the same second as the previous response would still look
+# unmodified, while the data version in the ETag moves with every commit.
+#
+# vary() can return anything else the response depends on (e.g. today's date
+# for a streak), which is mixed into the ETag. When that is a request header
+# (content negotiation), name it in vary_header so it is sent as Vary too.
+
+def conditional(*tables, vary=None, vary_header=None):
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      versions = current_app.db.data_versions(tables)
+      # Kept for @cached below, which keys its entries on them
+      g.data_versions = versions
+      # Databases without data_versions are served unconditionally
+      if versions is None:
+        return view(*args, **kwargs)
+
+      etag = compute_etag(versions, vary() if vary else None)
+      last_modified = latest_modification(versions)
+
+      if is_not_modified(etag):
+        response = make_response('', 304)
+      else:
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+
+      response.set_etag(etag)
+      if vary_header:
+        response.vary.add(vary_header)
+      if last_modified:
+        response.last_modified = last_modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
+
+def compute_etag(versions, extra=None):
+  state = repr((request.full_path, sorted(versions.items()), extra))
+  return hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+def latest_modification(versions):
+  stamps = [modified_at for _, modified_at in versions.values() if modified_at]
+  if not stamps:
+    return None
+  # modified_at is CURRENT_TIMESTAMP text, which is UTC
+  return datetime.strptime(max(stamps), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+
+# Only the versioned ETag decides, see above
+def is_not_modified(etag):
+  return bool(request.if_none_match) and request.if_none_match.contains(etag)
@@ -0,0 +1,57 @@
+# Consistency check for the counter caches in the schema.
+#
+# Each counter cache is a set of columns maintained incrementally by triggers
+# plus a maintenance script that recomputes them from the source tables. The
+# check runs every script inside one transaction, compares the result with a
+# snapshot taken before, and rolls back unless asked to repair, so the
+# scripts are the only definition of what the counters should hold.
+
+# (name, table, key columns, counter columns, maintenance script recomputing them)
+COUNTER_CACHES = [
+  ('groups.words_count', 'groups', 'id', 'words_count', 'maintenance/rebuild_group_words_count.sql'),
+  ('word_reviews', 'word_reviews', 'word_id', 'correct_count, wrong_count', 'maintenance/rebuild_word_reviews.sql'),
+  ('daily_activity', 'daily_activity', 'study_date, group_id', 'sessions_count, reviews_count, correct_count', 'maintenance/rebuild_daily_activity.sql'),
+  ('study_sessions activity', 'study_sessions', 'id', 'review_items_count, last_activity_at', 'maintenance/rebuild_study_session_activity.sql'),
+  ('word_schedule', 'word_schedule', 'word_id', 'repetitions, interval_days, ease, last_reviewed_at, next_due_at', 'maintenance/rebuild_word_schedule.sql'),
+  ('word_group_schedule', 'word_group_schedule', 'group_id, word_id', 'next_due_at', 'maintenance/rebuild_word_schedule.sql'),
+]
+
+# Returns {counter name: number of rows that were wrong}. With repair=True
+# the recomputed values are committed when anything was wrong.
+def check_counters(db, repair=False):
+  cursor = db.cursor()
+  snapshots = [f'temp.counter_snapshot_{index}' for index in range(len(COUNTER_CACHES))]
+
+  script = ['BEGIN;']
+  for snapshot, (_, table, key, counters, _) in zip(snapshots, COUNTER_CACHES):
+    script.append(f'DROP TABLE IF EXISTS {snapshot};')
+    script.append(f'CREATE TABLE {snapshot} AS SELECT {key}, {counters} FROM {table};')
+  # Scripts rebuilding more than one cache run once
+  for maintenance in dict.fromkeys(maintenance for *_, maintenance in COUNTER_CACHES):
+    script.append(db.sql(maintenance).strip().rstrip(';') + ';')
+
+  try:
+    cursor.executescript('\n'.join(script))
+
+    mismatches = {}
+    for snapshot, (name, table, key, counters, _) in zip(snapshots, COUNTER_CACHES):
+      # Rows (by key) that are missing, extra or hold different counters
+      columns = f'{key}, {counters}'
+      cursor.execute(f'''
+        SELECT COUNT(*) FROM (
+          SELECT {key} FROM (SELECT {columns} FROM {snapshot} EXCEPT SELECT {columns} FROM {table})
+          UNION
+          SELECT {key} FROM (SELECT {columns} FROM {table} EXCEPT SELECT {columns} FROM {snapshot})
+        )
+      ''')
+      mismatches[name] = cursor.fetchone()[0]
+      cursor.execute(f'DROP TABLE {snapshot}')
+  except Exception:
+    db.get().rollback()
+    raise
+
+  if repair and any(mismatches.values()):
+    db.commit()
+  else:
+    db.get().rollback()
+  return mismatches
@@ -1,17 +1,354 @@
 import sqlite3
+import itertools
 import json
+import logging
+import os
+import queue
+import re
+import threading
 from flask import g
 
+from lib.history import Reclaimer
+from lib.languages import LANGUAGES
+from lib import migrations
+from lib.statements import SETUP_TABLES, for_language
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied once to every pooled connection when it is opened.
+# journal_mode=WAL lets readers keep going while a writer commits, and
+# synchronous=NORMAL is durable enough under WAL (only the last transactions
+# can be lost on power failure, the file cannot be corrupted).
+#
+# auto_vacuum only takes effect on a new database (it has to be set before the
+# first table), see lib.history for what it is used for.
+DEFAULT_PRAGMAS = {
+  'auto_vacuum': 'INCREMENTAL',
+  'journal_mode': 'WAL',
+  'synchronous': 'NORMAL',
+  'mmap_size': 268435456,  # 256MB of the file mapped into memory
+  'cache_size': -16000,  # Negative means KiB, so ~16MB of page cache per connection
+  'temp_store': 'MEMORY',
+  'busy_timeout': 5000
+}
+
+# Matches the target table of INSERT/REPLACE/UPDATE/DELETE statements, with
+# its schema when qualified (temp.import_words)
+WRITE_STATEMENT = re.compile(
+  r'^\s*(?:INSERT|REPLACE|UPDATE|DELETE)(?:\s+OR\s+\w+)?\s+(?:INTO\s+|FROM\s+)?'
+  r'(?:["`\[]?(\w+)["`\]]?\.)?["`\[]?(\w+)',
+  re.IGNORECASE | re.MULTILINE
+)
+
+# The (lowercase) tables sql writes to. Temp tables are private to their
+# connection, so nobody else needs to hear about them.
+def written_tables(sql):
+  for match in WRITE_STATEMENT.finditer(sql):
+    schema, table = match.groups()
+    if schema is None or schema.lower() != 'temp':
+      yield table.lower()
+
+# Prepared statements sqlite3 keeps per connection, enough for every
+# statement in the registry (see lib.statements) plus the static ones
+STATEMENT_CACHE_SIZE = 512
+
+# Bumps the data version of a written table, see sql/migrations/0005_data_versions.sql
+BUMP_DATA_VERSION = '''
+  INSERT INTO data_versions (table_name, version, modified_at)
+  VALUES (?, 1, CURRENT_TIMESTAMP)
+  ON CONFLICT(table_name) DO UPDATE SET
+    version = version + 1,
+    modified_at = excluded.modified_at
+'''
+
+# Cursor that notes which tables a statement writes to
+class Cursor(sqlite3.Cursor):
+  def execute(self, sql, parameters=()):
+    self.connection.track_writes(sql)
+    return super().execute(sql, parameters)
+
+  def executemany(self, sql, seq_of_parameters):
+    self.connection.track_writes(sql)
+    return super().executemany(sql, seq_of_parameters)
+
+  def executescript(self, sql_script):
+    self.connection.track_writes(sql_script)
+    return super().executescript(sql_script)
+
+# Connection that remembers the tables written since the last commit and
+# tells the commit listeners about them once the commit succeeded. Caches use
+# this to invalidate exactly what changed. Writes have to be committed with
+# commit() (not `with connection:`) to be reported.
+#
+# Tables written by triggers count as written too, and when the database has
+# a data_versions table their versions are bumped in the same transaction.
+class Connection(sqlite3.Connection):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.written = set()
+    self.commit_listeners = []
+    self._schema_version = None
+    self._trigger_writes = {}
+    self._versioned = False
+
+  def cursor(self, factory=None):
+    return super().cursor(factory or Cursor)
+
+  # The shortcuts on sqlite3.Connection bypass cursor(), so route them
+  # through a tracking cursor as well
+  def execute(self, sql, parameters=()):
+    return self.cursor().execute(sql, parameters)
+
+  def executemany(self, sql, seq_of_parameters):
+    return self.cursor().executemany(sql, seq_of_parameters)
+
+  def executescript(self, sql_script):
+    return self.cursor().executescript(sql_script)
+
+  def track_writes(self, sql):
+    self.written.update(written_tables(sql))
+
+  # Re-read which tables each table's triggers write to whenever the schema
+  # changed since the last look
+  def _load_schema(self):
+    version = super().execute('PRAGMA schema_version').fetchone()[0]
+    if version == self._schema_version:
+      return
+    trigger_writes = {}
+    versioned = False
+    for kind, table, sql in super().execute('''
+      SELECT type, tbl_name, sql FROM sqlite_master WHERE type IN ('table', 'trigger')
+    '''):
+      if kind == 'table':
+        versioned = versioned or table == 'data_versions'
+        continue
+      body = re.split(r'\bBEGIN\b', sql, maxsplit=1, flags=re.IGNORECASE)[-1]
+      targets = trigger_writes.setdefault(table.lower(), set())
+      targets.update(written_tables(body))
+    self._schema_version = version
+    self._trigger_writes = trigger_writes
+    self._versioned = versioned
+
+  # The tables written directly plus everything their triggers write to
+  def _expand_writes(self, tables):
+    expanded = set()
+    pending = list(tables)
+    while pending:
+      table = pending.pop()
+      if table in expanded:
+        continue
+      expanded.add(table)
+      pending.extend(self._trigger_writes.get(table, ()))
+    return expanded
+
+  def commit(self):
+    if not self.written:
+      super().commit()
+      return
+    self._load_schema()
+    tables = self._expand_writes(self.written)
+    if self._versioned:
+      super().executemany(BUMP_DATA_VERSION, [(table,) for table in sorted(tables - {'data_versions'})])
+    super().commit()
+    self.written = set()
+    for listener in self.commit_listeners:
+      try:
+        listener(tables)
+      except Exception:
+        logger.exception('Commit listener failed')
+
+  def rollback(self):
+    super().rollback()
+    self.written = set()
+
+# Yield the items of a top-level JSON array one by one while reading the file
+# in blocks, so a large seed file never has to fit in memory
+def iter_json_array(filepath, block_size=1 << 16):
+  decoder = json.JSONDecoder()
+  with open(filepath, 'r', encoding='utf-8') as file:
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+      # Skip whitespace and separators up to the next item
+      while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+          position += 1
+        if position < len(buffer) or eof:
+          break
+        block = file.read(block_size)
+        eof = not block
+        buffer, position = buffer[position:] + block, 0
+
+      if position >= len(buffer):
+        raise ValueError(f'{filepath}: unexpected end of JSON array')
+      if not started:
+        if buffer[position] != '[':
+          raise ValueError(f'{filepath}: expected a JSON array')
+        started = True
+        position += 1
+        continue
+      if buffer[position] == ']':
+        return
+
+      try:
+        item, end = decoder.raw_decode(buffer, position)
+      except json.JSONDecodeError:
+        # The item is cut off at the end of the buffer, read more of it
+        if eof:
+          raise
+        block = file.read(block_size)
+        eof = not block
+        buffer, position = buffer[position:] + block, 0
+        continue
+      yield item
+      position = end
+
+class ConnectionPool:
+  def __init__(self, database, size=8, timeout=5.0, pragmas=None):
+    self.database = database
+    self.size = size
+    self.timeout = timeout
+    self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+    self.commit_listeners = []
+    self._lock = threading.Lock()
+    self._reset()
+
+  def _reset(self):
+    # Connections must never be shared across a fork, so every process
+    # (e.g. each WSGI worker) starts with its own empty pool
+    self._pid = os.getpid()
+    self._idle = queue.LifoQueue()
+    self._opened = 0
+    # An in-memory database only lives as long as its connection, so every
+    # borrower shares the same one instead of getting an empty database each
+    self._shared = None
+
+  @property
+  def in_memory(self):
+    return self.database == ':memory:'
+
+  def _connect(self):
+    connection = sqlite3.connect(
+      self.database,
+      timeout=self.pragmas['busy_timeout'] / 1000,
+      check_same_thread=False,
+      cached_statements=STATEMENT_CACHE_SIZE,
+      factory=Connection
+    )
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    connection.commit_listeners = self.commit_listeners
+    for name, value in self.pragmas.items():
+      connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+  def acquire(self):
+    if self._pid != os.getpid():
+      self._reset()
+
+    if self.in_memory:
+      with self._lock:
+        if self._shared is None:
+          self._shared = self._connect()
+      return self._shared
+
+    try:
+      return self._idle.get_nowait()
+    except queue.Empty:
+      pass
+
+    with self._lock:
+      if self._opened < self.size:
+        self._opened += 1
+        try:
+          return self._connect()
+        except Exception:
+          self._opened -= 1
+          raise
+
+    try:
+      return self._idle.get(timeout=self.timeout)
+    except queue.Empty:
+      raise sqlite3.OperationalError(
+        f'Connection pool exhausted ({self.size} connections in use)'
+      )
+
+  # A connection of its own, outside the pool, for a long-lived borrower
+  # (e.g. a background writer) that must not compete with requests for pooled
+  # connections. The caller closes it. With an in-memory database this is the
+  # shared connection, which the caller must not close.
+  def connect(self):
+    if self.in_memory:
+      return self.acquire()
+    return self._connect()
+
+  def release(self, connection):
+    # Anything the borrower did not commit is thrown away, just like closing
+    # a connection would do
+    try:
+      if connection.in_transaction:
+        connection.rollback()
+    except sqlite3.Error:
+      self._discard(connection)
+      return
+
+    if self.in_memory or self._pid != os.getpid():
+      return
+    self._idle.put(connection)
+
+  def _discard(self, connection):
+    try:
+      connection.close()
+    except sqlite3.Error:
+      pass
+    if not self.in_memory:
+      with self._lock:
+        self._opened -= 1
+
+  def close(self):
+    while True:
+      try:
+        self._idle.get_nowait().close()
+      except queue.Empty:
+        break
+    if self._shared is not None:
+      self._shared.close()
+    self._reset()
+
+# A language database. The connection borrowed for the app context is kept on
+# g under a key of its own per language, so one app context can use several.
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=8, pool_timeout=5.0, pragmas=None, language=LANGUAGES['ja']):
     self.database = database
-    self.connection = None
+    self.language = language
+    self.statements = for_language(language)
+    self._key = f'db_{language.code}'
+    self.pool = ConnectionPool(
+      database,
+      size=pool_size,
+      timeout=pool_timeout,
+      pragmas=pragmas
+    )
+    # Set to a lib.profiler.SqlProfiler to profile the queries of requests
+    self.profiler = None
+    # Set to a lib.review_buffer.ReviewBuffer to queue review inserts
+    self.review_buffer = None
+    # Drops the tables a history reset swapped out, see lib.history
+    self.reclaimer = Reclaimer(self)
+
+  # Register listener(tables) to be called after every commit that wrote to
+  # tables, with the set of (lowercase) table names written
+  def on_commit(self, listener):
+    self.pool.commit_listeners.append(listener)
 
+  # Borrow a pooled connection for the current app context
   def get(self):
-    if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return g.db
+    connection = g.get(self._key)
+    if connection is None:
+      connection = self.pool.acquire()
+      setattr(g, self._key, connection)
+    return connection
 
   def commit(self):
     self.get().commit()
@@ -19,17 +356,41 @@ class Db:
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
     connection = self.get()
+    if self.profiler is not None:
+      return self.profiler.cursor(connection)
     return connection.cursor()
 
+  # Hand the connection back to the pool at the end of the app context
   def close(self):
-    db = g.pop('db', None)
-    if db is not None:
-      db.close()
+    connection = g.pop(self._key, None)
+    if connection is not None:
+      self.pool.release(connection)
+
+  # Current (version, modified_at) of each of tables, (0, None) for tables not
+  # written since versions were first tracked. None when the database has no
+  # data_versions table.
+  def data_versions(self, tables):
+    cursor = self.cursor()
+    placeholders = ', '.join('?' for _ in tables)
+    try:
+      cursor.execute(f'''
+        SELECT table_name, version, modified_at
+        FROM data_versions
+        WHERE table_name IN ({placeholders})
+      ''', list(tables))
+    except sqlite3.OperationalError as e:
+      if 'no such table' not in str(e):
+        raise
+      return None
+    versions = {table: (0, None) for table in tables}
+    for row in cursor.fetchall():
+      versions[row['table_name']] = (row['version'], row['modified_at'])
+    return versions
 
   # Function to load SQL from a file
+  # SQL files are read once into the statement registry of the language
   def sql(self, filepath):
-    with open('sql/' + filepath, 'r') as file:
-      return file.read()
+    return self.statements.file(filepath)
 
   # Function to load the words from a JSON file
   def load_json(self, filepath):
@@ -37,92 +398,157 @@ class Db:
       return json.load(file)
 
   def setup_tables(self,cursor):
-    # Create the necessary tables
-    cursor.execute(self.sql('setup/create_table_words.sql'))
-    self.get().commit()
+    # Create the necessary tables, all in one transaction
+    statements = [self.sql(f'setup/{name}.sql') for name in SETUP_TABLES]
+    cursor.executescript('BEGIN;\n' + ';\n'.join(statements) + ';\nCOMMIT;')
 
-    cursor.execute(self.sql('setup/create_table_word_reviews.sql'))
-    self.get().commit()
+  # Apply the versioned migrations in sql/migrations that this database has
+  # not seen yet, in file name order, each in its own transaction (see
+  # lib.migrations)
+  def migrate(self, cursor):
+    for version in migrations.migrate(self, cursor):
+      print(f"Applied migration: {version}")
 
-    cursor.execute(self.sql('setup/create_table_word_review_items.sql'))
-    self.get().commit()
+  # Recompute the word_reviews counters from the review history, e.g. after
+  # editing word_review_items by hand
+  def rebuild_word_reviews(self, cursor):
+    self._run_maintenance(cursor, 'maintenance/rebuild_word_reviews.sql')
 
-    cursor.execute(self.sql('setup/create_table_groups.sql'))
-    self.get().commit()
+  # Recompute the spaced repetition schedule from the review history
+  def rebuild_word_schedule(self, cursor):
+    self._run_maintenance(cursor, 'maintenance/rebuild_word_schedule.sql')
 
-    cursor.execute(self.sql('setup/create_table_word_groups.sql'))
-    self.get().commit()
+  # Recompute the daily_activity rollup from the study history, e.g. to
+  # backfill a database that has history from before the rollup existed
+  def rebuild_daily_activity(self, cursor):
+    self._run_maintenance(cursor, 'maintenance/rebuild_daily_activity.sql')
 
-    cursor.execute(self.sql('setup/create_table_study_activities.sql'))
-    self.get().commit()
+  # Reindex the words_fts search index from the words table
+  def rebuild_words_fts(self, cursor):
+    self._run_maintenance(cursor, 'maintenance/rebuild_words_fts.sql')
 
-    cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
-    self.get().commit()
+  # Run a maintenance script in one transaction. Its DELETE and the INSERT
+  # repopulating the table would otherwise commit one by one: readers would
+  # see the aggregates empty in between, and a review written meanwhile
+  # would make the INSERT fail on its freshly upserted row. BEGIN IMMEDIATE
+  # makes writers wait for the rebuild instead.
+  def _run_maintenance(self, cursor, filepath):
+    try:
+      cursor.executescript('BEGIN IMMEDIATE;\n' + self.sql(filepath))
+      self.get().commit()
+    except Exception:
+      self.get().rollback()
+      raise
 
+  # Activities that already exist (by name) are left alone, so re-running the
+  # import is safe
   def import_study_activities_json(self,cursor,data_json_path):
     study_actvities = self.load_json(data_json_path)
-    for activity in study_actvities:
-      cursor.execute('''
-      INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
-      ''', (activity['name'],activity['url'],activity['preview_url'],))
+    cursor.executemany('''
+      INSERT INTO study_activities (name,url,preview_url)
+      SELECT ?, ?, ?
+      WHERE NOT EXISTS (SELECT 1 FROM study_activities WHERE name = ?)
+    ''', [
+      (activity['name'], activity['url'], activity['preview_url'], activity['name'])
+      for activity in study_actvities
+    ])
     self.get().commit()
 
-  def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
+  # Import a JSON array of words into the group named group_name. Words are
+  # objects with the word fields of the language (plus parts, if it has them).
+  #
+  # The file is streamed and imported chunk_size words at a time, each chunk
+  # in one transaction: the chunk is bulk loaded into a temp table, new words
+  # are inserted and all of the chunk's words are linked to the group with
+  # one INSERT ... SELECT each. Words already in the table (same word fields)
+  # and links that already exist are skipped, so re-running an import adds
+  # nothing twice.
+  def import_word_json(self,cursor,group_name,data_json_path,chunk_size=5000):
+      # Find or create the group
       cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
-
-      for word in words:
-        # Insert the word into the words table
+      group = cursor.fetchone()
+      if group:
+        group_id = group[0]
+      else:
         cursor.execute('''
-          INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
-        ''', (word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
+          INSERT INTO groups (name) VALUES (?)
+        ''', (group_name,))
+        group_id = cursor.lastrowid
 
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
+      word_fields = self.language.word_fields
+      fields = word_fields + (('parts',) if self.language.parts else ())
+      columns = ', '.join(fields)
+      same_word = ' AND '.join(f'w.{field} = iw.{field}' for field in word_fields)
 
-      # Update the words_count in the groups table by counting all words in the group
-      cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
+      cursor.execute(f'''
+        CREATE TEMP TABLE IF NOT EXISTS import_words (
+          {', '.join(f'{field} TEXT NOT NULL' for field in fields)}
         )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
+      ''')
 
-      self.get().commit()
+      added = 0
+      words = iter_json_array(data_json_path)
+      while True:
+        chunk = list(itertools.islice(words, chunk_size))
+        if not chunk:
+          break
+
+        cursor.execute('DELETE FROM temp.import_words')
+        cursor.executemany(f'''
+          INSERT INTO temp.import_words ({columns}) VALUES ({', '.join('?' for _ in fields)})
+        ''', [
+          tuple(json.dumps(word[field]) if field == 'parts' else word[field] for field in fields)
+          for word in chunk
+        ])
+
+        # Insert the words that are not in the table yet (once each)
+        cursor.execute(f'''
+          INSERT INTO words ({columns})
+          SELECT {columns}
+          FROM temp.import_words iw
+          WHERE iw.rowid IN (
+            SELECT MIN(rowid) FROM temp.import_words GROUP BY {', '.join(word_fields)}
+          )
+          AND NOT EXISTS (
+            SELECT 1 FROM words w
+            WHERE {same_word}
+          )
+        ''')
+
+        # Link every word of the chunk to the group, resolving ids by join
+        cursor.execute(f'''
+          INSERT INTO word_groups (word_id, group_id)
+          SELECT DISTINCT w.id, ?
+          FROM temp.import_words iw
+          JOIN words w ON {same_word}
+          WHERE NOT EXISTS (
+            SELECT 1 FROM word_groups wg WHERE wg.group_id = ? AND wg.word_id = w.id
+          )
+        ''', (group_id, group_id))
+        added += cursor.rowcount
+
+        self.get().commit()
+
+      # groups.words_count is kept up to date by a trigger on word_groups
+      cursor.execute('DROP TABLE temp.import_words')
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+      print(f"Successfully added {added} words to the '{group_name}' group.")
 
   # Initialize the database with sample data
   def init(self, app):
     with app.app_context():
       cursor = self.cursor()
       self.setup_tables(cursor)
+      self.migrate(cursor)
       self.import_word_json(
         cursor=cursor,
         group_name='Core Verbs',
-        data_json_path='seed/data_verbs.json'
+        data_json_path=f'{self.language.seed_dir}/data_verbs.json'
       )
       self.import_word_json(
         cursor=cursor,
         group_name='Core Adjectives',
-        data_json_path='seed/data_adjectives.json'
+        data_json_path=f'{self.language.seed_dir}/data_adjectives.json'
       )
 
       self.import_study_activities_json(
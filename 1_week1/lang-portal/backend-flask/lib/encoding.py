@@ -0,0 +1,101 @@
+import sqlite3
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+except ImportError:  # Optional, responses fall back to the stdlib encoder
+  orjson = None
+
+# JSON encoding of route responses.
+#
+# create_app() installs one of the providers below as app.json, so jsonify()
+# in every route goes through it: OrjsonProvider when orjson is installed,
+# StdlibJSONProvider otherwise (or when JSON_ENCODER says so). Both turn
+# sqlite3.Row into objects and produce the same JSON, keys sorted like
+# Flask's default provider; orjson writes UTF-8 bytes straight into the
+# response instead of building a str first.
+#
+# Routes declare the JSON shape of their rows once with RowShape instead of
+# building every dict key by key.
+
+# Maps JSON keys to the columns of a result row, e.g.
+# RowShape(id='id', start_time='created_at')
+#
+# The first time a result set with a given column layout comes along, the
+# columns are resolved to positions once, so building each dict is a walk
+# over (key, position) pairs instead of looking every column up by name.
+class RowShape:
+  def __init__(self, **fields):
+    self.keys = tuple(fields)
+    self.columns = tuple(fields.values())
+    self._pairs = {}  # column layout -> ((key, position), ...)
+
+  def _positions(self, layout):
+    pairs = self._pairs.get(layout)
+    if pairs is None:
+      missing = [column for column in self.columns if column not in layout]
+      if missing:
+        raise KeyError(f'Result has no column {missing[0]!r}')
+      pairs = self._pairs[layout] = tuple(
+        (key, layout.index(column)) for key, column in zip(self.keys, self.columns)
+      )
+    return pairs
+
+  def dict(self, row):
+    pairs = self._positions(tuple(row.keys()))
+    return {key: row[i] for key, i in pairs}
+
+  def rows(self, rows):
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+      return []
+    pairs = self._positions(tuple(rows[0].keys()))
+    return [{key: row[i] for key, i in pairs} for row in rows]
+
+class StdlibJSONProvider(DefaultJSONProvider):
+  @staticmethod
+  def default(o):
+    if isinstance(o, sqlite3.Row):
+      return dict(zip(o.keys(), o))
+    return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(StdlibJSONProvider):
+  def _options(self, indent=False):
+    # Datetimes go through default() to be formatted like Flask does
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if self.sort_keys:
+      options |= orjson.OPT_SORT_KEYS
+    if indent:
+      options |= orjson.OPT_INDENT_2
+    return options
+
+  def dumps(self, obj, **kwargs):
+    # Options only the stdlib understands (ensure_ascii, indent=4...)
+    if kwargs:
+      return super().dumps(obj, **kwargs)
+    return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+  def loads(self, s, **kwargs):
+    if kwargs:
+      return super().loads(s, **kwargs)
+    return orjson.loads(s)
+
+  def response(self, *args, **kwargs):
+    obj = self._prepare_response_obj(args, kwargs)
+    indent = self.compact is False or (self.compact is None and self._app.debug)
+    body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+    return self._app.response_class(body, mimetype=self.mimetype)
+
+PROVIDERS = {'stdlib': StdlibJSONProvider, 'orjson': OrjsonProvider}
+
+# The provider for the JSON_ENCODER setting: 'auto' (orjson if installed),
+# 'orjson' or 'stdlib'
+def json_provider(app, encoder='auto'):
+  if encoder == 'auto':
+    encoder = 'orjson' if orjson is not None else 'stdlib'
+  if encoder not in PROVIDERS:
+    raise ValueError(f'Unknown JSON_ENCODER {encoder!r}, expected auto, orjson or stdlib')
+  if encoder == 'orjson' and orjson is None:
+    raise ValueError('JSON_ENCODER is orjson but orjson is not installed')
+  return PROVIDERS[encoder](app)
@@ -0,0 +1,167 @@
+import logging
+import os
+import re
+import threading
+
+from lib.archive import ALL_REVIEWS_VIEW, archive_tables, create_union_view
+
+logger = logging.getLogger(__name__)
+
+# Reset of the study history by table swap.
+#
+# Deleting the study history row by row holds the write lock for as long as
+# it takes to go through every page and leaves the file as big as before.
+# reset_history() instead renames the history tables (study_sessions,
+# word_review_items and its archive tables) out of the way
+# (trash_<n>_<table>) and creates empty ones with the same triggers and
+# indexes. A rename only touches the schema, so the swap costs the same
+# whatever the size of the history. The per-word and per-day aggregates are
+# emptied in the same transaction, so a reset is all or nothing; they hold at
+# most one row per word, or per day and group.
+#
+# The Reclaimer then drops the trash tables in the background, one per
+# transaction, and hands their pages back to the file system with
+# incremental_vacuum when the database has auto_vacuum=INCREMENTAL (see
+# DEFAULT_PRAGMAS in lib.db; `invoke vacuum` converts an older database).
+# Otherwise the freed pages stay in the file and are reused by later writes.
+
+# Tables swapped for empty copies, parents first
+SWAPPED_TABLES = ['study_sessions', 'word_review_items']
+
+TRASH_TABLE = re.compile(r'^trash_(\d+)_')
+
+# Index names of the swapped tables stay taken by the trash tables until they
+# are dropped, so the fresh indexes get a generation suffix: name__<n>
+INDEX_NAME = re.compile(r'^(CREATE\s+(?:UNIQUE\s+)?INDEX\s+)(?:IF\s+NOT\s+EXISTS\s+)?["`\[]?(\w+?)(?:__\d+)?["`\]]?(\s)', re.IGNORECASE)
+GENERATION_SUFFIX = re.compile(r'__(\d+)$')
+
+# Tables emptied in place, bounded by the vocabulary and the calendar
+CLEARED_TABLES = ['word_reviews', 'daily_activity', 'word_schedule']
+
+def trash_tables(cursor):
+  cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'trash_*'")
+  return sorted((row[0] for row in cursor.fetchall() if TRASH_TABLE.match(row[0])), key=lambda name: int(TRASH_TABLE.match(name).group(1)))
+
+# Swap in an empty review history and clear the aggregates, in one
+# transaction. Returns the trash tables left for the Reclaimer.
+def reset_history(db):
+  cursor = db.cursor()
+  cursor.execute('BEGIN IMMEDIATE')
+  try:
+    placeholders = ', '.join('?' for _ in SWAPPED_TABLES)
+    cursor.execute(f'SELECT type, name, tbl_name, sql FROM sqlite_master WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL', SWAPPED_TABLES)
+    schema = cursor.fetchall()
+    create_tables = {row['tbl_name']: row['sql'] for row in schema if row['type'] == 'table'}
+    indexes = [row['sql'] for row in schema if row['type'] == 'index']
+    triggers = [row for row in schema if row['type'] == 'trigger']
+
+    # Newer than both the tables still in the trash and the current indexes
+    trashed = trash_tables(cursor)
+    generations = [int(TRASH_TABLE.match(table).group(1)) for table in trashed]
+    generations.extend(
+      int(match.group(1)) for row in schema if row['type'] == 'index'
+      for match in [GENERATION_SUFFIX.search(row['name'])] if match
+    )
+    generation = max(generations, default=0) + 1
+
+    # Nothing may refer to the tables while they are renamed (a rename would
+    # point the triggers and the view at the trash)
+    cursor.execute(f'DROP VIEW IF EXISTS {ALL_REVIEWS_VIEW}')
+    for trigger in triggers:
+      cursor.execute(f'DROP TRIGGER {trigger["name"]}')
+
+    moved = []
+    for table in [*SWAPPED_TABLES, *archive_tables(cursor)]:
+      trash = f'trash_{generation}_{table}'
+      cursor.execute(f'ALTER TABLE {table} RENAME TO {trash}')
+      moved.append(trash)
+
+    for table in SWAPPED_TABLES:
+      cursor.execute(create_tables[table])
+      # Ids carry on where they were (AUTOINCREMENT), like after a DELETE
+      cursor.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT ?, seq FROM sqlite_sequence WHERE name = ?
+      ''', (table, f'trash_{generation}_{table}'))
+    for sql in indexes:
+      cursor.execute(INDEX_NAME.sub(lambda match: f'{match.group(1)}{match.group(2)}__{generation}{match.group(3)}', sql, count=1))
+    for trigger in triggers:
+      cursor.execute(trigger['sql'])
+    create_union_view(cursor, [])
+
+    for table in CLEARED_TABLES:
+      cursor.execute(f'DELETE FROM {table}')
+    cursor.execute('UPDATE word_group_schedule SET next_due_at = NULL WHERE next_due_at IS NOT NULL')
+
+    # Renames are not seen as writes, but every reader of the history has to
+    # see it changed
+    cursor.connection.written.update(SWAPPED_TABLES)
+    db.commit()
+  except Exception:
+    db.get().rollback()
+    raise
+  return trashed + moved
+
+# Drops the trash tables of a Db and reclaims their pages, on a background
+# thread so requests never wait for it. With an in-memory database (tests)
+# the work is done right away, as its only connection cannot be shared with
+# another thread.
+class Reclaimer:
+  def __init__(self, db, vacuum_pages=1000):
+    self.db = db
+    self.vacuum_pages = vacuum_pages  # Pages freed per incremental_vacuum step
+    self.runs = 0
+    self._lock = threading.Lock()
+    self._pending = False
+    self._thread = None
+    self._pid = os.getpid()
+
+  # Reclaim what is in the trash now, once whatever run is going finished
+  def schedule(self):
+    if self.db.pool.in_memory:
+      self.run()
+      return
+    with self._lock:
+      if self._pid != os.getpid():
+        # The reclaimer thread does not survive a fork
+        self._pid = os.getpid()
+        self._thread = None
+      self._pending = True
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._loop, name='history-reclaimer', daemon=True)
+        self._thread.start()
+
+  def _loop(self):
+    while True:
+      with self._lock:
+        if not self._pending:
+          self._thread = None
+          return
+        self._pending = False
+      try:
+        self.run()
+      except Exception:
+        logger.exception('Reclaiming the study history failed')
+
+  # Wait for the running reclamation, if any
+  def join(self, timeout=None):
+    thread = self._thread
+    if thread is not None:
+      thread.join(timeout)
+
+  def run(self):
+    connection = self.db.pool.acquire()
+    try:
+      for table in trash_tables(connection.cursor()):
+        connection.execute(f'DROP TABLE {table}')
+        connection.commit()
+
+      # Hand the free pages back a step at a time, so writers only ever wait
+      # for one step
+      if connection.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:  # INCREMENTAL
+        while connection.execute('PRAGMA freelist_count').fetchone()[0] > 0:
+          connection.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+          connection.commit()
+    finally:
+      self.db.pool.release(connection)
+    self.runs += 1
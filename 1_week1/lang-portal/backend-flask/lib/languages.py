@@ -0,0 +1,83 @@
+from flask import g, has_app_context
+
+from lib.encoding import RowShape
+
+# Languages the portal can serve.
+#
+# The schema of every language database is the same except for the words
+# table: each language declares the text columns of a word (the first one is
+# the word itself, the default sort) and whether words carry a JSON parts
+# column. Routes build their word SQL and JSON from these fields, SQL files
+# that differ per language live in sql/languages/<code>/ (see lib.statements)
+# and the seed word lists in seed_dir.
+class Language:
+  def __init__(self, code, name, word_fields, parts=False, seed_dir='seed'):
+    self.code = code
+    self.name = name
+    self.word_fields = tuple(word_fields)
+    self.parts = parts
+    self.seed_dir = seed_dir  # Where Db.init finds the word lists
+    self._shapes = {}
+
+  # The column the word listings sort by unless asked otherwise
+  @property
+  def default_sort(self):
+    return self.word_fields[0]
+
+  # 'w.kanji, w.romaji, w.english' for alias 'w'
+  def columns(self, alias):
+    return ', '.join(f'{alias}.{field}' for field in self.word_fields)
+
+  # JSON shape of a word: its id, text fields and the given extra columns,
+  # e.g. word_shape(correct_count='correct_count'). Shapes are kept, so their
+  # resolved column positions are reused across requests.
+  def word_shape(self, **extra):
+    key = tuple(extra.items())
+    shape = self._shapes.get(key)
+    if shape is None:
+      fields = {'id': 'id'}
+      fields.update((field, field) for field in self.word_fields)
+      fields.update(extra)
+      shape = self._shapes[key] = RowShape(**fields)
+    return shape
+
+  def __repr__(self):
+    return f'Language({self.code!r})'
+
+LANGUAGES = {
+  'ja': Language('ja', 'Japanese', ('kanji', 'romaji', 'english'), parts=True),
+  'fr': Language('fr', 'French', ('french', 'english'), seed_dir='seed/fr')
+}
+
+# The Db of every served language, standing in for a single Db.
+#
+# Attributes are looked up on the Db of the language of the current request:
+# the one picked by a /<lang>/... URL (kept in g.language), otherwise the
+# default language. Each Db has its own connection pool.
+class Databases:
+  def __init__(self, dbs, default):
+    self.dbs = dbs
+    self.default = dbs[default]
+
+  def current(self):
+    if has_app_context():
+      code = g.get('language')
+      if code is not None:
+        return self.dbs[code]
+    return self.default
+
+  def __getattr__(self, name):
+    return getattr(self.current(), name)
+
+  def __iter__(self):
+    return iter(self.dbs.values())
+
+  # Listeners hear about the commits of every language
+  def on_commit(self, listener):
+    for db in self.dbs.values():
+      db.on_commit(listener)
+
+  # The app context may have borrowed a connection from more than one pool
+  def close(self):
+    for db in self.dbs.values():
+      db.close()
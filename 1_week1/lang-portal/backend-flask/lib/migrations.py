@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Versioned schema migrations.
+#
+# The files in sql/migrations (with the overlays of the database's language,
+# see lib.statements) are applied in file name order. schema_migrations keeps
+# the version (file name) and the SHA-256 of the text of every applied
+# migration:
+#
+# - migrate() applies each pending migration in a transaction of its own,
+#   together with its schema_migrations row, so a migration that fails (or a
+#   process that dies halfway) leaves nothing behind and is simply applied
+#   again next time. The transaction is started with BEGIN IMMEDIATE, which
+#   waits (busy_timeout) for the writer of the moment instead of failing, and
+#   readers keep going under WAL while an index is being built.
+# - Already applied migrations are skipped, and checking costs one read of
+#   schema_migrations, whatever the size of the database.
+# - A migration file edited after it was applied, or an applied migration
+#   whose file is gone, raises MigrationError instead of leaving the schema
+#   and the files out of step unnoticed.
+#
+# Databases migrated before checksums were kept adopt the checksums of the
+# current files the first time.
+
+class MigrationError(Exception):
+  pass
+
+def checksum(sql):
+  return hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+# Split a script into its statements (trigger bodies included), dropping
+# what is left after the last one (comments)
+def split_statements(script):
+  statements = []
+  statement = ''
+  for line in script.splitlines(keepends=True):
+    statement += line
+    if sqlite3.complete_statement(statement):
+      statements.append(statement.strip())
+      statement = ''
+  return statements
+
+def _ensure_table(db, cursor):
+  cursor.execute(db.sql('setup/create_table_schema_migrations.sql'))
+  cursor.execute('PRAGMA table_info(schema_migrations)')
+  if 'checksum' not in [row['name'] for row in cursor.fetchall()]:
+    cursor.execute('ALTER TABLE schema_migrations ADD COLUMN checksum TEXT')
+
+# Versions of the migrations not applied yet, in order. Raises
+# MigrationError when applied migrations do not match their files.
+def pending(db, cursor):
+  migrations = {filename: checksum(db.sql('migrations/' + filename)) for filename in db.statements.files('migrations')}
+
+  cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'")
+  if cursor.fetchone() is None:
+    return list(migrations)
+  cursor.execute('SELECT * FROM schema_migrations')
+  applied = {row['version']: row['checksum'] if 'checksum' in row.keys() else None for row in cursor.fetchall()}
+
+  for version, applied_checksum in applied.items():
+    if version not in migrations:
+      raise MigrationError(f'Applied migration {version} has no file in sql/migrations')
+    if applied_checksum is not None and applied_checksum != migrations[version]:
+      raise MigrationError(f'Migration {version} was changed after it was applied')
+  return [version for version in migrations if version not in applied]
+
+# Apply the pending migrations. Returns the versions applied.
+def migrate(db, cursor):
+  _ensure_table(db, cursor)
+  if cursor.connection.in_transaction:
+    db.get().commit()
+  versions = pending(db, cursor)
+
+  # Adopt the checksums of migrations applied before they were kept
+  cursor.execute('SELECT version FROM schema_migrations WHERE checksum IS NULL')
+  unverified = [row['version'] for row in cursor.fetchall()]
+  if unverified:
+    cursor.executemany(
+      'UPDATE schema_migrations SET checksum = ? WHERE version = ?',
+      [(checksum(db.sql('migrations/' + version)), version) for version in unverified]
+    )
+    db.get().commit()
+
+  applied = []
+  for version in versions:
+    sql = db.sql('migrations/' + version)
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+      # Another process may have applied it while this one waited for the lock
+      cursor.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,))
+      if cursor.fetchone() is not None:
+        db.get().rollback()
+        continue
+      for statement in split_statements(sql):
+        cursor.execute(statement)
+      cursor.execute('INSERT INTO schema_migrations (version, checksum) VALUES (?, ?)', (version, checksum(sql)))
+      db.get().commit()
+    except Exception as e:
+      db.get().rollback()
+      raise MigrationError(f'Migration {version} failed: {e}') from e
+    applied.append(version)
+  return applied
+
+# Boot time check: raises MigrationError when migrations are pending or do
+# not match their files. A database without any table yet is left to be set
+# up (tests, `invoke init-db`).
+def check(db, cursor):
+  cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'")
+  if cursor.fetchone()[0] == 0:
+    return
+  versions = pending(db, cursor)
+  if versions:
+    raise MigrationError(
+      f'{db.database} has pending migrations ({", ".join(versions)}), '
+      'run `invoke migrate` or set MIGRATIONS to apply'
+    )
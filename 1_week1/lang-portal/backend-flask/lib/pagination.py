@@ -0,0 +1,99 @@
+import base64
+import json
+
+# Keyset (cursor) pagination.
+#
+# Instead of LIMIT/OFFSET, a page is requested relative to the sort key of a
+# row the client has already seen, so the query can seek straight to it on an
+# index and every page costs the same no matter how deep it is. Rows are
+# ordered by (sort column, id) so the key is unique even when sort values tie.
+#
+# Cursors are opaque to clients: base64 of the sort the cursor belongs to, the
+# direction to page in and the key of the boundary row.
+#
+# A cursor is exact as long as the sort values of the rows do not change
+# between pages. Sorts on derived values (review counters, the search rank)
+# can skip or repeat rows that moved across the boundary in the meantime.
+
+def encode_cursor(sort_by, order, direction, key):
+  payload = json.dumps([sort_by, order, direction, list(key)], separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    sort_by, order, direction, key = json.loads(base64.urlsafe_b64decode(padded))
+  except (ValueError, TypeError):
+    raise ValueError('Invalid cursor')
+  if direction not in ('next', 'prev') or not isinstance(key, list) or len(key) != 2:
+    raise ValueError('Invalid cursor')
+  return sort_by, order, direction, key
+
+# WHERE and ORDER BY clauses of a keyset query. They only depend on the sort,
+# the direction the index is walked in and whether there is a key to seek to,
+# so the statements can be built ahead of time (see lib.statements).
+def keyset_clauses(sort_expression, id_expression, descending, seek):
+  direction = 'DESC' if descending else 'ASC'
+  order_by = f'{sort_expression} {direction}, {id_expression} {direction}'
+  if not seek:
+    return '1 = 1', order_by
+  operator = '<' if descending else '>'
+  return f'({sort_expression}, {id_expression}) {operator} (?, ?)', order_by
+
+class Keyset:
+  def __init__(self, sort_by, order, sort_expression, id_expression, cursor=None):
+    self.sort_by = sort_by
+    self.order = order
+    self.sort_expression = sort_expression
+    self.id_expression = id_expression
+    self.direction = 'next'
+    self.key = None
+
+    if cursor:
+      cursor_sort_by, cursor_order, self.direction, self.key = decode_cursor(cursor)
+      # A cursor only makes sense for the sort it was issued for
+      if (cursor_sort_by, cursor_order) != (sort_by, order):
+        raise ValueError('Cursor does not match sort_by and order')
+
+  # Paging backwards walks the index in the opposite direction
+  def _descending(self):
+    return (self.order == 'desc') != (self.direction == 'prev')
+
+  # (descending, seek) picking the prebuilt statement for this page
+  def variant(self):
+    return self._descending(), self.key is not None
+
+  # Parameters of the seek condition
+  def params(self):
+    return [] if self.key is None else list(self.key)
+
+  # Condition selecting the rows after (or before) the cursor, with its params
+  def where(self):
+    where, _ = keyset_clauses(self.sort_expression, self.id_expression, *self.variant())
+    return where, self.params()
+
+  def order_by(self):
+    _, order_by = keyset_clauses(self.sort_expression, self.id_expression, *self.variant())
+    return order_by
+
+  # Trim rows fetched with LIMIT page_size + 1 down to the page and work out
+  # the cursors for its neighbours. key(row) returns (sort value, id), offset
+  # is the OFFSET used when the page was requested by number instead.
+  def page(self, rows, page_size, key, offset=0):
+    rows = list(rows)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if self.direction == 'prev':
+      rows.reverse()
+      has_next, has_prev = self.key is not None, has_more
+    else:
+      has_next, has_prev = has_more, self.key is not None or offset > 0
+
+    next_cursor = None
+    prev_cursor = None
+    if rows and has_next:
+      next_cursor = encode_cursor(self.sort_by, self.order, 'next', key(rows[-1]))
+    if rows and has_prev:
+      prev_cursor = encode_cursor(self.sort_by, self.order, 'prev', key(rows[0]))
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,178 @@
+import bisect
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+from lib.db import Cursor
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets, the last one is open
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# SQL profiling, turned on with SQL_PROFILING.
+#
+# While a profiler is set on Db, Db.cursor() hands out ProfilingCursors during
+# requests. They time every statement (execute plus fetching its rows) and
+# count its rows. At the end of the request the statements are added to a
+# histogram per statement, and the ones slower than slow_ms are logged with
+# their EXPLAIN QUERY PLAN. The response gets a Server-Timing header with the
+# time spent in SQL. Without a profiler none of this code runs.
+class SqlProfiler:
+  def __init__(self, slow_ms=100):
+    self.slow_ms = slow_ms
+    self._statements = {}
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    app.after_request(self.add_server_timing)
+    app.teardown_request(self.finish_request)
+
+  # Called by Db.cursor() while profiling, outside of requests (tasks,
+  # init) cursors are not profiled
+  def cursor(self, connection):
+    if not has_request_context():
+      return connection.cursor()
+    cursor = connection.cursor(ProfilingCursor)
+    cursor.profiler = self
+    return cursor
+
+  def start(self, sql, parameters, connection):
+    record = {'sql': sql, 'parameters': parameters, 'ms': 0.0, 'rows': 0, 'connection': connection}
+    g.setdefault('sql_queries', []).append(record)
+    return record
+
+  def add_server_timing(self, response):
+    queries = g.get('sql_queries', [])
+    if queries:
+      total = sum(record['ms'] for record in queries)
+      response.headers.add('Server-Timing', f'sql;dur={total:.2f};desc="{len(queries)} queries"')
+    return response
+
+  # Runs after streamed bodies are done, so their queries count too
+  def finish_request(self, exception=None):
+    queries = g.pop('sql_queries', [])
+    if not queries:
+      return
+    route = request.url_rule.rule if request.url_rule else request.path
+
+    with self._lock:
+      for record in queries:
+        self._add(' '.join(record['sql'].split()), route, record)
+
+    for record in queries:
+      if record['ms'] >= self.slow_ms:
+        self._log_slow(route, record)
+
+  def _add(self, statement, route, record):
+    stats = self._statements.get(statement)
+    if stats is None:
+      stats = self._statements[statement] = {
+        'count': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'rows': 0,
+        'routes': {},
+        'histogram': [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+      }
+    stats['count'] += 1
+    stats['total_ms'] += record['ms']
+    stats['max_ms'] = max(stats['max_ms'], record['ms'])
+    stats['rows'] += record['rows']
+    stats['routes'][route] = stats['routes'].get(route, 0) + 1
+    stats['histogram'][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, record['ms'])] += 1
+
+  def _log_slow(self, route, record):
+    try:
+      plan = [
+        row['detail'] for row in
+        record['connection'].execute('EXPLAIN QUERY PLAN ' + record['sql'], record['parameters']).fetchall()
+      ]
+    except Exception as e:
+      plan = [f'(no plan: {e})']
+    logger.warning(
+      'Slow query (%.1f ms, %d rows) in %s: %s\n  %s',
+      record['ms'], record['rows'], route, ' '.join(record['sql'].split()), '\n  '.join(plan)
+    )
+
+  # Per statement counters, the most expensive statements first
+  def stats(self):
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_BOUNDS_MS] + [f'>{HISTOGRAM_BOUNDS_MS[-1]}ms']
+    with self._lock:
+      statements = [
+        {
+          'sql': statement,
+          'count': stats['count'],
+          'total_ms': round(stats['total_ms'], 3),
+          'mean_ms': round(stats['total_ms'] / stats['count'], 3),
+          'max_ms': round(stats['max_ms'], 3),
+          'rows': stats['rows'],
+          'routes': dict(stats['routes']),
+          'histogram': dict(zip(labels, stats['histogram']))
+        }
+        for statement, stats in self._statements.items()
+      ]
+    statements.sort(key=lambda stats: stats['total_ms'], reverse=True)
+    return {'slow_ms': self.slow_ms, 'statements': statements}
+
+  def reset(self):
+    with self._lock:
+      self._statements = {}
+
+# Cursor that reports its statements to a SqlProfiler. The time and rows of
+# fetching results are added to the statement that produced them.
+class ProfilingCursor(Cursor):
+  def execute(self, sql, parameters=()):
+    self._record = self.profiler.start(sql, parameters, self.connection)
+    start = time.perf_counter()
+    try:
+      return super().execute(sql, parameters)
+    finally:
+      self._finish(start, self.rowcount)
+
+  def executemany(self, sql, seq_of_parameters):
+    seq_of_parameters = list(seq_of_parameters)
+    self._record = self.profiler.start(sql, seq_of_parameters[0] if seq_of_parameters else (), self.connection)
+    start = time.perf_counter()
+    try:
+      return super().executemany(sql, seq_of_parameters)
+    finally:
+      self._finish(start, self.rowcount)
+
+  def fetchone(self):
+    start = time.perf_counter()
+    row = super().fetchone()
+    self._finish(start, 1 if row is not None else 0)
+    return row
+
+  def fetchmany(self, size=None):
+    start = time.perf_counter()
+    rows = super().fetchmany(self.arraysize if size is None else size)
+    self._finish(start, len(rows))
+    return rows
+
+  def fetchall(self):
+    start = time.perf_counter()
+    rows = super().fetchall()
+    self._finish(start, len(rows))
+    return rows
+
+  def __next__(self):
+    start = time.perf_counter()
+    try:
+      row = super().__next__()
+    except StopIteration:
+      self._finish(start, 0)
+      raise
+    self._finish(start, 1)
+    return row
+
+  def _finish(self, start, rows):
+    record = getattr(self, '_record', None)
+    if record is None:
+      return
+    record['ms'] += (time.perf_counter() - start) * 1000
+    if rows > 0:
+      record['rows'] += rows
@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INSERT_REVIEW_SQL = '''
+  INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
+  VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+'''
+
+# Handed back for every submission, so callers can wait until their reviews
+# have been committed
+class Ticket:
+  def __init__(self, rows):
+    self.rows = rows
+    self.error = None
+    self._done = threading.Event()
+
+  def resolve(self, error=None):
+    self.error = error
+    self._done.set()
+
+  # Block until the reviews are committed. Raises if they could not be.
+  def wait(self, timeout=None):
+    if not self._done.wait(timeout):
+      raise TimeoutError('Timed out waiting for the review buffer to flush')
+    if self.error is not None:
+      raise self.error
+
+# Write-behind buffer in front of the word_review_items insert path.
+#
+# Reviews are queued in memory and a background thread writes everything that
+# is queued in one transaction (group commit) every flush_interval_ms, or as
+# soon as max_rows are waiting. The word_reviews/daily_activity triggers
+# update the aggregates inside that same transaction.
+#
+# durability:
+#   'sync'     - submitters wait for the commit that contains their reviews,
+#                so nothing acknowledged can be lost; concurrent submitters
+#                share one fsync.
+#   'buffered' - submitters return immediately; reviews of the last flush
+#                interval are lost if the process dies.
+#
+# The flusher writes through a connection of its own rather than a pooled
+# one: sync submitters hold their request's pooled connection while they
+# wait, and could otherwise take every connection the flush needs.
+class ReviewBuffer:
+  def __init__(self, db, flush_interval_ms=50, max_rows=500, durability='sync', wait_timeout=10.0):
+    if durability not in ('sync', 'buffered'):
+      raise ValueError(f'Unknown review buffer durability: {durability}')
+    self.db = db
+    self.flush_interval = flush_interval_ms / 1000
+    self.max_rows = max_rows
+    self.durability = durability
+    self.wait_timeout = wait_timeout  # Longest a sync submitter waits for its commit
+    self.flushes = 0
+    self.rows_written = 0
+    self._cond = threading.Condition()
+    self._reset()
+
+  def _reset(self):
+    self._pid = os.getpid()
+    self._pending = []
+    self._pending_rows = 0
+    self._closing = False
+    self._thread = None
+    self._connection = None
+
+  # Queue rows of (word_id, study_session_id, correct, created_at or None)
+  def submit(self, rows):
+    ticket = Ticket(list(rows))
+    with self._cond:
+      if self._pid != os.getpid():
+        # The flusher thread does not survive a fork
+        self._reset()
+      if self._closing:
+        raise RuntimeError('Review buffer is closed')
+      if self._thread is None or not self._thread.is_alive():
+        self._thread = threading.Thread(target=self._run, name='review-buffer', daemon=True)
+        self._thread.start()
+      self._pending.append(ticket)
+      self._pending_rows += len(ticket.rows)
+      self._cond.notify()
+    return ticket
+
+  def _run(self):
+    while True:
+      with self._cond:
+        while not self._pending and not self._closing:
+          self._cond.wait()
+        if not self._pending:
+          return
+
+        # Give other submitters until the end of the interval to join this
+        # commit, unless the batch is already full
+        deadline = time.monotonic() + self.flush_interval
+        while self._pending_rows < self.max_rows and not self._closing:
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            break
+          self._cond.wait(remaining)
+
+        batch = self._pending
+        self._pending = []
+        self._pending_rows = 0
+
+      self._write(batch)
+
+  def _write(self, batch):
+    connection = None
+    try:
+      if self._connection is None:
+        self._connection = self.db.pool.connect()
+      connection = self._connection
+      cursor = connection.cursor()
+      try:
+        cursor.executemany(INSERT_REVIEW_SQL, [row for ticket in batch for row in ticket.rows])
+        connection.commit()
+        errors = {}
+      except Exception:
+        # Retry ticket by ticket, each in its own savepoint inside one
+        # transaction, so one bad submission does not take the rest of the
+        # batch down with it. The explicit BEGIN keeps the RELEASEs from
+        # committing on their own: the commit() below has to bump the data
+        # versions and tell the commit listeners.
+        connection.rollback()
+        errors = {}
+        cursor.execute('BEGIN')
+        for ticket in batch:
+          cursor.execute('SAVEPOINT ticket')
+          try:
+            cursor.executemany(INSERT_REVIEW_SQL, ticket.rows)
+          except Exception as e:
+            cursor.execute('ROLLBACK TO ticket')
+            errors[id(ticket)] = e
+          cursor.execute('RELEASE ticket')
+        connection.commit()
+    except Exception as e:
+      logger.exception('Review buffer flush failed')
+      if connection is not None:
+        self._drop_connection(connection)
+      for ticket in batch:
+        ticket.resolve(e)
+      return
+
+    self.flushes += 1
+    for ticket in batch:
+      error = errors.get(id(ticket))
+      if error is not None:
+        logger.error('Dropped reviews %r: %s', ticket.rows, error)
+      else:
+        self.rows_written += len(ticket.rows)
+      ticket.resolve(error)
+
+  # After a failed flush the next one starts over with a new connection
+  def _drop_connection(self, connection):
+    self._connection = None
+    try:
+      connection.rollback()
+      if not self.db.pool.in_memory:
+        connection.close()
+    except Exception:
+      pass
+
+  # Write everything still queued and stop the flusher
+  def close(self):
+    with self._cond:
+      self._closing = True
+      self._cond.notify()
+      thread = self._thread
+    if thread is not None and self._pid == os.getpid():
+      thread.join()
+      connection, self._connection = self._connection, None
+      if connection is not None and not self.db.pool.in_memory:
+        connection.close()
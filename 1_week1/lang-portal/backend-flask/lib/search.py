@@ -0,0 +1,12 @@
+# Turn what a user typed into an FTS5 MATCH expression.
+#
+# Every whitespace separated term becomes a quoted prefix query, so FTS5
+# syntax in the input ("AND", "*", column filters, stray quotes) is searched
+# for literally instead of raising a syntax error, and the terms are ANDed
+# together. Returns None when there is nothing to search for.
+def match_expression(query):
+  terms = [term.replace('"', '""') for term in query.split()]
+  terms = [term for term in terms if term]
+  if not terms:
+    return None
+  return ' '.join(f'"{term}"*' for term in terms)
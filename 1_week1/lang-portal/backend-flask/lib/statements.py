@@ -0,0 +1,187 @@
+import os
+import re
+import sqlite3
+import threading
+
+from lib.pagination import keyset_clauses
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+# Files in sql/setup that create the base schema, in creation order
+SETUP_TABLES = [
+  'create_table_words',
+  'create_table_word_reviews',
+  'create_table_word_review_items',
+  'create_table_groups',
+  'create_table_word_groups',
+  'create_table_study_activities',
+  'create_table_study_sessions',
+  'create_table_schema_migrations'
+]
+
+# String literals, quoted identifiers and comments, which may contain a '?'
+# that is not a parameter
+NOT_A_PARAMETER = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+class StatementError(Exception):
+  pass
+
+def count_parameters(sql):
+  return NOT_A_PARAMETER.sub('', sql).count('?')
+
+# Registry of the SQL the app runs, one per language.
+#
+# Every file under sql/ is read once, when the registry is created, and
+# Db.sql() serves them from memory. A file in sql/languages/<code>/ takes the
+# place of the file with the same path in sql/ for that language (e.g. the
+# words table and its search index).
+#
+# Route modules register their queries by name with a function decorated
+# with @definitions, which is called with each language's registry and
+# Language, so word columns can differ. Queries with a user chosen sort are
+# expanded up front into one statement per sort, order and (for keyset pages)
+# direction, so a request only looks its statement up. The SQL text of a
+# variant is always the same string, which keeps sqlite3's per-connection
+# statement cache hitting.
+#
+# check() prepares every statement (with EXPLAIN, so nothing runs) against a
+# scratch in-memory database built from the setup scripts and migrations and
+# raises StatementError on the first one that does not compile, so a typo
+# stops the app at boot instead of failing a request.
+class Statements:
+  def __init__(self, language, root=SQL_DIR):
+    self.language = language
+    self.root = root
+    self._files = {}
+    self._statements = {}  # (name, variant) -> sql
+    self._applied = 0  # Definitions run on this registry so far
+    self._version = 0  # Bumped on every definition
+    self._checked = None
+    self._lock = threading.RLock()
+    self.load()
+
+  def load(self):
+    files = {}
+    for directory, _, filenames in os.walk(self.root):
+      for filename in filenames:
+        if not filename.endswith('.sql'):
+          continue
+        path = os.path.join(directory, filename)
+        with open(path, 'r') as file:
+          files[os.path.relpath(path, self.root).replace(os.sep, '/')] = file.read()
+    self._files = files
+
+  # Contents of sql/<path> for this language
+  def file(self, path):
+    for candidate in (f'languages/{self.language.code}/{path}', path):
+      if candidate in self._files:
+        return self._files[candidate]
+    raise FileNotFoundError(f'No SQL file {path!r} in {self.root}')
+
+  # The files in sql/<directory> for this language, in name order
+  def files(self, directory):
+    names = set()
+    for prefix in (directory.rstrip('/') + '/', f'languages/{self.language.code}/{directory.rstrip("/")}/'):
+      names.update(
+        path[len(prefix):] for path in self._files
+        if path.startswith(prefix) and '/' not in path[len(prefix):]
+      )
+    return sorted(names)
+
+  def define(self, name, sql):
+    self._add(name, (), sql)
+
+  # template has an {order_by} placeholder; columns maps each sort_by to the
+  # expression it sorts on. Look up with get(name, sort_by, order).
+  def define_sorted(self, name, template, columns):
+    for sort_by, expression in columns.items():
+      for order in ('asc', 'desc'):
+        self._add(name, (sort_by, order), template.format(order_by=f'{expression} {order.upper()}'))
+
+  # template has {where} and {order_by} placeholders for a keyset page (see
+  # lib.pagination). Look up with keyset(name, keyset).
+  def define_keyset(self, name, template, sort_expressions, id_expression):
+    for sort_by, expression in sort_expressions.items():
+      for descending in (False, True):
+        for seek in (False, True):
+          where, order_by = keyset_clauses(expression, id_expression, descending, seek)
+          self._add(name, (sort_by, descending, seek), template.format(where=where, order_by=order_by))
+
+  def _add(self, name, variant, sql):
+    with self._lock:
+      self._statements[(name, variant)] = sql
+      self._version += 1
+
+  # Run the definitions registered since the last look
+  def _define(self):
+    if self._applied == len(DEFINITIONS):
+      return
+    with self._lock:
+      while self._applied < len(DEFINITIONS):
+        DEFINITIONS[self._applied](self, self.language)
+        self._applied += 1
+
+  def get(self, name, *variant):
+    self._define()
+    try:
+      return self._statements[(name, variant)]
+    except KeyError:
+      raise KeyError(f'No statement {name!r} for {variant!r}')
+
+  def keyset(self, name, keyset):
+    return self.get(name, keyset.sort_by, *keyset.variant())
+
+  def __len__(self):
+    self._define()
+    return len(self._statements)
+
+  # Prepare every statement registered since the last check
+  def check(self):
+    self._define()
+    with self._lock:
+      if self._checked == self._version:
+        return
+      connection = sqlite3.connect(':memory:')
+      try:
+        self._build_schema(connection)
+        for (name, variant), sql in self._statements.items():
+          try:
+            connection.execute('EXPLAIN ' + sql, [None] * count_parameters(sql))
+          except sqlite3.Error as e:
+            label = name + (f' {variant!r}' if variant else '')
+            raise StatementError(f'Statement {label} does not prepare: {e}')
+      finally:
+        connection.close()
+      self._checked = self._version
+
+  # Setup scripts, migrations and maintenance scripts all have to run on an
+  # empty database
+  def _build_schema(self, connection):
+    scripts = [f'setup/{name}.sql' for name in SETUP_TABLES]
+    scripts.extend('migrations/' + filename for filename in self.files('migrations'))
+    scripts.extend('maintenance/' + filename for filename in self.files('maintenance'))
+    for path in scripts:
+      try:
+        connection.executescript(self.file(path))
+      except sqlite3.Error as e:
+        raise StatementError(f'SQL file {path} does not run: {e}')
+
+# Functions define(statements, language) registering statements
+DEFINITIONS = []
+
+def definitions(define):
+  DEFINITIONS.append(define)
+  return define
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+# The registry of a language, created (and its files read) once per process
+def for_language(language):
+  registry = _registries.get(language.code)
+  if registry is None:
+    with _registries_lock:
+      registry = _registries.get(language.code)
+      if registry is None:
+        registry = _registries[language.code] = Statements(language)
+  return registry
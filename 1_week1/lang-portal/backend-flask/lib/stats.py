@@ -0,0 +1,113 @@
+import threading
+from datetime import datetime, timezone
+
+# Everything /dashboard/stats reports, in one statement. The per-word figures
+# come from the word_reviews counters (one row per studied word) and the
+# session figures from the daily_activity rollup (one row per day and group),
+# both kept exact by triggers, instead of re-aggregating the whole history.
+#
+# Like the baseline queries, a day counts as active for the streak and for
+# active_groups when a study session was started on it; days that only have
+# reviews (of a session started earlier) don't. The streak walks back one day
+# at a time from the latest active day, so it costs one primary key lookup per
+# day of the streak. It only counts while it is still going: unless that day
+# is today or yesterday the streak is 0, where the baseline counted every
+# active day that followed another one, however long ago.
+DASHBOARD_STATS_SQL = '''
+  WITH RECURSIVE word_stats AS (
+    SELECT
+      COUNT(*) AS total_words,
+      SUM(
+        correct_count + wrong_count >= 5
+        AND correct_count * 1.0 / (correct_count + wrong_count) >= 0.8
+      ) AS mastered_words,
+      SUM(correct_count) * 1.0 / SUM(correct_count + wrong_count) AS success_rate
+    FROM word_reviews
+    WHERE correct_count + wrong_count > 0
+  ),
+  streak(study_date) AS (
+    SELECT * FROM (
+      SELECT study_date
+      FROM daily_activity
+      WHERE study_date >= date('now', '-1 day') AND sessions_count > 0
+      ORDER BY study_date DESC
+      LIMIT 1
+    )
+    UNION ALL
+    SELECT date(streak.study_date, '-1 day')
+    FROM streak
+    WHERE EXISTS (
+      SELECT 1 FROM daily_activity
+      WHERE study_date = date(streak.study_date, '-1 day') AND sessions_count > 0
+    )
+  )
+  SELECT
+    (SELECT COUNT(*) FROM words) AS total_vocabulary,
+    word_stats.total_words AS total_words_studied,
+    COALESCE(word_stats.mastered_words, 0) AS mastered_words,
+    COALESCE(word_stats.success_rate, 0) AS success_rate,
+    (SELECT COALESCE(SUM(sessions_count), 0) FROM daily_activity) AS total_sessions,
+    (
+      SELECT COUNT(DISTINCT group_id)
+      FROM daily_activity
+      WHERE study_date >= date('now', '-30 days') AND sessions_count > 0
+    ) AS active_groups,
+    (SELECT COUNT(*) FROM streak) AS current_streak
+  FROM word_stats
+'''
+
+# Tables the dashboard stats are derived from
+DASHBOARD_STATS_TABLES = {'words', 'word_reviews', 'word_review_items', 'study_sessions', 'daily_activity'}
+
+# The streak and the active groups count back from today, so the stats change
+# at midnight (UTC, like SQLite's date('now')) even when no data does
+def utc_today():
+  return datetime.now(timezone.utc).date().isoformat()
+
+# In-process cache of the dashboard stats. The value is computed on the first
+# request and kept together with the data versions of the tables it is
+# derived from (see Db.data_versions) and the day it was computed on. It is
+# served from memory as long as both still match, so commits made by other
+# processes and the change of day are seen on the next request, and is
+# dropped right away when a commit of this process writes to those tables.
+class DashboardStats:
+  def __init__(self, db):
+    self.db = db
+    self._value = None
+    self._state = None
+    self._generation = 0
+    self._lock = threading.Lock()
+    db.on_commit(self._on_commit)
+
+  def _on_commit(self, tables):
+    if tables & DASHBOARD_STATS_TABLES:
+      self.invalidate()
+
+  def invalidate(self):
+    with self._lock:
+      self._generation += 1
+      self._value = None
+
+  def _current_state(self):
+    versions = self.db.data_versions(DASHBOARD_STATS_TABLES)
+    if versions is not None:
+      versions = tuple(sorted((table, version) for table, (version, _) in versions.items()))
+    return versions, utc_today()
+
+  def get(self):
+    state = self._current_state()
+    with self._lock:
+      if self._value is not None and self._state == state:
+        return self._value
+      generation = self._generation
+
+    cursor = self.db.cursor()
+    cursor.execute(DASHBOARD_STATS_SQL)
+    value = dict(cursor.fetchone())
+
+    # Don't keep a value computed while a write was being committed
+    with self._lock:
+      if generation == self._generation:
+        self._value = value
+        self._state = state
+    return value
@@ -1,31 +1,37 @@
-import sqlite3
+import argparse
 import os
+import sys
 
-def run_migrations():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
+from flask import Flask
+
+from lib.db import Db
+from lib.languages import LANGUAGES
+from lib.migrations import MigrationError, check
+
+# Apply (or with --check only verify) the migrations of the app's database,
+# the same way `invoke migrate` and MIGRATIONS=apply do, see lib.migrations
+def run_migrations(database, language='ja', check_only=False):
+    db = Db(database=database, language=LANGUAGES[language])
+    app = Flask(__name__)
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
-        print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        with app.app_context():
+            if check_only:
+                check(db, db.cursor())
+                print("Migrations are up to date")
+            else:
+                db.migrate(db.cursor())
+                print("Migrations completed successfully")
     finally:
-        conn.close()
+        db.pool.close()
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description='Apply the schema migrations in sql/migrations')
+    parser.add_argument('--database', default=os.environ.get('LANG_PORTAL_DATABASE', 'words.db'))
+    parser.add_argument('--lang', default='ja', choices=sorted(LANGUAGES))
+    parser.add_argument('--check', action='store_true', help='Only fail when migrations are pending or were changed')
+    args = parser.parse_args()
+    try:
+        run_migrations(args.database, args.lang, args.check)
+    except MigrationError as e:
+        print(f"Error running migrations: {e}")
+        sys.exit(1)
@@ -0,0 +1,27 @@
+from flask import jsonify, request
+
+# Introspection routes for tuning, only loaded with DEBUG_ENDPOINTS enabled
+def load(app):
+  # Endpoint: GET /_debug/cache with the result cache counters
+  @app.route('/_debug/cache', methods=['GET'])
+  def get_cache_stats():
+    return jsonify(app.result_cache.stats())
+
+  # Endpoint: GET /_debug/sql with the per statement timings collected while
+  # SQL_PROFILING is on, POST /_debug/sql/reset to start over
+  @app.route('/_debug/sql', methods=['GET'])
+  def get_sql_stats():
+    if app.db.profiler is None:
+      return jsonify({"error": "SQL profiling is disabled"}), 404
+    stats = app.db.profiler.stats()
+    limit = request.args.get('limit', type=int)
+    if limit:
+      stats['statements'] = stats['statements'][:limit]
+    return jsonify(stats)
+
+  @app.route('/_debug/sql/reset', methods=['POST'])
+  def reset_sql_stats():
+    if app.db.profiler is None:
+      return jsonify({"error": "SQL profiling is disabled"}), 404
+    app.db.profiler.reset()
+    return jsonify({"message": "SQL statistics reset"})
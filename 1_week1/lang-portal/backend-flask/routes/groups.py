@@ -1,10 +1,151 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, Response, stream_with_context
 from flask_cors import cross_origin
 import json
 
+from lib.cache import cached
+from lib.conditional import conditional
+from lib.encoding import RowShape
+from lib.pagination import Keyset
+from lib.statements import definitions
+
+# Sortable columns of the group word listing (the word fields of the
+# language plus the review counters) and the expressions they sort on
+def word_sort_expressions(language):
+  expressions = {field: f'w.{field}' for field in language.word_fields}
+  expressions['correct_count'] = 'COALESCE(wr.correct_count, 0)'
+  expressions['wrong_count'] = 'COALESCE(wr.wrong_count, 0)'
+  return expressions
+
+# Sortable columns of a group's study sessions, by the frontend's sort keys
+SESSION_SORT_COLUMNS = {
+  'created_at': 's.created_at',
+  'startTime': 's.created_at',
+  'endTime': 'end_time',
+  'activityName': 'a.name',
+  'groupName': 'g.name',
+  'reviewItemsCount': 's.review_items_count'
+}
+
+# JSON shapes of the listed groups and study sessions
+GROUP_JSON = RowShape(id='id', group_name='name', word_count='words_count')
+SESSION_JSON = RowShape(
+  id='id',
+  group_id='group_id',
+  group_name='group_name',
+  study_activity_id='study_activity_id',
+  activity_name='activity_name',
+  start_time='start_time',
+  end_time='end_time',
+  review_items_count='review_items_count'
+)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Most words /groups/<id>/due hands out at once
+MAX_DUE_WORDS = 100
+
+@definitions
+def define_statements(statements, language):
+  statements.define_sorted('groups.list', '''
+    SELECT id, name, words_count
+    FROM groups
+    ORDER BY {order_by}
+    LIMIT ? OFFSET ?
+  ''', {'name': 'name', 'words_count': 'words_count'})
+
+  statements.define_keyset('groups.words', '''
+    SELECT w.*, 
+           COALESCE(wr.correct_count, 0) as correct_count,
+           COALESCE(wr.wrong_count, 0) as wrong_count
+    FROM words w
+    JOIN word_groups wg ON w.id = wg.word_id
+    LEFT JOIN word_reviews wr ON w.id = wr.word_id
+    WHERE wg.group_id = ? AND {where}
+    ORDER BY {order_by}
+    LIMIT ? OFFSET ?
+  ''', word_sort_expressions(language), 'w.id')
+
+  # Words of a group in id order, for the raw and NDJSON exports
+  statements.define('groups.words_raw', f'''
+    SELECT w.id, {language.columns('w')}{', w.parts' if language.parts else ''}
+    FROM word_groups wg
+    JOIN words w ON w.id = wg.word_id
+    WHERE wg.group_id = ?
+    ORDER BY wg.word_id
+  ''')
+
+  # The due queue of a group, read in order off idx_word_group_schedule_due:
+  # words whose review is due, the longest overdue first, then words never
+  # reviewed
+  statements.define('groups.due', f'''
+    SELECT w.id, {language.columns('w')}, q.next_due_at
+    FROM word_group_schedule q
+    JOIN words w ON w.id = q.word_id
+    WHERE q.group_id = ? AND q.next_due_at <= datetime('now')
+    ORDER BY q.next_due_at
+    LIMIT ?
+  ''')
+  statements.define('groups.new', f'''
+    SELECT w.id, {language.columns('w')}, q.next_due_at
+    FROM word_group_schedule q
+    JOIN words w ON w.id = q.word_id
+    WHERE q.group_id = ? AND q.next_due_at IS NULL
+    ORDER BY q.word_id
+    LIMIT ?
+  ''')
+
+  # The end time and review count are kept on study_sessions by a trigger;
+  # sessions without reviews end 30 minutes after they started.
+  statements.define_sorted('groups.study_sessions', '''
+    SELECT 
+      s.id,
+      s.group_id,
+      s.study_activity_id,
+      s.created_at as start_time,
+      COALESCE(s.last_activity_at, datetime(s.created_at, '+30 minutes')) as end_time,
+      a.name as activity_name,
+      g.name as group_name,
+      s.review_items_count
+    FROM study_sessions s
+    JOIN study_activities a ON s.study_activity_id = a.id
+    JOIN groups g ON s.group_id = g.id
+    WHERE s.group_id = ?
+    ORDER BY {order_by}
+    LIMIT ? OFFSET ?
+  ''', SESSION_SORT_COLUMNS)
+
+# NDJSON is chosen with ?format=ndjson or by preferring it in the Accept header
+def wants_ndjson():
+  format = request.args.get('format')
+  if format:
+    return format == 'ndjson'
+  best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+  return best == NDJSON_MIMETYPE
+
 def load(app):
+  # Yield the words of a group as NDJSON lines, fetching rows lazily. The
+  # stored parts are already JSON, so they are spliced in as is; raw newlines
+  # can only be whitespace in JSON text and are flattened to keep one line
+  def iter_group_words_ndjson(group_id):
+    cursor = app.db.cursor()
+    language = app.db.language
+    shape = language.word_shape()
+    cursor.execute(app.db.statements.get('groups.words_raw'), (group_id,))
+    for row in cursor:
+      word = json.dumps(shape.dict(row), ensure_ascii=False)
+      if not language.parts:
+        yield word + '\n'
+        continue
+      parts = row["parts"]
+      if '\n' in parts or '\r' in parts:
+        parts = parts.replace('\r', ' ').replace('\n', ' ')
+      yield f'{word[:-1]}, "parts": {parts}}}\n'
+
+
   @app.route('/groups', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
+  @cached('groups')
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -26,12 +167,7 @@ def load(app):
         order = 'asc'
 
       # Query to fetch groups with sorting and the cached word count
-      cursor.execute(f'''
-        SELECT id, name, words_count
-        FROM groups
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (groups_per_page, offset))
+      cursor.execute(app.db.statements.get('groups.list', sort_by, order), (groups_per_page, offset))
 
       groups = cursor.fetchall()
 
@@ -40,18 +176,9 @@ def load(app):
       total_groups = cursor.fetchone()[0]
       total_pages = (total_groups + groups_per_page - 1) // groups_per_page
 
-      # Format the response
-      groups_data = []
-      for group in groups:
-        groups_data.append({
-          "id": group["id"],
-          "group_name": group["name"],
-          "word_count": group["words_count"]
-        })
-
       # Return groups and pagination metadata
       return jsonify({
-        'groups': groups_data,
+        'groups': GROUP_JSON.rows(groups),
         'total_pages': total_pages,
         'current_page': page
       })
@@ -60,6 +187,8 @@ def load(app):
 
   @app.route('/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
+  @cached('groups')
   def get_group(id):
     try:
       cursor = app.db.cursor()
@@ -75,16 +204,15 @@ def load(app):
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      return jsonify({
-        "id": group["id"],
-        "group_name": group["name"],
-        "word_count": group["words_count"]
-      })
+      return jsonify(GROUP_JSON.dict(group))
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Pass ?cursor=<next_cursor|prev_cursor> from a previous response to page by
+  # keyset instead of ?page=
   @app.route('/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups', 'words', 'word_reviews')
   def get_group_words(id):
     try:
       cursor = app.db.cursor()
@@ -93,18 +221,25 @@ def load(app):
       page = int(request.args.get('page', 1))
       words_per_page = 10
       offset = (page - 1) * words_per_page
+      page_cursor = request.args.get('cursor')
 
       # Get sorting parameters
-      sort_by = request.args.get('sort_by', 'kanji')
+      language = app.db.language
+      sort_columns = word_sort_expressions(language)
+      sort_by = request.args.get('sort_by', language.default_sort)
       order = request.args.get('order', 'asc')
 
       # Validate sort parameters
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
-        sort_by = 'kanji'
+      if sort_by not in sort_columns:
+        sort_by = language.default_sort
       if order not in ['asc', 'desc']:
         order = 'asc'
 
+      try:
+        keyset = Keyset(sort_by, order, sort_columns[sort_by], 'w.id', page_cursor)
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
       # First, check if the group exists
       cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
       group = cursor.fetchone()
@@ -112,52 +247,48 @@ def load(app):
         return jsonify({"error": "Group not found"}), 404
 
       # Query to fetch words with pagination and sorting
-      cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
-        FROM words w
-        JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
+      cursor.execute(
+        app.db.statements.keyset('groups.words', keyset),
+        (id, *keyset.params(), words_per_page + 1, 0 if page_cursor else offset)
+      )
       
-      words = cursor.fetchall()
+      words, next_cursor, prev_cursor = keyset.page(
+        cursor.fetchall(),
+        words_per_page,
+        key=lambda word: (word[sort_by], word["id"]),
+        offset=0 if page_cursor else offset
+      )
 
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      result = {
+        'words': language.word_shape(correct_count='correct_count', wrong_count='wrong_count').rows(words),
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+      }
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      # Keyset pages only pay for the count when the client asks for it
+      if not page_cursor or request.args.get('with_total') in ('1', 'true'):
+        # Get total words count for pagination
+        cursor.execute('''
+          SELECT COUNT(*) 
+          FROM word_groups 
+          WHERE group_id = ?
+        ''', (id,))
+        total_words = cursor.fetchone()[0]
+        result['total_words'] = total_words
 
-      return jsonify({
-        'words': words_data,
-        'total_pages': total_pages,
-        'current_page': page
-      })
+      if not page_cursor:
+        result['total_pages'] = (total_words + words_per_page - 1) // words_per_page
+        result['current_page'] = page
+
+      return jsonify(result)
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   # todo GET /groups/:id/words/raw
   @app.route('/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
+  # JSON and NDJSON are tagged apart, as clients may keep both
+  @conditional('groups', 'word_groups', 'words', vary=wants_ndjson, vary_header='Accept')
   def get_group_words_raw(id):
     try:
       cursor = app.db.cursor()
@@ -168,35 +299,64 @@ def load(app):
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      # SQL query to fetch words along with group information
-      cursor.execute('''
-        SELECT g.id as group_id, g.name as group_name, w.*
-        FROM groups g
-        JOIN word_groups wg ON g.id = wg.group_id
-        JOIN words w ON w.id = wg.word_id
-        WHERE g.id = ?;
-      ''', (id,))
+      # Stream one word per line when asked for NDJSON
+      if wants_ndjson():
+        return Response(
+          stream_with_context(iter_group_words_ndjson(id)),
+          mimetype=NDJSON_MIMETYPE
+        )
+
+      # SQL query to fetch the words of the group
+      language = app.db.language
+      cursor.execute(app.db.statements.get('groups.words_raw'), (id,))
       
       data = cursor.fetchall()
       
       # Format the response
-      result = {
+      words = language.word_shape().rows(data)
+      if language.parts:
+        for word, row in zip(words, data):
+          word["parts"] = json.loads(row["parts"])  # Deserialize 'parts' field
+
+      return jsonify({
         "group_id": id,
-        "group_name": data[0]["group_name"] if data else group["name"],
-        "words": []
-      }
-      
-      for row in data:
-        word = {
-          "id": row["id"],
-          "kanji": row["kanji"],
-          "romaji": row["romaji"],
-          "english": row["english"],
-          "parts": json.loads(row["parts"])  # Deserialize 'parts' field
-        }
-        result["words"].append(word)
-      
-      return jsonify(result)
+        "group_name": group["name"],
+        "words": words
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # The next words of the group to study, by the spaced repetition schedule
+  # kept by the review triggers (see migrations/0008_word_schedule.sql): up to
+  # ?limit= due words, topped up with new ones. Not cached, what is due
+  # changes with the clock.
+  @app.route('/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      cursor = app.db.cursor()
+
+      limit = request.args.get('limit', 20, type=int)
+      limit = max(1, min(limit, MAX_DUE_WORDS))
+
+      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
+      group = cursor.fetchone()
+      if not group:
+        return jsonify({"error": "Group not found"}), 404
+
+      cursor.execute(app.db.statements.get('groups.due'), (id, limit))
+      words = cursor.fetchall()
+      due_count = len(words)
+      if len(words) < limit:
+        cursor.execute(app.db.statements.get('groups.new'), (id, limit - len(words)))
+        words.extend(cursor.fetchall())
+
+      return jsonify({
+        "group_id": id,
+        "group_name": group["name"],
+        "due_count": due_count,
+        "words": app.db.language.word_shape(next_due_at='next_due_at').rows(words)
+      })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
@@ -215,17 +375,11 @@ def load(app):
       sort_by = request.args.get('sort_by', 'created_at')
       order = request.args.get('order', 'desc')  # Default to newest first
 
-      # Map frontend sort keys to database columns
-      sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
-        'activityName': 'a.name',
-        'groupName': 'g.name',
-        'reviewItemsCount': 'review_count'
-      }
-
-      # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      # Unknown sort keys fall back to created_at
+      if sort_by not in SESSION_SORT_COLUMNS:
+        sort_by = 'created_at'
+      if order not in ['asc', 'desc']:
+        order = 'desc'
 
       # Get total count for pagination
       cursor.execute('''
@@ -236,55 +390,13 @@ def load(app):
       total_sessions = cursor.fetchone()[0]
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
-      cursor.execute(f'''
-        SELECT 
-          s.id,
-          s.group_id,
-          s.study_activity_id,
-          s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
-          a.name as activity_name,
-          g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
-        FROM study_sessions s
-        JOIN study_activities a ON s.study_activity_id = a.id
-        JOIN groups g ON s.group_id = g.id
-        WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, sessions_per_page, offset))
+      # Get study sessions for this group
+      cursor.execute(app.db.statements.get('groups.study_sessions', sort_by, order), (id, sessions_per_page, offset))
       
       sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
-        })
 
       return jsonify({
-        'study_sessions': sessions_data,
+        'study_sessions': SESSION_JSON.rows(sessions),
         'total_pages': total_pages,
         'current_page': page
       })
@@ -2,23 +2,39 @@ from flask import jsonify, request
 from flask_cors import cross_origin
 import math
 
+from lib.cache import cached
+from lib.conditional import conditional
+from lib.encoding import RowShape
+
+# JSON shapes of an activity, a study session and a group
+ACTIVITY_JSON = RowShape(id='id', title='name', launch_url='url', preview_url='preview_url')
+SESSION_JSON = RowShape(
+    id='id',
+    group_id='group_id',
+    group_name='group_name',
+    activity_id='activity_id',
+    activity_name='activity_name',
+    start_time='created_at',
+    end_time='end_time',
+    review_items_count='review_items_count'
+)
+GROUP_JSON = RowShape(id='id', name='name')
+
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
+    @cached('study_activities')
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
         activities = cursor.fetchall()
         
-        return jsonify([{
-            'id': activity['id'],
-            'title': activity['name'],
-            'launch_url': activity['url'],
-            'preview_url': activity['preview_url']
-        } for activity in activities])
+        return jsonify(ACTIVITY_JSON.rows(activities))
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -27,12 +43,7 @@ def load(app):
         if not activity:
             return jsonify({'error': 'Activity not found'}), 404
             
-        return jsonify({
-            'id': activity['id'],
-            'title': activity['name'],
-            'launch_url': activity['url'],
-            'preview_url': activity['preview_url']
-        })
+        return jsonify(ACTIVITY_JSON.dict(activity))
 
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
@@ -66,30 +77,20 @@ def load(app):
                 g.name as group_name,
                 sa.name as activity_name,
                 ss.created_at,
+                COALESCE(ss.last_activity_at, ss.created_at) as end_time,
                 ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
+                ss.review_items_count
             FROM study_sessions ss
             JOIN groups g ON g.id = ss.group_id
             JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
             WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
             ORDER BY ss.created_at DESC
             LIMIT ? OFFSET ?
         ''', (id, per_page, offset))
         sessions = cursor.fetchall()
 
         return jsonify({
-            'items': [{
-                'id': session['id'],
-                'group_id': session['group_id'],
-                'group_name': session['group_name'],
-                'activity_id': session['activity_id'],
-                'activity_name': session['activity_name'],
-                'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-                'review_items_count': session['review_items_count']
-            } for session in sessions],
+            'items': SESSION_JSON.rows(sessions),
             'total': total_count,
             'page': page,
             'per_page': per_page,
@@ -98,6 +99,8 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'groups')
+    @cached('study_activities', 'groups')
     def get_study_activity_launch_data(id):
         cursor = app.db.cursor()
         
@@ -113,14 +116,6 @@ def load(app):
         groups = cursor.fetchall()
         
         return jsonify({
-            'activity': {
-                'id': activity['id'],
-                'title': activity['name'],
-                'launch_url': activity['url'],
-                'preview_url': activity['preview_url']
-            },
-            'groups': [{
-                'id': group['id'],
-                'name': group['name']
-            } for group in groups]
+            'activity': ACTIVITY_JSON.dict(activity),
+            'groups': GROUP_JSON.rows(groups)
         })
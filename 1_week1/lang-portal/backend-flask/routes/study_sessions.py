@@ -1,9 +1,96 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
 from datetime import datetime, UTC
+import json
 import math
 
+from lib.archive import ALL_REVIEWS_VIEW
+from lib.encoding import RowShape
+from lib.history import reset_history
+from lib.pagination import Keyset
+from lib.review_buffer import INSERT_REVIEW_SQL
+from lib.statements import definitions
+
+# Most reviews accepted by one call to the bulk review endpoint
+MAX_REVIEW_BATCH = 1000
+
+# JSON shape of a study session
+SESSION_JSON = RowShape(
+  id='id',
+  group_id='group_id',
+  group_name='group_name',
+  activity_id='activity_id',
+  activity_name='activity_name',
+  start_time='created_at',
+  end_time='end_time',
+  review_items_count='review_items_count'
+)
+
+# Sessions read straight off the created_at index. The end time and review
+# count are kept on study_sessions by a trigger.
+@definitions
+def define_statements(statements, language):
+  statements.define_keyset('study_sessions.list', '''
+    SELECT 
+      ss.id,
+      ss.group_id,
+      g.name as group_name,
+      sa.id as activity_id,
+      sa.name as activity_name,
+      ss.created_at,
+      COALESCE(ss.last_activity_at, ss.created_at) as end_time,
+      ss.review_items_count
+    FROM study_sessions ss
+    JOIN groups g ON g.id = ss.group_id
+    JOIN study_activities sa ON sa.id = ss.study_activity_id
+    WHERE {where}
+    ORDER BY {order_by}
+    LIMIT ? OFFSET ?
+  ''', {'created_at': 'ss.created_at'}, 'ss.id')
+
+# Validate one item of a bulk review submission and return the values to
+# insert: (word_id, correct, created_at). Raises ValueError with the reason.
+def parse_review_item(item):
+  if not isinstance(item, dict):
+    raise ValueError('Review must be an object')
+  if 'word_id' not in item or 'correct' not in item:
+    raise ValueError('word_id and correct fields are required')
+
+  word_id = item['word_id']
+  if isinstance(word_id, bool) or not isinstance(word_id, int):
+    raise ValueError('word_id must be an integer')
+  if item['correct'] not in (True, False, 0, 1):
+    raise ValueError('correct must be a boolean')
+
+  answered_at = item.get('answered_at')
+  if answered_at is not None:
+    try:
+      answered_at = datetime.fromisoformat(answered_at)
+    except (TypeError, ValueError):
+      raise ValueError('answered_at must be an ISO 8601 timestamp')
+    # Stored like CURRENT_TIMESTAMP: UTC, to the second
+    if answered_at.tzinfo is not None:
+      answered_at = answered_at.astimezone(UTC).replace(tzinfo=None)
+    answered_at = answered_at.strftime('%Y-%m-%d %H:%M:%S')
+
+  return word_id, bool(item['correct']), answered_at
+
 def load(app):
+  # Hand review rows to the write-behind buffer. With 'sync' durability this
+  # waits for the group commit that stores them, up to the buffer's
+  # wait_timeout. Returns the status code to answer with: 201 once stored,
+  # 202 if only queued (they are still written, so they must not be resent).
+  def submit_to_review_buffer(rows):
+    buffer = app.db.review_buffer
+    ticket = buffer.submit(rows)
+    if buffer.durability == 'buffered':
+      return 202
+    try:
+      ticket.wait(buffer.wait_timeout)
+    except TimeoutError:
+      return 202
+    return 201
+
    # todo /study_sessions POST
   @app.route('/api/study-sessions', methods=['POST'])
   @cross_origin()
@@ -68,6 +155,8 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Pass ?cursor=<next_cursor|prev_cursor> from a previous response to page by
+  # keyset instead of ?page=
   @app.route('/api/study-sessions', methods=['GET'])
   @cross_origin()
   def get_study_sessions():
@@ -78,55 +167,56 @@ def load(app):
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
       offset = (page - 1) * per_page
+      page_cursor = request.args.get('cursor')
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      # Newest sessions first
+      try:
+        keyset = Keyset('created_at', 'desc', 'ss.created_at', 'ss.id', page_cursor)
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
       # Get paginated sessions
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
-        LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      cursor.execute(
+        app.db.statements.keyset('study_sessions.list', keyset),
+        (*keyset.params(), per_page + 1, 0 if page_cursor else offset)
+      )
 
-      return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
-        'total': total_count,
-        'page': page,
+      sessions, next_cursor, prev_cursor = keyset.page(
+        cursor.fetchall(),
+        per_page,
+        key=lambda session: (session['created_at'], session['id']),
+        offset=0 if page_cursor else offset
+      )
+
+      result = {
+        'items': SESSION_JSON.rows(sessions),
         'per_page': per_page,
-        'total_pages': math.ceil(total_count / per_page)
-      })
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+      }
+
+      # Keyset pages only pay for the count when the client asks for it
+      if not page_cursor or request.args.get('with_total') in ('1', 'true'):
+        # Get total count
+        cursor.execute('''
+          SELECT COUNT(*) as count 
+          FROM study_sessions ss
+          JOIN groups g ON g.id = ss.group_id
+          JOIN study_activities sa ON sa.id = ss.study_activity_id
+        ''')
+        total_count = cursor.fetchone()['count']
+        result['total'] = total_count
+
+      if not page_cursor:
+        result['page'] = page
+        result['total_pages'] = math.ceil(total_count / per_page)
+
+      return jsonify(result)
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # The words of sessions older than the archive horizon (see lib.archive)
+  # are only listed with ?history=all
   @app.route('/api/study-sessions/<id>', methods=['GET'])
   @cross_origin()
   def get_study_session(id):
@@ -142,13 +232,12 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          COALESCE(ss.last_activity_at, ss.created_at) as end_time,
+          ss.review_items_count
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
         WHERE ss.id = ?
-        GROUP BY ss.id
       ''', (id,))
       
       session = cursor.fetchone()
@@ -159,52 +248,41 @@ def load(app):
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
       offset = (page - 1) * per_page
+      reviews = ALL_REVIEWS_VIEW if request.args.get('history') == 'all' else 'word_review_items'
 
       # Get the words reviewed in this session with their review status
-      cursor.execute('''
+      language = app.db.language
+      cursor.execute(f'''
         SELECT 
-          w.*,
+          w.id, {language.columns('w')},
           COALESCE(SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END), 0) as session_correct_count,
           COALESCE(SUM(CASE WHEN wri.correct = 0 THEN 1 ELSE 0 END), 0) as session_wrong_count
         FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
+        JOIN {reviews} wri ON wri.word_id = w.id
         WHERE wri.study_session_id = ?
         GROUP BY w.id
-        ORDER BY w.kanji
+        ORDER BY w.{language.default_sort}
         LIMIT ? OFFSET ?
       ''', (id, per_page, offset))
       
       words = cursor.fetchall()
 
       # Get total count of words
-      cursor.execute('''
+      cursor.execute(f'''
         SELECT COUNT(DISTINCT w.id) as count
         FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
+        JOIN {reviews} wri ON wri.word_id = w.id
         WHERE wri.study_session_id = ?
       ''', (id,))
       
       total_count = cursor.fetchone()['count']
 
       return jsonify({
-        'session': {
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
-        },
-        'words': [{
-          'id': word['id'],
-          'kanji': word['kanji'],
-          'romaji': word['romaji'],
-          'english': word['english'],
-          'correct_count': word['session_correct_count'],
-          'wrong_count': word['session_wrong_count']
-        } for word in words],
+        'session': SESSION_JSON.dict(session),
+        'words': language.word_shape(
+          correct_count='session_correct_count',
+          wrong_count='session_wrong_count'
+        ).rows(words),
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -238,12 +316,21 @@ def load(app):
             return jsonify({'error': 'word_id and correct fields are required'}), 400
 
         # Insert the word review
-        cursor.execute(
-            '''INSERT INTO word_review_items (word_id, study_session_id, correct)
-               VALUES (?, ?, ?)''',
-            (data['word_id'], id, data['correct'])
-        )
-        app.db.commit()
+        if app.db.review_buffer is not None:
+            # Check the word before queueing, a bad id would only fail inside
+            # the group commit
+            cursor.execute('SELECT 1 FROM words WHERE id = ?', (data['word_id'],))
+            if cursor.fetchone() is None:
+                return jsonify({'error': 'Word not found'}), 404
+            status = submit_to_review_buffer([(data['word_id'], id, data['correct'], None)])
+        else:
+            cursor.execute(
+                '''INSERT INTO word_review_items (word_id, study_session_id, correct)
+                   VALUES (?, ?, ?)''',
+                (data['word_id'], id, data['correct'])
+            )
+            app.db.commit()
+            status = 201
 
         # Return success response with the created review
         return jsonify({
@@ -251,23 +338,87 @@ def load(app):
             'study_session_id': int(id),  # Convert to integer
             'word_id': int(data['word_id']),  # Convert to integer
             'correct': bool(data['correct'])  # Ensure boolean
-        }), 201
+        }), status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+  # Record a batch of reviews in one request and one transaction.
+  # Body: [{"word_id": 1, "correct": true, "answered_at": "2025-01-01T10:00:00Z"}, ...]
+  # (or {"reviews": [...]}). Invalid items are reported by index and skipped,
+  # the valid ones are still recorded.
+  @app.route('/api/study-sessions/<int:id>/reviews', methods=['POST'])
+  @cross_origin()
+  def review_study_session_batch(id):
+    try:
+      if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+
+      data = request.get_json()
+      items = data.get('reviews') if isinstance(data, dict) else data
+      if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty array of reviews'}), 400
+      if len(items) > MAX_REVIEW_BATCH:
+        return jsonify({'error': f'At most {MAX_REVIEW_BATCH} reviews per request'}), 400
+
+      cursor = app.db.cursor()
+
+      cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
+      if cursor.fetchone() is None:
+        return jsonify({'error': 'Study session not found'}), 404
+
+      errors = []
+      reviews = []
+      for index, item in enumerate(items):
+        try:
+          reviews.append((index, parse_review_item(item)))
+        except ValueError as e:
+          errors.append({'index': index, 'error': str(e)})
+
+      # Check every word id in one query
+      cursor.execute('''
+        SELECT id FROM words
+        WHERE id IN (SELECT value FROM json_each(?))
+      ''', (json.dumps(list(set(review[0] for _, review in reviews))),))
+      known_words = set(row['id'] for row in cursor.fetchall())
+
+      rows = []
+      for index, (word_id, correct, answered_at) in reviews:
+        if word_id not in known_words:
+          errors.append({'index': index, 'error': 'Word not found'})
+          continue
+        rows.append((word_id, id, correct, answered_at))
+
+      if not rows:
+        return jsonify({'error': 'No valid reviews', 'errors': errors}), 400
+
+      # One transaction for the whole batch. The word_reviews and
+      # daily_activity triggers update the aggregates inside it.
+      if app.db.review_buffer is not None:
+        status = submit_to_review_buffer(rows)
+      else:
+        cursor.executemany(INSERT_REVIEW_SQL, rows)
+        app.db.commit()
+        status = 201
+
+      errors.sort(key=lambda error: error['index'])
+      return jsonify({
+        'message': 'Reviews recorded successfully',
+        'study_session_id': id,
+        'recorded': len(rows),
+        'errors': errors
+      }), status
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/api/study-sessions/reset', methods=['POST'])
   @cross_origin()
   def reset_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
-      # First delete all word review items since they have foreign key constraints
-      cursor.execute('DELETE FROM word_review_items')
-      
-      # Then delete all study sessions
-      cursor.execute('DELETE FROM study_sessions')
-      
-      app.db.commit()
+      # Swap in empty history tables and clear the counters and rollups
+      # derived from the history, in one transaction; the old tables are
+      # dropped in the background
+      reset_history(app.db)
+      app.db.reclaimer.schedule()
       
       return jsonify({"message": "Study history cleared successfully"}), 200
     except Exception as e:
@@ -2,13 +2,75 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.conditional import conditional
+from lib.pagination import Keyset
+from lib.search import match_expression
+from lib.statements import definitions
+
+# Most results a single search page returns
+MAX_SEARCH_RESULTS = 100
+
+# Sortable columns of the word listings (the word fields of the language plus
+# the review counters) and the expressions they sort on
+def sort_expressions(language):
+  expressions = {field: f'w.{field}' for field in language.word_fields}
+  expressions['correct_count'] = 'COALESCE(r.correct_count, 0)'
+  expressions['wrong_count'] = 'COALESCE(r.wrong_count, 0)'
+  return expressions
+
+@definitions
+def define_statements(statements, language):
+  # One extra row tells if there is a next page
+  statements.define_keyset('words.list', f'''
+    SELECT w.id, {language.columns('w')},
+        COALESCE(r.correct_count, 0) AS correct_count,
+        COALESCE(r.wrong_count, 0) AS wrong_count
+    FROM words w
+    LEFT JOIN word_reviews r ON w.id = r.word_id
+    WHERE {{where}}
+    ORDER BY {{order_by}}
+    LIMIT ? OFFSET ?
+  ''', sort_expressions(language), 'w.id')
+
+  # bm25 rank is lower for better matches
+  statements.define_keyset('words.search', f'''
+    SELECT w.id, {language.columns('w')},
+        COALESCE(r.correct_count, 0) AS correct_count,
+        COALESCE(r.wrong_count, 0) AS wrong_count,
+        words_fts.rank AS rank
+    FROM words_fts
+    JOIN words w ON w.id = words_fts.rowid
+    LEFT JOIN word_reviews r ON w.id = r.word_id
+    WHERE words_fts MATCH ? AND {{where}}
+    ORDER BY {{order_by}}
+    LIMIT ?
+  ''', {'rank': 'words_fts.rank'}, 'words_fts.rowid')
+
+  statements.define('words.get', f'''
+    SELECT w.id, {language.columns('w')},
+           COALESCE(r.correct_count, 0) AS correct_count,
+           COALESCE(r.wrong_count, 0) AS wrong_count,
+           GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
+    FROM words w
+    LEFT JOIN word_reviews r ON w.id = r.word_id
+    LEFT JOIN word_groups wg ON w.id = wg.word_id
+    LEFT JOIN groups g ON wg.group_id = g.id
+    WHERE w.id = ?
+    GROUP BY w.id
+  ''')
+
 def load(app):
   # Endpoint: GET /words with pagination (50 words per page)
+  # Pass ?cursor=<next_cursor|prev_cursor> from a previous response to page by
+  # keyset instead of ?page=, which stays fast on deep pages
   @app.route('/words', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews')
   def get_words():
     try:
       cursor = app.db.cursor()
+      language = app.db.language
+      sort_columns = sort_expressions(language)
 
       # Get the current page number from query parameters (default is 1)
       page = int(request.args.get('page', 1))
@@ -16,80 +78,117 @@ def load(app):
       page = max(1, page)
       words_per_page = 50
       offset = (page - 1) * words_per_page
+      page_cursor = request.args.get('cursor')
 
       # Get sorting parameters from the query string
-      sort_by = request.args.get('sort_by', 'kanji')  # Default to sorting by 'kanji'
+      sort_by = request.args.get('sort_by', language.default_sort)  # Default to sorting by the word itself
       order = request.args.get('order', 'asc')  # Default to ascending order
 
       # Validate sort_by and order
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
-        sort_by = 'kanji'
+      if sort_by not in sort_columns:
+        sort_by = language.default_sort
       if order not in ['asc', 'desc']:
         order = 'asc'
 
+      try:
+        keyset = Keyset(sort_by, order, sort_columns[sort_by], 'w.id', page_cursor)
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
       # Query to fetch words with sorting
-      cursor.execute(f'''
-        SELECT w.id, w.kanji, w.romaji, w.english, 
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
-
-      words = cursor.fetchall()
-
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
-
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      cursor.execute(
+        app.db.statements.keyset('words.list', keyset),
+        (*keyset.params(), words_per_page + 1, 0 if page_cursor else offset)
+      )
+
+      words, next_cursor, prev_cursor = keyset.page(
+        cursor.fetchall(),
+        words_per_page,
+        key=lambda word: (word[sort_by], word["id"]),
+        offset=0 if page_cursor else offset
+      )
+
+      result = {
+        "words": app.db.language.word_shape(correct_count='correct_count', wrong_count='wrong_count').rows(words),
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor
+      }
+
+      # Keyset pages skip the COUNT(*) unless the client asks for it
+      if not page_cursor or request.args.get('with_total') in ('1', 'true'):
+        # Query the total number of words
+        cursor.execute('SELECT COUNT(*) FROM words')
+        total_words = cursor.fetchone()[0]
+        result["total_words"] = total_words
+
+      if not page_cursor:
+        result["total_pages"] = (total_words + words_per_page - 1) // words_per_page
+        result["current_page"] = page
+
+      return jsonify(result)
+
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /words/search?q=<text> to find words as the user types.
+  # Every term matches as a prefix of a word in any word field of the
+  # language (ignoring accents), best matches first. Pass ?cursor=<next_cursor> from a
+  # previous response for the following page.
+  #
+  # The cursor keys on the bm25 rank, which depends on the whole words table
+  # (word count, average field length): once words are added, changed or
+  # removed between two pages, every rank moves, and the next page may skip
+  # or repeat results. Unlike the cursors of the listings, search cursors
+  # are only exact while the words stay the same.
+  @app.route('/words/search', methods=['GET'])
+  @cross_origin()
+  @conditional('words', 'word_reviews')
+  def search_words():
+    try:
+      cursor = app.db.cursor()
+
+      query = match_expression(request.args.get('q', ''))
+      if query is None:
+        return jsonify({"error": "Missing search query"}), 400
+
+      try:
+        limit = int(request.args.get('limit', 20))
+      except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+      limit = min(max(1, limit), MAX_SEARCH_RESULTS)
+
+      try:
+        keyset = Keyset('rank', 'asc', 'words_fts.rank', 'words_fts.rowid', request.args.get('cursor'))
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+      cursor.execute(app.db.statements.keyset('words.search', keyset), (query, *keyset.params(), limit + 1))
+
+      words, next_cursor, prev_cursor = keyset.page(
+        cursor.fetchall(),
+        limit,
+        key=lambda word: (word["rank"], word["id"])
+      )
 
       return jsonify({
-        "words": words_data,
-        "total_pages": total_pages,
-        "current_page": page,
-        "total_words": total_words
+        "words": app.db.language.word_shape(correct_count='correct_count', wrong_count='wrong_count').rows(words),
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor
       })
 
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
 
   # Endpoint: GET /words/:id to get a single word with its details
   @app.route('/words/<int:word_id>', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews', 'word_groups', 'groups')
   def get_word(word_id):
     try:
       cursor = app.db.cursor()
       
       # Query to fetch the word and its details
-      cursor.execute('''
-        SELECT w.id, w.kanji, w.romaji, w.english,
-               COALESCE(r.correct_count, 0) AS correct_count,
-               COALESCE(r.wrong_count, 0) AS wrong_count,
-               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        LEFT JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN groups g ON wg.group_id = g.id
-        WHERE w.id = ?
-        GROUP BY w.id
-      ''', (word_id,))
+      cursor.execute(app.db.statements.get('words.get'), (word_id,))
       
       word = cursor.fetchone()
       
@@ -106,17 +205,9 @@ def load(app):
             "name": group_name
           })
       
-      return jsonify({
-        "word": {
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"],
-          "groups": groups
-        }
-      })
+      result = app.db.language.word_shape(correct_count='correct_count', wrong_count='wrong_count').dict(word)
+      result["groups"] = groups
+      return jsonify({"word": result})
       
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,23 @@
+-- Indexes for the join and sort columns used by the routes.
+-- Without them every join below is a full table scan.
+
+-- /groups/<id>/words, /groups/<id>/words/raw (covering for the group's word ids)
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id ON word_groups(group_id, word_id);
+-- /words/<id> (groups of a word)
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id ON word_groups(word_id);
+
+-- Session detail, session listings and review counts
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items(study_session_id);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items(word_id);
+
+-- Per-word review counters joined into every word listing
+CREATE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id);
+
+-- Session listings (newest first) and their filters
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id ON study_sessions(group_id);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id ON study_sessions(study_activity_id);
+
+-- Sort columns of the word listings
+CREATE INDEX IF NOT EXISTS idx_words_french ON words(french);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words(english);
@@ -0,0 +1,41 @@
+-- words_fts is a full-text index over the words table for /words/search. It
+-- is an external content table: it stores only the index and reads the text
+-- back from words, and the triggers below keep it in step with every write.
+--
+-- remove_diacritics folds accents on both sides of a match, so "ete" finds
+-- "été", and the prefix indexes keep short typeahead prefixes from expanding
+-- over the whole term list.
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  french,
+  english,
+  content='words',
+  content_rowid='id',
+  tokenize='unicode61 remove_diacritics 2',
+  prefix='1 2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_words_fts_insert
+AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, french, english)
+  VALUES (NEW.id, NEW.french, NEW.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_fts_delete
+AFTER DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, french, english)
+  VALUES ('delete', OLD.id, OLD.french, OLD.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_fts_update
+AFTER UPDATE OF french, english ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, french, english)
+  VALUES ('delete', OLD.id, OLD.french, OLD.english);
+  INSERT INTO words_fts (rowid, french, english)
+  VALUES (NEW.id, NEW.french, NEW.english);
+END;
+
+-- Index the words that are already there
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
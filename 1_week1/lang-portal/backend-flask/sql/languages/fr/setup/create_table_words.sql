@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS words (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  french TEXT NOT NULL,
+  english TEXT NOT NULL
+);
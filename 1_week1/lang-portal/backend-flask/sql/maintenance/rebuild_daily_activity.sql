@@ -0,0 +1,26 @@
+-- Recompute the daily_activity rollup from study_sessions and the whole
+-- review history (word_review_items_all) in one pass
+DELETE FROM daily_activity;
+INSERT INTO daily_activity (study_date, group_id, sessions_count, reviews_count, correct_count)
+SELECT study_date, group_id, SUM(sessions_count), SUM(reviews_count), SUM(correct_count)
+FROM (
+  SELECT
+    date(created_at) AS study_date,
+    group_id,
+    COUNT(*) AS sessions_count,
+    0 AS reviews_count,
+    0 AS correct_count
+  FROM study_sessions
+  GROUP BY 1, 2
+  UNION ALL
+  SELECT
+    date(wri.created_at),
+    ss.group_id,
+    0,
+    COUNT(*),
+    SUM(wri.correct != 0)
+  FROM word_review_items_all wri
+  JOIN study_sessions ss ON ss.id = wri.study_session_id
+  GROUP BY 1, 2
+)
+GROUP BY study_date, group_id;
\ No newline at end of file
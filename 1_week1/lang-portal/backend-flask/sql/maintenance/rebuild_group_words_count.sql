@@ -0,0 +1,3 @@
+-- Recount the words of every group
+UPDATE groups
+SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id);
@@ -0,0 +1,10 @@
+-- Recompute the review count and time of the last review of every session,
+-- archived reviews included
+UPDATE study_sessions
+SET
+  review_items_count = (
+    SELECT COUNT(*) FROM word_review_items_all WHERE study_session_id = study_sessions.id
+  ),
+  last_activity_at = (
+    SELECT MAX(created_at) FROM word_review_items_all WHERE study_session_id = study_sessions.id
+  );
@@ -0,0 +1,53 @@
+-- Recompute the spaced repetition schedule (see
+-- migrations/0008_word_schedule.sql) by replaying the review history of every
+-- word in the order the reviews were written, like the trigger saw them.
+-- Archived reviews are included (word_review_items_all).
+DROP TABLE IF EXISTS temp.schedule_reviews;
+CREATE TEMP TABLE schedule_reviews (
+  word_id INTEGER NOT NULL,
+  n INTEGER NOT NULL,
+  correct INTEGER NOT NULL,
+  created_at DATETIME NOT NULL,
+  PRIMARY KEY (word_id, n)
+) WITHOUT ROWID;
+
+INSERT INTO temp.schedule_reviews (word_id, n, correct, created_at)
+SELECT
+  word_id,
+  ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY id),
+  correct != 0,
+  COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM word_review_items_all;
+
+DELETE FROM word_schedule;
+WITH RECURSIVE replay(word_id, n, repetitions, interval_days, ease, last_reviewed_at) AS (
+  SELECT word_id, 0, 0, 0.0, 2.5, NULL FROM temp.schedule_reviews WHERE n = 1
+  UNION ALL
+  SELECT
+    r.word_id,
+    r.n,
+    CASE WHEN r.correct THEN p.repetitions + 1 ELSE 0 END,
+    CASE
+      WHEN NOT r.correct OR p.repetitions = 0 THEN 1
+      WHEN p.repetitions = 1 THEN 6
+      ELSE ROUND(p.interval_days * p.ease)
+    END,
+    MAX(1.3, p.ease + CASE WHEN r.correct THEN 0.1 ELSE -0.32 END),
+    r.created_at
+  FROM replay p
+  JOIN temp.schedule_reviews r ON r.word_id = p.word_id AND r.n = p.n + 1
+)
+INSERT INTO word_schedule (word_id, repetitions, interval_days, ease, last_reviewed_at)
+SELECT word_id, repetitions, interval_days, ease, last_reviewed_at
+FROM replay p
+WHERE p.n = (SELECT MAX(n) FROM temp.schedule_reviews r WHERE r.word_id = p.word_id);
+
+UPDATE word_schedule SET next_due_at = datetime(last_reviewed_at, '+' || interval_days || ' days');
+
+DROP TABLE temp.schedule_reviews;
+
+DELETE FROM word_group_schedule;
+INSERT OR IGNORE INTO word_group_schedule (group_id, word_id, next_due_at)
+SELECT wg.group_id, wg.word_id, s.next_due_at
+FROM word_groups wg
+LEFT JOIN word_schedule s ON s.word_id = wg.word_id;
@@ -0,0 +1,3 @@
+-- Reindex every word from the words table, e.g. after rows were changed with
+-- the triggers missing
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
@@ -0,0 +1,59 @@
+-- Rollup of study activity per day and group, maintained by triggers on
+-- study_sessions and word_review_items. Streaks, recent activity and
+-- heatmaps read a handful of these rows instead of the whole history.
+CREATE TABLE IF NOT EXISTS daily_activity (
+  study_date DATE NOT NULL,  -- UTC date of the activity
+  group_id INTEGER NOT NULL,
+  sessions_count INTEGER NOT NULL DEFAULT 0,  -- Study sessions started that day
+  reviews_count INTEGER NOT NULL DEFAULT 0,  -- Words reviewed that day
+  correct_count INTEGER NOT NULL DEFAULT 0,  -- Of which answered correctly
+  PRIMARY KEY (study_date, group_id),
+  FOREIGN KEY (group_id) REFERENCES groups(id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_sessions_daily_activity
+AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO daily_activity (study_date, group_id, sessions_count)
+  VALUES (date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), NEW.group_id, 1)
+  ON CONFLICT(study_date, group_id) DO UPDATE SET
+    sessions_count = sessions_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_daily_activity
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO daily_activity (study_date, group_id, reviews_count, correct_count)
+  SELECT date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), group_id, 1, NEW.correct != 0
+  FROM study_sessions
+  WHERE id = NEW.study_session_id
+  ON CONFLICT(study_date, group_id) DO UPDATE SET
+    reviews_count = reviews_count + 1,
+    correct_count = correct_count + excluded.correct_count;
+END;
+
+-- Backfill from the existing history
+DELETE FROM daily_activity;
+INSERT INTO daily_activity (study_date, group_id, sessions_count, reviews_count, correct_count)
+SELECT study_date, group_id, SUM(sessions_count), SUM(reviews_count), SUM(correct_count)
+FROM (
+  SELECT
+    date(created_at) AS study_date,
+    group_id,
+    COUNT(*) AS sessions_count,
+    0 AS reviews_count,
+    0 AS correct_count
+  FROM study_sessions
+  GROUP BY 1, 2
+  UNION ALL
+  SELECT
+    date(wri.created_at),
+    ss.group_id,
+    0,
+    COUNT(*),
+    SUM(wri.correct != 0)
+  FROM word_review_items wri
+  JOIN study_sessions ss ON ss.id = wri.study_session_id
+  GROUP BY 1, 2
+)
+GROUP BY study_date, group_id;
\ No newline at end of file
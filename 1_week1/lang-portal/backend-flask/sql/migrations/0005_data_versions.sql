@@ -0,0 +1,16 @@
+-- data_versions holds a counter per table that goes up with every committed
+-- transaction that wrote to the table (directly or through a trigger). It is
+-- bumped by lib.db.Connection.commit() and lets read routes tell whether
+-- anything they depend on changed (see lib/conditional.py).
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL,
+  modified_at DATETIME NOT NULL
+) WITHOUT ROWID;
+
+-- Start every existing table at version 1, modified now, since anything may
+-- have changed before versions were tracked
+INSERT OR IGNORE INTO data_versions (table_name, version, modified_at)
+SELECT name, 1, CURRENT_TIMESTAMP
+FROM sqlite_master
+WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != 'data_versions';
@@ -0,0 +1,29 @@
+-- Every session listing shows when a session ended and how many words were
+-- reviewed in it. Both are kept on study_sessions by a trigger on
+-- word_review_items instead of being recomputed from the reviews per row.
+ALTER TABLE study_sessions ADD COLUMN last_activity_at DATETIME;  -- Time of the latest review, NULL until the first one
+ALTER TABLE study_sessions ADD COLUMN review_items_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_study_sessions
+AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE study_sessions
+  SET
+    review_items_count = review_items_count + 1,
+    last_activity_at = CASE
+      WHEN last_activity_at IS NULL OR last_activity_at < COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+      THEN COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+      ELSE last_activity_at
+    END
+  WHERE id = NEW.study_session_id;
+END;
+
+-- Backfill from the existing reviews
+UPDATE study_sessions
+SET
+  review_items_count = (
+    SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id
+  ),
+  last_activity_at = (
+    SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = study_sessions.id
+  );
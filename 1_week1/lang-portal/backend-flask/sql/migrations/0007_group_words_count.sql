@@ -0,0 +1,26 @@
+-- groups.words_count caches the number of word_groups rows of the group. The
+-- triggers below keep it exact on every insert, delete and move of a link, so
+-- /groups never has to count.
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_insert_words_count
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_delete_words_count
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_update_words_count
+AFTER UPDATE OF group_id ON word_groups
+WHEN OLD.group_id IS NOT NEW.group_id
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = COALESCE(words_count, 0) + 1 WHERE id = NEW.group_id;
+END;
+
+-- Start from the exact counts
+UPDATE groups
+SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id);
@@ -0,0 +1,132 @@
+-- Spaced repetition schedule (SM-2). word_schedule holds the state of every
+-- reviewed word and word_group_schedule copies its next due time onto each
+-- group the word is in, so the due words of a group are read in order off
+-- idx_word_group_schedule_due. Both are kept up to date by triggers, in the
+-- same statement (and transaction) as the review or link that changes them.
+--
+-- A review answers with quality 5 when correct and 2 when wrong:
+--   correct: repetitions + 1, the interval goes 1 day, 6 days, then
+--            interval * ease (rounded to days), ease + 0.1
+--   wrong:   repetitions back to 0, interval 1 day, ease - 0.32
+-- ease never drops below 1.3. Words never reviewed have no schedule and are
+-- due as new words.
+CREATE TABLE IF NOT EXISTS word_schedule (
+  word_id INTEGER PRIMARY KEY,
+  repetitions INTEGER NOT NULL DEFAULT 0,  -- Correct answers in a row
+  interval_days REAL NOT NULL DEFAULT 0,
+  ease REAL NOT NULL DEFAULT 2.5,
+  last_reviewed_at DATETIME,
+  next_due_at DATETIME,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+CREATE TABLE IF NOT EXISTS word_group_schedule (
+  group_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  next_due_at DATETIME,  -- NULL for words never reviewed
+  PRIMARY KEY (group_id, word_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_word_group_schedule_due ON word_group_schedule(group_id, next_due_at);
+CREATE INDEX IF NOT EXISTS idx_word_group_schedule_word_id ON word_group_schedule(word_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_word_schedule
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT OR IGNORE INTO word_schedule (word_id) VALUES (NEW.word_id);
+  UPDATE word_schedule SET
+    repetitions = CASE WHEN NEW.correct != 0 THEN repetitions + 1 ELSE 0 END,
+    interval_days = CASE
+      WHEN NEW.correct = 0 OR repetitions = 0 THEN 1
+      WHEN repetitions = 1 THEN 6
+      ELSE ROUND(interval_days * ease)
+    END,
+    ease = MAX(1.3, ease + CASE WHEN NEW.correct != 0 THEN 0.1 ELSE -0.32 END),
+    last_reviewed_at = COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+  WHERE word_id = NEW.word_id;
+  UPDATE word_schedule
+  SET next_due_at = datetime(last_reviewed_at, '+' || interval_days || ' days')
+  WHERE word_id = NEW.word_id;
+  UPDATE word_group_schedule
+  SET next_due_at = (SELECT next_due_at FROM word_schedule WHERE word_id = NEW.word_id)
+  WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_insert_word_schedule
+AFTER INSERT ON word_groups
+BEGIN
+  INSERT OR IGNORE INTO word_group_schedule (group_id, word_id, next_due_at)
+  VALUES (NEW.group_id, NEW.word_id, (SELECT next_due_at FROM word_schedule WHERE word_id = NEW.word_id));
+END;
+
+-- word_groups may link a word to a group more than once; the queue entry goes
+-- with the last link
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_delete_word_schedule
+AFTER DELETE ON word_groups
+WHEN NOT EXISTS (SELECT 1 FROM word_groups WHERE group_id = OLD.group_id AND word_id = OLD.word_id)
+BEGIN
+  DELETE FROM word_group_schedule WHERE group_id = OLD.group_id AND word_id = OLD.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_groups_update_word_schedule
+AFTER UPDATE OF group_id, word_id ON word_groups
+WHEN OLD.group_id IS NOT NEW.group_id OR OLD.word_id IS NOT NEW.word_id
+BEGIN
+  DELETE FROM word_group_schedule
+  WHERE group_id = OLD.group_id AND word_id = OLD.word_id
+    AND NOT EXISTS (SELECT 1 FROM word_groups WHERE group_id = OLD.group_id AND word_id = OLD.word_id);
+  INSERT OR IGNORE INTO word_group_schedule (group_id, word_id, next_due_at)
+  VALUES (NEW.group_id, NEW.word_id, (SELECT next_due_at FROM word_schedule WHERE word_id = NEW.word_id));
+END;
+
+-- Start from the review history so far (same replay as
+-- maintenance/rebuild_word_schedule.sql)
+DROP TABLE IF EXISTS temp.schedule_reviews;
+CREATE TEMP TABLE schedule_reviews (
+  word_id INTEGER NOT NULL,
+  n INTEGER NOT NULL,
+  correct INTEGER NOT NULL,
+  created_at DATETIME NOT NULL,
+  PRIMARY KEY (word_id, n)
+) WITHOUT ROWID;
+
+INSERT INTO temp.schedule_reviews (word_id, n, correct, created_at)
+SELECT
+  word_id,
+  ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY id),
+  correct != 0,
+  COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM word_review_items;
+
+DELETE FROM word_schedule;
+WITH RECURSIVE replay(word_id, n, repetitions, interval_days, ease, last_reviewed_at) AS (
+  SELECT word_id, 0, 0, 0.0, 2.5, NULL FROM temp.schedule_reviews WHERE n = 1
+  UNION ALL
+  SELECT
+    r.word_id,
+    r.n,
+    CASE WHEN r.correct THEN p.repetitions + 1 ELSE 0 END,
+    CASE
+      WHEN NOT r.correct OR p.repetitions = 0 THEN 1
+      WHEN p.repetitions = 1 THEN 6
+      ELSE ROUND(p.interval_days * p.ease)
+    END,
+    MAX(1.3, p.ease + CASE WHEN r.correct THEN 0.1 ELSE -0.32 END),
+    r.created_at
+  FROM replay p
+  JOIN temp.schedule_reviews r ON r.word_id = p.word_id AND r.n = p.n + 1
+)
+INSERT INTO word_schedule (word_id, repetitions, interval_days, ease, last_reviewed_at)
+SELECT word_id, repetitions, interval_days, ease, last_reviewed_at
+FROM replay p
+WHERE p.n = (SELECT MAX(n) FROM temp.schedule_reviews r WHERE r.word_id = p.word_id);
+
+UPDATE word_schedule SET next_due_at = datetime(last_reviewed_at, '+' || interval_days || ' days');
+
+DROP TABLE temp.schedule_reviews;
+
+DELETE FROM word_group_schedule;
+INSERT OR IGNORE INTO word_group_schedule (group_id, word_id, next_due_at)
+SELECT wg.group_id, wg.word_id, s.next_due_at
+FROM word_groups wg
+LEFT JOIN word_schedule s ON s.word_id = wg.word_id;
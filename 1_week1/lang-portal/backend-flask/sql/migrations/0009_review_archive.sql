@@ -0,0 +1,5 @@
+-- The whole review history: word_review_items plus the monthly archive
+-- tables lib/archive.py moves old reviews into. The view is recreated every
+-- time an archive table is added; it starts out as the hot table alone.
+CREATE VIEW IF NOT EXISTS word_review_items_all AS
+SELECT id, word_id, study_session_id, correct, created_at FROM word_review_items;
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version TEXT PRIMARY KEY,  -- File name of the migration in sql/migrations
+  applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  checksum TEXT  -- SHA-256 of the file as applied, see lib.migrations
+);
\ No newline at end of file
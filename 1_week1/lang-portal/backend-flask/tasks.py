@@ -1,9 +1,107 @@
 from invoke import task
-from lib.db import db
+from lib.db import Db, db
+from lib.languages import LANGUAGES
+
+# The Db of another language than the default one, served by the app when
+# listed in LANGUAGE_DATABASES, e.g. words_fr.db for 'fr'
+def language_db(lang, database):
+  if lang == db.language.code and database is None:
+    return db
+  return Db(database=database or f'words_{lang}.db', language=LANGUAGES[lang])
+
+@task(help={'lang': 'Language of the database (ja, fr)', 'database': 'Database file, words_<lang>.db by default'})
+def init_db(c, lang='ja', database=None):
+  from flask import Flask
+  app = Flask(__name__)
+  language_db(lang, database).init(app)
+  print("Database initialized successfully.")
+
+@task(help={
+  'lang': 'Language of the database (ja, fr)',
+  'database': 'Database file, words_<lang>.db by default',
+  'check': 'Only fail when migrations are pending or were changed after being applied'
+})
+def migrate(c, lang='ja', database=None, check=False):
+  from flask import Flask
+  from lib.migrations import check as check_migrations
+  app = Flask(__name__)
+  target = language_db(lang, database)
+  with app.app_context():
+    if check:
+      check_migrations(target, target.cursor())
+      print("Migrations are up to date.")
+      return
+    target.migrate(target.cursor())
+  print("Migrations applied successfully.")
+
+@task
+def rebuild_word_reviews(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.rebuild_word_reviews(db.cursor())
+  print("Word review counters rebuilt successfully.")
 
 @task
-def init_db(c):
+def rebuild_word_schedule(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.rebuild_word_schedule(db.cursor())
+  print("Word schedule rebuilt successfully.")
+
+@task(help={'days': 'Archive the reviews older than this many days'})
+def archive_reviews(c, days=None):
+  from flask import Flask
+  from lib.archive import DEFAULT_HORIZON_DAYS, archive_reviews as archive
+  app = Flask(__name__)
+  with app.app_context():
+    moved = archive(db, horizon_days=int(days) if days is not None else DEFAULT_HORIZON_DAYS)
+  for table, count in moved.items():
+    print(f"{table}: {count} reviews archived")
+  print("Reviews archived successfully." if moved else "No reviews to archive.")
+
+@task
+def reclaim_history(c):
+  db.reclaimer.run()
+  print("Study history reclaimed successfully.")
+
+# Rewrites the whole file, with the app stopped. Also switches databases
+# created before auto_vacuum was set to incremental vacuuming.
+@task
+def vacuum(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    connection = db.get()
+    connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    connection.execute('VACUUM')
+  print("Database vacuumed successfully.")
+
+@task
+def backfill_daily_activity(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.rebuild_daily_activity(db.cursor())
+  print("Daily activity rollup rebuilt successfully.")
+
+@task
+def rebuild_search_index(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.rebuild_words_fts(db.cursor())
+  print("Word search index rebuilt successfully.")
+
+@task(help={'repair': 'Write the recomputed values when a counter is wrong'})
+def check_counters(c, repair=False):
   from flask import Flask
+  from lib.counters import check_counters as check
   app = Flask(__name__)
-  db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  with app.app_context():
+    mismatches = check(db, repair=repair)
+  for name, count in mismatches.items():
+    print(f"{name}: {'ok' if count == 0 else f'{count} wrong rows'}")
+  if any(mismatches.values()):
+    print("Counters repaired." if repair else "Run with --repair to fix them.")
\ No newline at end of file
@@ -1,3 +1,21 @@
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) 
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) 
+
+import pytest
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:'
+    })
+
+    # Build the real schema (setup tables plus every migration)
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        app.db.migrate(cursor)
+
+    return app
@@ -0,0 +1,82 @@
+from datetime import datetime, UTC
+
+import pytest
+
+from lib.archive import archive_reviews, archive_tables
+from lib.counters import check_counters
+
+NOW = datetime(2025, 6, 1, tzinfo=UTC)
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1);
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES
+                (1, 1, '2025-01-10 09:00:00'), (1, 1, '2025-05-30 09:00:00');
+            INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES
+                (1, 1, 1, '2025-01-10 09:01:00'),
+                (2, 1, 0, '2025-01-10 09:02:00'),
+                (1, 1, 1, '2025-02-02 10:00:00'),
+                (2, 2, 1, '2025-05-30 09:01:00');
+        ''')
+        app.db.commit()
+    return app
+
+def query(app, sql):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute(sql)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def test_old_reviews_move_to_monthly_tables(seeded):
+    counters = query(seeded, 'SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id')
+
+    with seeded.app_context():
+        moved = archive_reviews(seeded.db, horizon_days=90, now=NOW)
+    assert moved == {'word_review_items_2025_01': 2, 'word_review_items_2025_02': 1}
+
+    assert query(seeded, 'SELECT id FROM word_review_items') == [(4,)]
+    assert query(seeded, 'SELECT id FROM word_review_items_2025_01 ORDER BY id') == [(1,), (2,)]
+    assert query(seeded, 'SELECT COUNT(*) FROM word_review_items_all') == [(4,)]
+    # The aggregates already hold the archived reviews
+    assert query(seeded, 'SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id') == counters
+
+    # Nothing left to move
+    with seeded.app_context():
+        assert archive_reviews(seeded.db, horizon_days=90, now=NOW) == {}
+        assert archive_tables(seeded.db.cursor()) == ['word_review_items_2025_01', 'word_review_items_2025_02']
+
+def test_rebuilds_read_the_archives(seeded):
+    with seeded.app_context():
+        archive_reviews(seeded.db, horizon_days=90, now=NOW)
+        assert set(check_counters(seeded.db).values()) == {0}
+
+    # A later month goes into the view too
+    with seeded.app_context():
+        archive_reviews(seeded.db, horizon_days=0, now=NOW)
+        assert set(check_counters(seeded.db).values()) == {0}
+    assert query(seeded, 'SELECT COUNT(*) FROM word_review_items') == [(0,)]
+    assert query(seeded, 'SELECT COUNT(*) FROM word_review_items_all') == [(4,)]
+
+def test_session_history_is_read_on_request(seeded):
+    with seeded.app_context():
+        archive_reviews(seeded.db, horizon_days=90, now=NOW)
+    client = seeded.test_client()
+
+    assert client.get('/api/study-sessions/1').get_json()['words'] == []
+    words = client.get('/api/study-sessions/1?history=all').get_json()['words']
+    assert [(word['kanji'], word['correct_count'], word['wrong_count']) for word in words] == [('犬', 2, 0), ('猫', 0, 1)]
+
+def test_reset_drops_the_archives(seeded):
+    with seeded.app_context():
+        archive_reviews(seeded.db, horizon_days=90, now=NOW)
+
+    assert seeded.test_client().post('/api/study-sessions/reset').status_code == 200
+    with seeded.app_context():
+        assert archive_tables(seeded.db.cursor()) == []
+    assert query(seeded, 'SELECT COUNT(*) FROM word_review_items_all') == [(0,)]
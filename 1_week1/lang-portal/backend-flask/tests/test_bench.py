@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from bench import datagen, driver
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('bench') / 'bench.db')
+    datagen.generate(path, words=300, groups=5, sessions=40, reviews=500, seed=7)
+    return path
+
+def test_generated_database(database):
+    connection = sqlite3.connect(database)
+    counts = {
+        table: connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        for table in ('words', 'groups', 'study_sessions', 'word_review_items', 'word_reviews')
+    }
+    words_counts = connection.execute('SELECT SUM(words_count) FROM groups').fetchone()[0]
+    links = connection.execute('SELECT COUNT(*) FROM word_groups').fetchone()[0]
+    connection.close()
+
+    assert counts['words'] == 300
+    assert counts['groups'] == 5
+    assert counts['study_sessions'] == 40
+    assert counts['word_review_items'] == 500
+    # Zipf skew: far fewer distinct words reviewed than reviews
+    assert counts['word_reviews'] < 300
+    assert words_counts == links
+
+def test_generate_is_reproducible(tmp_path):
+    paths = [str(tmp_path / f'{i}.db') for i in range(2)]
+    for path in paths:
+        datagen.generate(path, words=50, groups=3, sessions=10, reviews=100, seed=3)
+
+    def reviews(path):
+        connection = sqlite3.connect(path)
+        rows = connection.execute('SELECT word_id, study_session_id, correct FROM word_review_items ORDER BY id').fetchall()
+        connection.close()
+        return rows
+
+    assert reviews(paths[0]) == reviews(paths[1])
+
+def test_every_route_has_a_scenario():
+    from app import create_app
+    app = create_app({'TESTING': True, 'DATABASE': ':memory:'})
+
+    covered = set(driver.route_scenarios(app)) | set(driver.SKIPPED_ROUTES)
+    routes = {
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != 'static' and 'lang' not in rule.arguments
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    }
+    assert routes <= covered
+
+def test_run_reports_percentiles(database):
+    report = driver.run(database, mode='client', concurrency=2, requests_per_route=5, warmup=1)
+
+    assert report['meta']['mode'] == 'client'
+    assert report['total']['errors'] == 0
+    assert report['total']['requests'] == 5 * len(report['routes'])
+    # The /fr copies run against a French database of their own
+    assert 'GET /fr/words' in report['routes']
+    for result in report['routes'].values():
+        assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert driver.percentile(values, 0.5) == 50
+    assert driver.percentile(values, 0.99) == 99
+    assert driver.percentile([3], 0.95) == 3
+
+def test_app_reads_config_from_environment(monkeypatch):
+    from app import create_app
+    monkeypatch.setenv('LANG_PORTAL_DB_POOL_SIZE', '3')
+    app = create_app({'TESTING': True, 'DATABASE': ':memory:'})
+
+    assert app.config['DB_POOL_SIZE'] == 3
+    assert app.db.pool.size == 3
+
+def test_scale_on_gunicorn(database):
+    pytest.importorskip('gunicorn')
+    report = driver.scale(database, workers=[2, 1], concurrency_per_worker=2, requests_per_route=5, warmup=1, routes=['/groups', '/words'])
+
+    assert report['meta']['workers'] == [1, 2]
+    assert report['total'][1]['speedup'] == 1.0
+    assert all(report['total'][count]['errors'] == 0 for count in (1, 2))
+    assert set(report['routes']) == {'GET /groups', 'GET /words'}
@@ -0,0 +1,146 @@
+import pytest
+
+from lib.cache import ResultCache
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1, ['groups'], cache.generation())
+    cache.put('b', 2, ['groups'], cache.generation())
+    assert cache.get('a') == 1
+    cache.put('c', 3, ['groups'], cache.generation())
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('lib.cache.time.monotonic', lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put('a', 1, ['groups'], cache.generation())
+
+    now[0] = 109.0
+    assert cache.get('a') == 1
+    now[0] = 110.0
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_invalidation_by_table():
+    cache = ResultCache()
+    cache.put('groups', 1, ['groups'], cache.generation())
+    cache.put('launch', 2, ['groups', 'study_activities'], cache.generation())
+    cache.put('activities', 3, ['study_activities'], cache.generation())
+
+    cache.invalidate({'groups', 'word_groups'})
+
+    assert cache.get('groups') is None
+    assert cache.get('launch') is None
+    assert cache.get('activities') == 3
+    assert cache.stats()['invalidations'] == 2
+
+def test_value_computed_across_a_commit_is_not_kept():
+    cache = ResultCache()
+    generation = cache.generation()
+    cache.invalidate({'groups'})
+    cache.put('groups', 1, ['groups'], generation)
+
+    assert cache.get('groups') is None
+
+@pytest.fixture
+def client(app):
+    app.config['DEBUG_ENDPOINTS'] = True
+    import routes.debug
+    routes.debug.load(app)
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]');
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def group_queries(client, path):
+    connection = client.application.db.pool.acquire()
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        response = client.get(path)
+    finally:
+        connection.set_trace_callback(None)
+    assert response.status_code == 200
+    return response, [statement for statement in statements if 'FROM groups' in statement]
+
+def test_route_is_served_from_cache_until_its_tables_change(client):
+    first, queries = group_queries(client, '/groups')
+    assert queries
+
+    second, queries = group_queries(client, '/groups')
+    assert queries == []
+    assert second.get_json() == first.get_json()
+
+    # A write to an unrelated table keeps the entry
+    client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+    _, queries = group_queries(client, '/groups')
+    assert queries == []
+
+    with client.application.app_context():
+        client.application.db.cursor().execute("INSERT INTO groups (name) VALUES ('Group B')")
+        client.application.db.commit()
+
+    response, queries = group_queries(client, '/groups')
+    assert queries
+    assert len(response.get_json()['groups']) == 2
+
+def test_query_args_are_part_of_the_key(client):
+    client.get('/groups?sort_by=name&order=desc')
+    _, queries = group_queries(client, '/groups?order=desc&sort_by=name')
+    assert queries == []
+    _, queries = group_queries(client, '/groups?order=asc&sort_by=name')
+    assert queries
+
+def test_errors_are_not_cached(client):
+    assert client.get('/groups/999').status_code == 404
+    assert client.get('/groups/999').status_code == 404
+    assert client.application.result_cache.stats()['entries'] == 0
+
+def test_debug_endpoint_reports_counters(client):
+    client.get('/api/study-activities')
+    client.get('/api/study-activities')
+
+    stats = client.get('/_debug/cache').get_json()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+def test_commits_of_another_process_are_seen(tmp_path):
+    from app import create_app
+    database = str(tmp_path / 'words.db')
+    # Two workers serving the same database file
+    writer, reader = [create_app({'TESTING': True, 'DATABASE': database}) for _ in range(2)]
+    with writer.app_context():
+        cursor = writer.db.cursor()
+        writer.db.setup_tables(cursor)
+        writer.db.migrate(cursor)
+        cursor.execute("INSERT INTO groups (name) VALUES ('g1')")
+        writer.db.commit()
+
+    first = reader.test_client().get('/groups')
+    assert [group['group_name'] for group in first.get_json()['groups']] == ['g1']
+
+    with writer.app_context():
+        cursor = writer.db.cursor()
+        cursor.execute("INSERT INTO groups (name) VALUES ('g2')")
+        writer.db.commit()
+
+    expected = writer.test_client().get('/groups')
+    response = reader.test_client().get('/groups')
+    assert [group['group_name'] for group in response.get_json()['groups']] == ['g1', 'g2']
+    assert response.headers['ETag'] == expected.headers['ETag']
+    writer.db.pool.close()
+    reader.db.pool.close()
@@ -0,0 +1,100 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]');
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def test_get_sets_validators(client):
+    response = client.get('/words')
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+def test_matching_etag_is_not_modified_without_running_the_route(client):
+    etag = client.get('/groups').headers['ETag']
+
+    connection = client.application.db.pool.acquire()
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        response = client.get('/groups', headers={'If-None-Match': etag})
+    finally:
+        connection.set_trace_callback(None)
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+    assert len(statements) == 1 and 'data_versions' in statements[0]
+
+def test_etag_depends_on_query_string(client):
+    assert client.get('/words?sort_by=kanji').headers['ETag'] != client.get('/words?sort_by=english').headers['ETag']
+
+def test_writes_change_the_etag_of_routes_reading_the_table(client):
+    words_etag = client.get('/words').headers['ETag']
+    groups_etag = client.get('/groups').headers['ETag']
+
+    # The review only writes word_review_items; its trigger updates word_reviews
+    response = client.post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': True})
+    assert response.status_code < 400
+
+    response = client.get('/words', headers={'If-None-Match': words_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != words_etag
+    assert client.get('/groups', headers={'If-None-Match': groups_etag}).status_code == 304
+
+def test_negotiated_formats_have_their_own_etag(client):
+    json_response = client.get('/groups/1/words/raw')
+    assert json_response.headers['Vary'] == 'Accept'
+
+    ndjson = {'Accept': 'application/x-ndjson'}
+    response = client.get('/groups/1/words/raw', headers={**ndjson, 'If-None-Match': json_response.headers['ETag']})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    response = client.get('/groups/1/words/raw', headers={**ndjson, 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['Vary'] == 'Accept'
+
+def test_if_modified_since_is_not_trusted(client):
+    last_modified = client.get('/api/study-activities').headers['Last-Modified']
+
+    # A write in the same second leaves Last-Modified where it was
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.execute("INSERT INTO study_activities (name, url) VALUES ('Other Activity', 'http://localhost:8081')")
+        client.application.db.commit()
+
+    response = client.get('/api/study-activities', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+def test_errors_are_not_tagged(client):
+    response = client.get('/groups/999')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+def test_commit_reports_trigger_writes(app):
+    written = []
+    app.db.on_commit(written.append)
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute("INSERT INTO groups (name) VALUES ('Group A')")
+        cursor.execute("INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080')")
+        cursor.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+        app.db.commit()
+
+    assert {'groups', 'study_activities', 'study_sessions', 'daily_activity'} <= written[-1]
@@ -0,0 +1,77 @@
+import pytest
+
+from lib.counters import check_counters
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A'), ('Group B');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES
+                ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]'), ('鳥', 'tori', 'bird', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1), (3, 1), (3, 2);
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+            INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (1, 1, 1), (2, 1, 0);
+        ''')
+        app.db.commit()
+    return app
+
+def words_counts(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('SELECT words_count FROM groups ORDER BY id')
+        return [row[0] for row in cursor.fetchall()]
+
+def test_words_count_follows_word_groups(seeded):
+    assert words_counts(seeded) == [3, 1]
+
+    with seeded.app_context():
+        cursor = seeded.db.cursor()
+        cursor.execute('DELETE FROM word_groups WHERE word_id = 1')
+        cursor.execute('UPDATE word_groups SET group_id = 2 WHERE word_id = 2')
+        seeded.db.commit()
+
+    assert words_counts(seeded) == [1, 2]
+
+def test_consistent_counters_pass(seeded):
+    with seeded.app_context():
+        assert check_counters(seeded.db) == {
+            'groups.words_count': 0,
+            'word_reviews': 0,
+            'daily_activity': 0,
+            'study_sessions activity': 0,
+            'word_schedule': 0,
+            'word_group_schedule': 0
+        }
+
+def test_check_reports_and_repairs_drift(seeded):
+    with seeded.app_context():
+        cursor = seeded.db.cursor()
+        cursor.executescript('''
+            UPDATE groups SET words_count = 10;
+            UPDATE word_reviews SET correct_count = 5 WHERE word_id = 1;
+            DELETE FROM daily_activity;
+            UPDATE study_sessions SET review_items_count = 0, last_activity_at = NULL;
+            UPDATE word_schedule SET ease = 1.3 WHERE word_id = 2;
+            UPDATE word_group_schedule SET next_due_at = NULL;
+        ''')
+        seeded.db.commit()
+
+        expected = {
+            'groups.words_count': 2,
+            'word_reviews': 1,
+            'daily_activity': 1,
+            'study_sessions activity': 1,
+            'word_schedule': 1,
+            'word_group_schedule': 2
+        }
+        # Checking alone changes nothing
+        assert check_counters(seeded.db) == expected
+        assert check_counters(seeded.db) == expected
+
+        assert check_counters(seeded.db, repair=True) == expected
+        assert set(check_counters(seeded.db).values()) == {0}
+
+    assert words_counts(seeded) == [3, 1]
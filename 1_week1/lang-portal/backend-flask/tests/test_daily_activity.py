@@ -0,0 +1,86 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A'), ('Group B');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]');
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def add_session(app, group_id, days_ago, reviews=()):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('''
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+            VALUES (?, 1, datetime('now', ?))
+        ''', (group_id, f'-{days_ago} days'))
+        session_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO word_review_items (word_id, study_session_id, correct, created_at)
+            VALUES (1, ?, ?, datetime('now', ?))
+        ''', [(session_id, correct, f'-{days_ago} days') for correct in reviews])
+        app.db.commit()
+
+def rollup(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('''
+            SELECT julianday(date('now')) - julianday(study_date) AS days_ago,
+                   group_id, sessions_count, reviews_count, correct_count
+            FROM daily_activity
+            ORDER BY study_date, group_id
+        ''')
+        return [tuple(row) for row in cursor.fetchall()]
+
+def test_rollup_follows_inserts(client):
+    app = client.application
+    add_session(app, 1, 2, reviews=(True, False))
+    add_session(app, 1, 2, reviews=(True,))
+    add_session(app, 2, 0)
+
+    assert rollup(app) == [(2.0, 1, 2, 3, 2), (0.0, 2, 1, 0, 0)]
+
+def test_backfill_matches_incremental_rollup(client):
+    app = client.application
+    add_session(app, 1, 3, reviews=(True, True, False))
+    add_session(app, 2, 1, reviews=(False,))
+    incremental = rollup(app)
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('DELETE FROM daily_activity')
+        app.db.commit()
+        app.db.rebuild_daily_activity(cursor)
+
+    assert rollup(app) == incremental
+
+@pytest.mark.parametrize('days,streak', [
+    ((), 0),
+    ((0,), 1),
+    ((0, 1, 2), 3),
+    ((1, 2), 2),  # Not studied yet today, but the streak is still alive
+    ((0, 1, 3, 4, 5), 2),
+    ((2, 3), 0),
+])
+def test_current_streak(client, days, streak):
+    for days_ago in days:
+        add_session(client.application, 1, days_ago)
+
+    assert client.get('/dashboard/stats').get_json()['current_streak'] == streak
+
+def test_active_groups_and_sessions(client):
+    app = client.application
+    add_session(app, 1, 40)
+    add_session(app, 2, 10)
+    add_session(app, 2, 0)
+
+    stats = client.get('/dashboard/stats').get_json()
+    assert stats['active_groups'] == 1
+    assert stats['total_sessions'] == 3
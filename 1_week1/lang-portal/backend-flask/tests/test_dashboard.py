@@ -0,0 +1,153 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts)
+            VALUES
+                ('犬', 'inu', 'dog', '[]'),
+                ('猫', 'neko', 'cat', '[]'),
+                ('鳥', 'tori', 'bird', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1), (3, 1);
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def review(client, session_id, word_id, correct):
+    response = client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': word_id, 'correct': correct})
+    assert response.status_code == 201
+
+def test_recent_session_counts_only_its_reviews(client):
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.executescript('''
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES
+                (1, 1, '2025-01-01 10:00:00'), (1, 1, '2025-01-02 10:00:00');
+        ''')
+        client.application.db.commit()
+    review(client, 1, 1, True)
+    review(client, 2, 1, True)
+    review(client, 2, 2, False)
+
+    session = client.get('/dashboard/recent-session').get_json()
+    assert (session['id'], session['correct_count'], session['wrong_count']) == (2, 1, 1)
+
+def test_stats(client):
+    session_id = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['id']
+    for _ in range(5):
+        review(client, session_id, 1, True)
+    review(client, session_id, 2, False)
+
+    stats = client.get('/dashboard/stats').get_json()
+
+    assert stats == {
+        'total_vocabulary': 3,
+        'total_words_studied': 2,
+        'mastered_words': 1,
+        'success_rate': 5 / 6,
+        'total_sessions': 1,
+        'active_groups': 1,
+        'current_streak': 1
+    }
+
+def test_streak_and_active_groups_count_days_with_sessions(client):
+    app = client.application
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Old Group');
+            -- A streak of three days up to today, then a gap
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES
+                (1, 1, datetime('now')),
+                (1, 1, datetime('now', '-1 day')),
+                (1, 1, datetime('now', '-2 days')),
+                (1, 1, datetime('now', '-4 days')),
+                (1, 1, datetime('now', '-5 days')),
+                (2, 1, datetime('now', '-40 days'));
+            -- Reviewing an old session today makes neither its group active
+            -- nor its day part of the streak
+            INSERT INTO word_review_items (study_session_id, word_id, correct, created_at) VALUES
+                (6, 1, 1, datetime('now')),
+                (5, 1, 1, datetime('now', '-3 days'));
+        ''')
+        app.db.commit()
+
+    stats = client.get('/dashboard/stats').get_json()
+    assert (stats['current_streak'], stats['active_groups']) == (3, 1)
+
+def test_streak_ends_without_a_session_today_or_yesterday(client):
+    app = client.application
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES
+                (1, 1, datetime('now', '-2 days')),
+                (1, 1, datetime('now', '-3 days'));
+            INSERT INTO word_review_items (study_session_id, word_id, correct, created_at) VALUES
+                (1, 1, 1, datetime('now'));
+        ''')
+        app.db.commit()
+
+    stats = client.get('/dashboard/stats').get_json()
+    assert (stats['current_streak'], stats['active_groups']) == (0, 1)
+
+def test_stats_are_cached_until_the_history_changes(client):
+    app = client.application
+    client.get('/dashboard/stats')
+
+    # Every request shares the one in-memory connection
+    connection = app.db.pool.acquire()
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        stats = client.get('/dashboard/stats').get_json()
+    finally:
+        connection.set_trace_callback(None)
+
+    # Only the data version lookup of the conditional GET runs
+    assert [statement for statement in statements if 'data_versions' not in statement] == []
+    assert stats['total_sessions'] == 0
+
+    client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+    assert client.get('/dashboard/stats').get_json()['total_sessions'] == 1
+
+def test_cached_stats_follow_other_processes_and_the_day(tmp_path, monkeypatch):
+    from app import create_app
+    import lib.stats
+    database = str(tmp_path / 'words.db')
+    # Two workers serving the same database file
+    writer, reader = [create_app({'TESTING': True, 'DATABASE': database}) for _ in range(2)]
+    with writer.app_context():
+        cursor = writer.db.cursor()
+        writer.db.setup_tables(cursor)
+        writer.db.migrate(cursor)
+
+    client = reader.test_client()
+    assert client.get('/dashboard/stats').get_json()['total_vocabulary'] == 0
+
+    with writer.app_context():
+        cursor = writer.db.cursor()
+        cursor.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]')")
+        writer.db.commit()
+    assert client.get('/dashboard/stats').get_json()['total_vocabulary'] == 1
+
+    # A new day recomputes the value even though no data changed
+    # The request gets back the idle connection released last
+    connection = reader.db.pool.acquire()
+    statements = []
+    connection.set_trace_callback(statements.append)
+    reader.db.pool.release(connection)
+    monkeypatch.setattr(lib.stats, 'utc_today', lambda: '2999-01-01')
+    try:
+        client.get('/dashboard/stats')
+    finally:
+        connection.set_trace_callback(None)
+    assert any('current_streak' in statement for statement in statements)
+    writer.db.pool.close()
+    reader.db.pool.close()
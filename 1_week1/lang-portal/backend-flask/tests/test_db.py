@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import pytest
+from lib.db import Db
+
+def test_pool_reuses_connections(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'), pool_size=2)
+
+    first = db.pool.acquire()
+    db.pool.release(first)
+    second = db.pool.acquire()
+
+    assert first is second
+    db.pool.close()
+
+def test_pool_applies_pragmas_once(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'), pragmas={'cache_size': -2000})
+
+    connection = db.pool.acquire()
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert connection.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert connection.execute('PRAGMA cache_size').fetchone()[0] == -2000
+    db.pool.release(connection)
+    db.pool.close()
+
+def test_pool_is_bounded(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'), pool_size=1, pool_timeout=0.05)
+
+    connection = db.pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        db.pool.acquire()
+
+    # A connection released by another thread unblocks the waiter
+    threading.Timer(0.01, db.pool.release, (connection,)).start()
+    db.pool.timeout = 1.0
+    assert db.pool.acquire() is connection
+    db.pool.close()
+
+def test_pool_rolls_back_uncommitted_work(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'), pool_size=1)
+
+    connection = db.pool.acquire()
+    connection.execute('CREATE TABLE t (x INTEGER)')
+    connection.commit()
+    connection.execute('INSERT INTO t VALUES (1)')
+    db.pool.release(connection)
+
+    connection = db.pool.acquire()
+    assert connection.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    db.pool.close()
+
+def test_memory_database_is_shared_across_app_contexts():
+    from app import create_app
+    app = create_app({'TESTING': True, 'DATABASE': ':memory:'})
+
+    with app.app_context():
+        app.db.cursor().execute('CREATE TABLE t (x INTEGER)')
+        app.db.commit()
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('SELECT COUNT(*) FROM t')
+        assert cursor.fetchone()[0] == 0
+
+def test_commit_reports_written_tables(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'))
+    commits = []
+    db.on_commit(commits.append)
+
+    connection = db.pool.acquire()
+    cursor = connection.cursor()
+    cursor.execute('CREATE TABLE t (x INTEGER)')
+    cursor.execute('CREATE TABLE u (x INTEGER)')
+    cursor.execute('INSERT INTO t VALUES (1)')
+    cursor.execute('UPDATE u SET x = 2')
+    connection.commit()
+
+    cursor.execute('SELECT * FROM t')
+    connection.commit()
+
+    connection.execute('DELETE FROM u')
+    connection.rollback()
+    connection.commit()
+
+    assert commits == [{'t', 'u'}]
+    db.pool.release(connection)
+    db.pool.close()
+
+def test_schema_qualified_writes_are_tracked_by_table(tmp_path):
+    db = Db(database=str(tmp_path / 'pool.db'))
+    commits = []
+    db.on_commit(commits.append)
+
+    connection = db.pool.acquire()
+    cursor = connection.cursor()
+    cursor.execute('CREATE TABLE t (x INTEGER)')
+    cursor.execute('CREATE TEMP TABLE scratch (x INTEGER)')
+    cursor.execute('INSERT INTO temp.scratch VALUES (1)')
+    cursor.execute('INSERT INTO main."t" SELECT x FROM temp.scratch')
+    cursor.execute('DELETE FROM temp.scratch')
+    connection.commit()
+
+    assert commits == [{'t'}]
+    db.pool.release(connection)
+    db.pool.close()
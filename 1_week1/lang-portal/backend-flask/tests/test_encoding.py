@@ -0,0 +1,89 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from lib import encoding
+from lib.encoding import OrjsonProvider, RowShape, StdlibJSONProvider, json_provider
+
+@pytest.fixture
+def rows():
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    rows = connection.execute('''
+        SELECT 1 AS id, '食べる' AS kanji, 'taberu' AS romaji, 'to eat' AS english, 3 AS correct_count, 0 AS wrong_count
+        UNION ALL
+        SELECT 2, '見る', 'miru', 'to "see"', 0, 2
+    ''').fetchall()
+    connection.close()
+    return rows
+
+def test_row_shape_maps_columns_to_keys(rows):
+    shape = RowShape(id='id', word='kanji', misses='wrong_count')
+    assert shape.rows(rows) == [
+        {'id': 1, 'word': '食べる', 'misses': 0},
+        {'id': 2, 'word': '見る', 'misses': 2}
+    ]
+    assert RowShape(name='romaji').dict(rows[1]) == {'name': 'miru'}
+    assert shape.rows([]) == []
+
+def test_row_shape_follows_column_layout(rows):
+    shape = RowShape(id='id', word='kanji')
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    reordered = connection.execute("SELECT '犬' AS kanji, 7 AS id").fetchall()
+    missing = connection.execute('SELECT 7 AS id').fetchall()
+    connection.close()
+
+    assert shape.rows(rows)[0] == {'id': 1, 'word': '食べる'}
+    assert shape.rows(reordered) == [{'id': 7, 'word': '犬'}]
+    with pytest.raises(KeyError):
+        shape.rows(missing)
+
+def test_auto_prefers_orjson(app, monkeypatch):
+    pytest.importorskip('orjson')
+    assert isinstance(json_provider(app), OrjsonProvider)
+
+    monkeypatch.setattr(encoding, 'orjson', None)
+    assert type(json_provider(app)) is StdlibJSONProvider
+    with pytest.raises(ValueError):
+        json_provider(app, 'orjson')
+    with pytest.raises(ValueError):
+        json_provider(app, 'simplejson')
+
+def test_providers_encode_alike(app, rows):
+    pytest.importorskip('orjson')
+    payload = {
+        'words': rows,
+        'when': datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        'total': 2,
+        'next_cursor': None
+    }
+    with app.app_context():
+        bodies = [
+            provider(app).response(payload).get_data()
+            for provider in (StdlibJSONProvider, OrjsonProvider)
+        ]
+
+    assert json.loads(bodies[0]) == json.loads(bodies[1])
+    # Keys come out sorted either way
+    assert list(json.loads(bodies[1])) == ['next_cursor', 'total', 'when', 'words']
+    assert json.loads(bodies[1])['when'] == 'Thu, 02 Jan 2025 03:04:05 GMT'
+
+def test_routes_respond_the_same_with_either_encoder(app):
+    pytest.importorskip('orjson')
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute("INSERT INTO words (kanji, romaji, english, parts) VALUES ('猫', 'neko', 'cat', '[]')")
+        app.db.commit()
+
+    responses = []
+    for encoder in ('stdlib', 'orjson'):
+        app.json = json_provider(app, encoder)
+        response = app.test_client().get('/words')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        responses.append(response.get_json())
+    assert responses[0] == responses[1]
+    assert responses[1]['words'][0]['kanji'] == '猫'
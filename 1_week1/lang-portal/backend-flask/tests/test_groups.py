@@ -57,11 +57,59 @@ def test_get_group_words_raw_nonexistent_group(client):
         assert 'error' in data
         assert data['error'] == 'Group not found'
 
+def test_get_group_words_raw_ndjson(client):
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO words (kanji, romaji, english, parts)
+            VALUES
+                ('犬', 'inu', 'dog', '["animal", "friend"]'),
+                ('猫', 'neko', 'cat', '[
+  "animal",
+  "pet"
+]');
+            INSERT INTO word_groups (group_id, word_id) VALUES (1, 1), (1, 2);
+        ''')
+        client.application.db.commit()
+
+    for path, headers in (
+        ('/groups/1/words/raw?format=ndjson', {}),
+        ('/groups/1/words/raw', {'Accept': 'application/x-ndjson'})
+    ):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+
+        lines = response.get_data(as_text=True).splitlines()
+        words = [json.loads(line) for line in lines]
+        assert words == [
+            {'id': 1, 'kanji': '犬', 'romaji': 'inu', 'english': 'dog', 'parts': ['animal', 'friend']},
+            {'id': 2, 'kanji': '猫', 'romaji': 'neko', 'english': 'cat', 'parts': ['animal', 'pet']}
+        ]
+
+def test_get_group_words_raw_ndjson_nonexistent_group(client):
+    response = client.get('/groups/999/words/raw?format=ndjson')
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'Group not found'
+
+def test_get_group_words_raw_json_by_default(client):
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.execute("INSERT INTO groups (name) VALUES ('Test Group')")
+        client.application.db.commit()
+
+    response = client.get('/groups/1/words/raw', headers={'Accept': '*/*'})
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['words'] == []
+
 @pytest.fixture
 def client():
-    from app import app
-    app.config['TESTING'] = True
-    app.config['DATABASE'] = ':memory:'  # Use in-memory SQLite database for testing
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:'  # Use in-memory SQLite database for testing
+    })
     
     with app.test_client() as client:
         # Set up test database tables
@@ -0,0 +1,118 @@
+import pytest
+
+from lib.archive import archive_tables, archive_reviews
+from lib.counters import check_counters
+from lib.db import Db
+from lib.history import reset_history, trash_tables
+
+SEED = '''
+    INSERT INTO groups (name) VALUES ('Group A');
+    INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+    INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]');
+    INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1);
+    INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (1, 1, '2024-01-10 09:00:00'), (1, 1, CURRENT_TIMESTAMP);
+    INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES
+        (1, 1, 1, '2024-01-10 09:01:00'), (2, 2, 0, CURRENT_TIMESTAMP), (1, 2, 1, CURRENT_TIMESTAMP);
+'''
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript(SEED)
+        app.db.commit()
+        archive_reviews(app.db, horizon_days=30)
+    return app
+
+def query(app, sql):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute(sql)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def query_db(db, sql):
+    connection = db.pool.acquire()
+    try:
+        return tuple(connection.execute(sql).fetchone())
+    finally:
+        db.pool.release(connection)
+
+def schema(app):
+    return query(app, '''
+        SELECT type, name FROM sqlite_master
+        WHERE tbl_name IN ('study_sessions', 'word_review_items', 'word_review_items_all') ORDER BY type, name
+    ''')
+
+def test_reset_swaps_in_empty_history(seeded):
+    before = schema(seeded)
+    response = seeded.test_client().post('/api/study-sessions/reset')
+    assert response.status_code == 200
+
+    for table in ('word_review_items', 'word_review_items_all', 'study_sessions', 'word_reviews', 'daily_activity', 'word_schedule'):
+        assert query(seeded, f'SELECT COUNT(*) FROM {table}') == [(0,)], table
+    assert query(seeded, 'SELECT COUNT(*) FROM word_group_schedule WHERE next_due_at IS NOT NULL') == [(0,)]
+    # In memory the trash is dropped right away
+    with seeded.app_context():
+        assert archive_tables(seeded.db.cursor()) == []
+        assert trash_tables(seeded.db.cursor()) == []
+
+    # Same triggers, same indexes under new names
+    after = schema(seeded)
+    assert [row for row in after if row[0] != 'index'] == [row for row in before if row[0] != 'index']
+    assert [name for kind, name in after if kind == 'index'] == [
+        f'{name}__1' for kind, name in before if kind == 'index' and not name.startswith('sqlite_')
+    ]
+
+def test_history_works_after_resets(seeded):
+    client = seeded.test_client()
+    for _ in range(3):
+        assert client.post('/api/study-sessions/reset').status_code == 200
+        session = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()
+        assert client.post(f"/api/study-sessions/{session['id']}/review", json={'word_id': 1, 'correct': True}).status_code == 201
+
+    # Session ids carry on after a reset
+    assert session['id'] == 5
+    # The triggers are back on the fresh table
+    assert query(seeded, 'SELECT word_id, correct_count FROM word_reviews') == [(1, 1)]
+    assert query(seeded, 'SELECT review_items_count FROM study_sessions') == [(1,)]
+    with seeded.app_context():
+        assert set(check_counters(seeded.db).values()) == {0}
+
+def test_reset_is_atomic(seeded, monkeypatch):
+    monkeypatch.setattr('lib.history.CLEARED_TABLES', ['word_reviews', 'no_such_table'])
+    with seeded.app_context():
+        with pytest.raises(Exception):
+            reset_history(seeded.db)
+
+    assert query(seeded, 'SELECT COUNT(*) FROM word_review_items_all') == [(3,)]
+    assert query(seeded, 'SELECT COUNT(*) FROM study_sessions') == [(2,)]
+    with seeded.app_context():
+        assert trash_tables(seeded.db.cursor()) == []
+
+def test_trash_is_reclaimed_in_the_background(tmp_path):
+    db = Db(database=str(tmp_path / 'history.db'))
+    connection = db.pool.acquire()
+    cursor = connection.cursor()
+    db.setup_tables(cursor)
+    for filename in db.statements.files('migrations'):
+        cursor.executescript(db.sql('migrations/' + filename))
+    cursor.executescript(SEED)
+    cursor.executemany(
+        'INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (1, 2, ?)',
+        [(i % 2,) for i in range(20000)]
+    )
+    connection.commit()
+    db.pool.release(connection)
+    pages = query_db(db, 'PRAGMA page_count')[0]
+
+    from flask import Flask
+    with Flask(__name__).app_context():
+        trashed = reset_history(db)
+        db.reclaimer.schedule()
+    assert trashed == ['trash_1_study_sessions', 'trash_1_word_review_items']
+    db.reclaimer.join(timeout=10)
+
+    assert query_db(db, "SELECT COUNT(*) FROM sqlite_master WHERE name GLOB 'trash_*'") == (0,)
+    assert query_db(db, 'PRAGMA freelist_count') == (0,)
+    assert query_db(db, 'PRAGMA page_count')[0] < pages
+    db.pool.close()
@@ -0,0 +1,77 @@
+import json
+
+from lib.db import iter_json_array
+
+def write_words(path, words):
+    path.write_text(json.dumps(words, ensure_ascii=False, indent=2), encoding='utf-8')
+    return str(path)
+
+def make_words(count):
+    return [
+        {'kanji': f'語{i}', 'romaji': f'go{i}', 'english': f'word {i}', 'parts': [{'kanji': '語', 'romaji': ['go']}]}
+        for i in range(count)
+    ]
+
+def group_state(app, name):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('''
+            SELECT g.words_count, (SELECT COUNT(*) FROM word_groups wg WHERE wg.group_id = g.id)
+            FROM groups g WHERE g.name = ?
+        ''', (name,))
+        return tuple(cursor.fetchone())
+
+def test_iter_json_array_reads_across_blocks(tmp_path):
+    words = make_words(50)
+    path = write_words(tmp_path / 'words.json', words)
+
+    assert list(iter_json_array(path, block_size=7)) == words
+
+def test_iter_json_array_empty(tmp_path):
+    path = write_words(tmp_path / 'words.json', [])
+
+    assert list(iter_json_array(path)) == []
+
+def test_import_in_chunks(app, tmp_path):
+    path = write_words(tmp_path / 'words.json', make_words(25))
+
+    with app.app_context():
+        app.db.import_word_json(app.db.cursor(), 'Core Nouns', path, chunk_size=10)
+        cursor = app.db.cursor()
+        cursor.execute('SELECT parts FROM words WHERE romaji = ?', ('go3',))
+        parts = json.loads(cursor.fetchone()[0])
+
+    assert group_state(app, 'Core Nouns') == (25, 25)
+    assert parts == [{'kanji': '語', 'romaji': ['go']}]
+
+def test_import_is_idempotent(app, tmp_path):
+    path = write_words(tmp_path / 'words.json', make_words(12))
+
+    with app.app_context():
+        app.db.import_word_json(app.db.cursor(), 'Core Nouns', path, chunk_size=5)
+        app.db.import_word_json(app.db.cursor(), 'Core Nouns', path, chunk_size=5)
+        cursor = app.db.cursor()
+        cursor.execute('SELECT COUNT(*) FROM words')
+        words = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM groups')
+        groups = cursor.fetchone()[0]
+
+    assert words == 12
+    assert groups == 1
+    assert group_state(app, 'Core Nouns') == (12, 12)
+
+def test_import_shares_words_between_groups(app, tmp_path):
+    words = make_words(6)
+    first = write_words(tmp_path / 'first.json', words[:4])
+    second = write_words(tmp_path / 'second.json', words[2:] + words[2:3])
+
+    with app.app_context():
+        app.db.import_word_json(app.db.cursor(), 'First', first)
+        app.db.import_word_json(app.db.cursor(), 'Second', second)
+        cursor = app.db.cursor()
+        cursor.execute('SELECT COUNT(*) FROM words')
+        count = cursor.fetchone()[0]
+
+    assert count == 6
+    assert group_state(app, 'First') == (4, 4)
+    assert group_state(app, 'Second') == (4, 4)
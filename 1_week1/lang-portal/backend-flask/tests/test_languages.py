@@ -0,0 +1,74 @@
+import pytest
+
+from lib.languages import LANGUAGES
+from lib.pagination import Keyset
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:',
+        'LANGUAGE_DATABASES': {'fr': ':memory:'}
+    })
+
+    # Each language database gets its own schema and words
+    for db in app.db:
+        with app.app_context():
+            cursor = db.cursor()
+            db.setup_tables(cursor)
+            db.migrate(cursor)
+            db.import_word_json(cursor, 'Core Verbs', f'{db.language.seed_dir}/data_verbs.json')
+            db.commit()
+
+    yield app
+    for db in app.db:
+        db.pool.close()
+
+def test_language_prefix_picks_the_database(app):
+    client = app.test_client()
+
+    french = client.get('/fr/words?per_page=500').get_json()['words']
+    assert {'id', 'french', 'english', 'correct_count', 'wrong_count'} == set(french[0])
+    assert 'être' in [word['french'] for word in french]
+
+    # Unprefixed routes keep serving the default language
+    for path in ('/words', '/ja/words'):
+        japanese = client.get(path).get_json()['words']
+        assert 'kanji' in japanese[0] and 'french' not in japanese[0]
+
+def test_unknown_language_is_not_found(app):
+    assert app.test_client().get('/de/words').status_code == 404
+
+def test_language_search_and_groups(app):
+    client = app.test_client()
+
+    results = client.get('/fr/words/search?q=avoir').get_json()
+    assert [word['french'] for word in results['words']][:1] == ['avoir']
+
+    groups = client.get('/fr/groups').get_json()['groups']
+    words = client.get(f"/fr/groups/{groups[0]['id']}/words/raw").get_json()['words']
+    assert 'parts' not in words[0] and 'french' in words[0]
+
+def test_writes_stay_in_their_language(app):
+    client = app.test_client()
+    with app.app_context():
+        for db in app.db:
+            cursor = db.cursor()
+            cursor.execute("INSERT INTO study_activities (name, url) VALUES ('Flashcards', 'http://localhost:8080')")
+            db.commit()
+
+    response = client.post('/fr/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+    assert response.status_code == 201
+
+    assert client.get('/fr/api/study-sessions').get_json()['total'] == 1
+    assert client.get('/api/study-sessions').get_json()['total'] == 0
+
+def test_statements_are_built_per_language(app):
+    french = app.db.dbs['fr'].statements
+    assert french is not app.db.default.statements
+    assert 'w.french ASC' in french.keyset('words.list', Keyset('french', 'asc', 'w.french', 'w.id'))
+    assert 'french' in french.file('setup/create_table_words.sql')
+    assert 'kanji' in app.db.default.statements.file('setup/create_table_words.sql')
+    french.check()
+    assert LANGUAGES['fr'].word_shape() is LANGUAGES['fr'].word_shape()
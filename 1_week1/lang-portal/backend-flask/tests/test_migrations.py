@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+
+from lib import migrations
+from lib.db import Db
+from lib.migrations import MigrationError, checksum, split_statements
+
+@pytest.fixture
+def db(tmp_path):
+    db = Db(database=str(tmp_path / 'migrations.db'))
+    yield db
+    db.pool.close()
+
+@pytest.fixture
+def ctx():
+    from flask import Flask
+    with Flask(__name__).app_context():
+        yield
+
+def setup(db):
+    cursor = db.cursor()
+    db.setup_tables(cursor)
+    return cursor
+
+def test_migrations_are_applied_once_with_checksums(db, ctx):
+    cursor = setup(db)
+    applied = migrations.migrate(db, cursor)
+    assert applied == db.statements.files('migrations')
+
+    cursor.execute('SELECT version, checksum FROM schema_migrations ORDER BY version')
+    assert [tuple(row) for row in cursor.fetchall()] == [
+        (version, checksum(db.sql('migrations/' + version))) for version in applied
+    ]
+    assert migrations.migrate(db, cursor) == []
+    assert migrations.pending(db, cursor) == []
+    migrations.check(db, cursor)
+
+def test_changed_migration_is_refused(db, ctx):
+    cursor = setup(db)
+    migrations.migrate(db, cursor)
+    cursor.execute("UPDATE schema_migrations SET checksum = 'edited' WHERE version = '0002_word_reviews_aggregate.sql'")
+    db.commit()
+
+    with pytest.raises(MigrationError, match='0002_word_reviews_aggregate.sql was changed'):
+        migrations.migrate(db, cursor)
+
+    cursor.execute("INSERT INTO schema_migrations (version, checksum) VALUES ('9999_gone.sql', 'x')")
+    cursor.execute("UPDATE schema_migrations SET checksum = NULL")
+    db.commit()
+    with pytest.raises(MigrationError, match='9999_gone.sql has no file'):
+        migrations.check(db, cursor)
+
+def test_failed_migration_leaves_nothing_behind(db, ctx, monkeypatch):
+    cursor = setup(db)
+    files = db.statements._files
+    monkeypatch.setitem(files, 'migrations/9000_broken.sql', '''
+        CREATE TABLE half_done (id INTEGER);
+        INSERT INTO half_done VALUES (1);
+        SELECT * FROM no_such_table;
+    ''')
+
+    with pytest.raises(MigrationError, match='9000_broken.sql failed'):
+        migrations.migrate(db, cursor)
+
+    # The migrations before it are applied, nothing of the broken one
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'")
+    assert cursor.fetchone() is None
+    assert migrations.pending(db, cursor) == ['9000_broken.sql']
+
+def test_checksums_are_adopted_on_old_databases(db, ctx):
+    cursor = db.cursor()
+    cursor.executescript('''
+        CREATE TABLE schema_migrations (version TEXT PRIMARY KEY, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP);
+    ''')
+    db.setup_tables(cursor)
+    migrations.migrate(db, cursor)
+    cursor.execute("UPDATE schema_migrations SET checksum = NULL")
+    db.commit()
+
+    assert migrations.migrate(db, cursor) == []
+    cursor.execute('SELECT COUNT(*) FROM schema_migrations WHERE checksum IS NULL')
+    assert cursor.fetchone()[0] == 0
+
+def test_boot_checks_the_schema(tmp_path):
+    from app import create_app
+    database = str(tmp_path / 'boot.db')
+    connection = sqlite3.connect(database)
+    connection.execute('CREATE TABLE words (id INTEGER PRIMARY KEY)')
+    connection.close()
+
+    with pytest.raises(MigrationError, match='pending migrations'):
+        create_app({'DATABASE': database})
+
+    app = create_app({'DATABASE': database, 'MIGRATIONS': 'off'})
+    app.db.pool.close()
+
+def test_boot_can_apply_migrations(tmp_path):
+    from app import create_app
+    database = str(tmp_path / 'boot.db')
+    db = Db(database=database)
+    from flask import Flask
+    with Flask(__name__).app_context():
+        db.setup_tables(db.cursor())
+    db.pool.close()
+
+    app = create_app({'DATABASE': database, 'MIGRATIONS': 'apply'})
+    app.db.pool.close()
+    app = create_app({'DATABASE': database})
+    with app.app_context():
+        assert migrations.pending(app.db.default, app.db.cursor()) == []
+    app.db.pool.close()
+
+def test_statements_are_split_like_sqlite_does():
+    script = '''
+        -- a comment; with a semicolon
+        CREATE TABLE t (a TEXT DEFAULT ';');
+        CREATE TRIGGER tr AFTER INSERT ON t BEGIN
+          UPDATE t SET a = 'x;y';
+        END;
+        -- trailing comment
+    '''
+    statements = split_statements(script)
+    assert len(statements) == 2
+    assert statements[1].endswith('END;')
+
+def test_importing_the_app_ignores_the_local_database(tmp_path, monkeypatch):
+    import importlib
+    import app as app_module
+    connection = sqlite3.connect(str(tmp_path / 'words.db'))
+    connection.execute('CREATE TABLE words (id INTEGER PRIMARY KEY)')
+    connection.close()
+    monkeypatch.chdir(tmp_path)
+
+    module = importlib.reload(app_module)
+    with pytest.raises(MigrationError, match='pending migrations'):
+        module.migrate_databases(module.app)
+    module.app.db.pool.close()
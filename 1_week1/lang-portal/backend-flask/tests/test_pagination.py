@@ -0,0 +1,82 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute("INSERT INTO groups (name) VALUES ('Test Group')")
+        # 120 words with only 7 distinct kanji so the id tie-breaker matters
+        cursor.executemany(
+            'INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)',
+            [(f'字{i % 7}', f'ji{i}', f'word {i:03}', '[]') for i in range(120)]
+        )
+        cursor.execute('INSERT INTO word_groups (word_id, group_id) SELECT id, 1 FROM words')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def walk(client, url, key):
+    items = []
+    data = client.get(url).get_json()
+    items += data[key]
+    while data['next_cursor']:
+        separator = '&' if '?' in url else '?'
+        data = client.get(f"{url}{separator}cursor={data['next_cursor']}").get_json()
+        items += data[key]
+    return items, data
+
+def test_words_cursor_walk_matches_sort_order(client):
+    words, last_page = walk(client, '/words?sort_by=kanji&order=desc', 'words')
+
+    assert len(words) == 120
+    assert len(set(word['id'] for word in words)) == 120
+    keys = [(word['kanji'], word['id']) for word in words]
+    assert keys == sorted(keys, reverse=True)
+    # Keyset pages skip the total unless asked for
+    assert 'total_words' not in last_page
+
+def test_words_cursor_walk_backwards(client):
+    first = client.get('/words').get_json()
+    second = client.get(f"/words?cursor={first['next_cursor']}").get_json()
+    back = client.get(f"/words?cursor={second['prev_cursor']}").get_json()
+
+    assert first['prev_cursor'] is None
+    assert [word['id'] for word in back['words']] == [word['id'] for word in first['words']]
+    assert back['prev_cursor'] is None
+
+def test_page_numbers_still_work(client):
+    data = client.get('/words?page=3').get_json()
+
+    assert data['current_page'] == 3
+    assert data['total_pages'] == 3
+    assert data['total_words'] == 120
+    assert len(data['words']) == 20
+    assert data['next_cursor'] is None
+    assert data['prev_cursor'] is not None
+
+def test_group_words_cursor_walk(client):
+    words, last_page = walk(client, '/groups/1/words?sort_by=english', 'words')
+
+    assert [word['english'] for word in words] == [f'word {i:03}' for i in range(120)]
+
+def test_study_sessions_cursor_walk(client):
+    with client.application.app_context():
+        client.application.db.cursor().execute("INSERT INTO study_activities (name, url) VALUES ('Test', 'http://localhost')")
+        client.application.db.commit()
+    for _ in range(25):
+        response = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+        assert response.status_code == 201
+
+    sessions, last_page = walk(client, '/api/study-sessions?with_total=1', 'items')
+
+    assert [session['id'] for session in sessions] == list(range(25, 0, -1))
+    assert last_page['total'] == 25
+
+def test_invalid_cursor(client):
+    assert client.get('/words?cursor=not-a-cursor').status_code == 400
+
+def test_cursor_from_another_sort_is_rejected(client):
+    first = client.get('/words?sort_by=romaji').get_json()
+    response = client.get(f"/words?sort_by=english&cursor={first['next_cursor']}")
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:',
+        'DEBUG_ENDPOINTS': True,
+        'SQL_PROFILING': True,
+        'SQL_SLOW_MS': 1000
+    })
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        app.db.migrate(cursor)
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1);
+        ''')
+        app.db.commit()
+
+    return app
+
+def test_server_timing_header(app):
+    response = app.test_client().get('/words')
+
+    assert response.status_code == 200
+    assert response.headers['Server-Timing'].startswith('sql;dur=')
+
+def test_statements_are_aggregated_per_route(app):
+    client = app.test_client()
+    client.get('/words')
+    client.get('/words?page=2')
+
+    stats = client.get('/_debug/sql').get_json()
+    listing = next(s for s in stats['statements'] if s['sql'].startswith('SELECT w.id, w.kanji'))
+    assert listing['count'] == 2
+    assert listing['rows'] == 2
+    assert listing['routes'] == {'/words': 2}
+    assert sum(listing['histogram'].values()) == 2
+
+    client.post('/_debug/sql/reset')
+    assert client.get('/_debug/sql').get_json()['statements'] == []
+
+def test_streamed_queries_are_counted(app):
+    client = app.test_client()
+    response = client.get('/groups/1/words/raw?format=ndjson')
+    assert len(response.get_data(as_text=True).splitlines()) == 2
+
+    stats = client.get('/_debug/sql').get_json()
+    export = next(s for s in stats['statements'] if 'w.parts' in s['sql'] and s['sql'].startswith('SELECT w.id'))
+    assert export['rows'] == 2
+    assert export['routes'] == {'/groups/<int:id>/words/raw': 1}
+
+def test_slow_queries_are_logged_with_their_plan(app, caplog):
+    app.db.profiler.slow_ms = 0
+
+    with caplog.at_level(logging.WARNING, logger='lib.profiler'):
+        app.test_client().get('/groups/1')
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any('FROM groups WHERE id = ?' in message and 'SEARCH groups' in message for message in messages)
+
+def test_disabled_by_default():
+    from app import create_app
+    app = create_app({'TESTING': True, 'DATABASE': ':memory:', 'DEBUG_ENDPOINTS': True})
+
+    assert app.db.profiler is None
+    assert app.test_client().get('/_debug/sql').status_code == 404
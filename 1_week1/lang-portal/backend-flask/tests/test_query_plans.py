@@ -0,0 +1,163 @@
+import random
+import re
+import pytest
+
+# Query-plan guard: every route is run against a seeded database while the
+# SQL it executes is traced, then each statement goes through
+# EXPLAIN QUERY PLAN. A table that is read with a full SCAN instead of an
+# index SEARCH fails the test, unless the route lists it below with a reason.
+WORDS = 20000
+GROUPS = 20
+SESSIONS = 2000
+REVIEWS = 50000
+
+ROUTES = [
+    ('GET', '/words'),
+    ('GET', '/words?cursor={next_cursor}'),
+    ('GET', '/words/1'),
+    ('GET', '/words/search?q=kanji1'),
+    ('GET', '/words/search?q=kanji1&cursor={next_cursor}'),
+    ('GET', '/groups'),
+    ('GET', '/groups/1'),
+    ('GET', '/groups/1/words'),
+    ('GET', '/groups/1/words?cursor={next_cursor}'),
+    ('GET', '/groups/1/words/raw'),
+    ('GET', '/groups/1/words/raw?format=ndjson'),
+    ('GET', '/groups/1/due'),
+    ('GET', '/groups/1/study_sessions'),
+    ('GET', '/api/study-activities'),
+    ('GET', '/api/study-activities/1'),
+    ('GET', '/api/study-activities/1/sessions'),
+    ('GET', '/api/study-activities/1/launch'),
+    ('GET', '/api/study-sessions'),
+    ('GET', '/api/study-sessions?cursor={next_cursor}'),
+    ('GET', '/api/study-sessions/1'),
+    ('POST', '/api/study-sessions'),
+    ('POST', '/api/study-sessions/1/review'),
+    ('POST', '/api/study-sessions/1/reviews'),
+    ('GET', '/dashboard/recent-session'),
+    ('GET', '/dashboard/stats'),
+]
+
+# Table (or alias, as shown in the plan) -> why a scan of it is acceptable
+SMALL_TABLES = {
+    'groups': 'a handful of rows',
+    'study_activities': 'a handful of rows',
+}
+ALLOWED_SCANS = {
+    '/words': {
+        'w': 'ordered walk of idx_words_<sort_by> bounded by LIMIT',
+        'words': 'COUNT(*) for total_pages walks a covering index',
+    },
+    '/api/study-sessions': {
+        'ss': 'COUNT(*) for total_pages (skipped on keyset pages)',
+    },
+    '/dashboard/stats': {
+        'words': 'COUNT(*) of the vocabulary walks a covering index',
+        'word_reviews': 'one pass over the per-word counters on a cold cache',
+        'daily_activity': 'total sessions sums the rollup (one row per day and group)',
+    },
+}
+
+SCAN = re.compile(r'^SCAN (\w+)')
+CO_ROUTINE = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+@pytest.fixture(scope='module')
+def seeded_app():
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:'
+    })
+
+    rng = random.Random(42)
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        app.db.migrate(cursor)
+
+        cursor.executemany(
+            'INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)',
+            [(f'漢字{i}', f'kanji{i}', f'word {i}', '[]') for i in range(WORDS)]
+        )
+        cursor.executemany(
+            'INSERT INTO groups (name) VALUES (?)',
+            [(f'Group {i}',) for i in range(GROUPS)]
+        )
+        cursor.executemany(
+            'INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
+            [(i + 1, i % GROUPS + 1) for i in range(WORDS)]
+        )
+        cursor.execute('''
+            INSERT INTO study_activities (name, url, preview_url)
+            VALUES ('Typing Tutor', 'http://localhost:8080', NULL)
+        ''')
+        cursor.executemany(
+            'INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (?, 1, datetime(\'now\', ?))',
+            [(rng.randint(1, GROUPS), f'-{i} hours') for i in range(SESSIONS)]
+        )
+        cursor.executemany(
+            'INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (?, ?, ?)',
+            [(rng.randint(1, WORDS), rng.randint(1, SESSIONS), rng.random() < 0.7) for _ in range(REVIEWS)]
+        )
+        app.db.commit()
+
+    return app
+
+def full_scans(connection, statement):
+    scans = []
+    derived = set()
+    for row in connection.execute('EXPLAIN QUERY PLAN ' + statement):
+        detail = row['detail']
+        match = CO_ROUTINE.match(detail)
+        if match:
+            derived.add(match.group(1))
+            continue
+        # Virtual tables (json_each over request input, FTS indexes) report
+        # SCAN but do their own lookups
+        if 'VIRTUAL TABLE' in detail:
+            continue
+        match = SCAN.match(detail)
+        if match and match.group(1) not in derived:
+            scans.append((match.group(1), detail))
+    return scans
+
+@pytest.mark.parametrize('method,path', ROUTES)
+def test_route_queries_use_indexes(seeded_app, method, path):
+    allowed = dict(SMALL_TABLES, **ALLOWED_SCANS.get(path, {}))
+
+    # Keyset pages start from the cursor handed out by the first page
+    if '{next_cursor}' in path:
+        first_page = seeded_app.test_client().get(path.replace('cursor={next_cursor}', '').rstrip('?&'))
+        path = path.format(next_cursor=first_page.get_json()['next_cursor'])
+
+    with seeded_app.app_context():
+        connection = seeded_app.db.get()
+        statements = []
+        connection.set_trace_callback(statements.append)
+        try:
+            with seeded_app.test_client() as client:
+                if method == 'POST' and path.endswith('/reviews'):
+                    response = client.post(path, json=[{'word_id': word_id, 'correct': True} for word_id in range(1, 51)])
+                elif method == 'POST' and path.endswith('/review'):
+                    response = client.post(path, json={'word_id': 1, 'correct': True})
+                elif method == 'POST':
+                    response = client.post(path, json={'group_id': 1, 'study_activity_id': 1})
+                else:
+                    response = client.get(path)
+                # Streamed bodies only run their queries when read
+                response.get_data()
+        finally:
+            connection.set_trace_callback(None)
+
+        assert response.status_code < 400, response.data
+
+        offenders = []
+        for statement in statements:
+            if not re.match(r'\s*(SELECT|WITH|UPDATE|DELETE|INSERT)', statement, re.I):
+                continue
+            for table, detail in full_scans(connection, statement):
+                if table not in allowed:
+                    offenders.append(f'{detail}\n    in: {" ".join(statement.split())}')
+
+        assert not offenders, 'Full table scans in ' + path + ':\n' + '\n'.join(offenders)
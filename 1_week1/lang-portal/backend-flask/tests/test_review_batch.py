@@ -0,0 +1,67 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts)
+            VALUES
+                ('犬', 'inu', 'dog', '[]'),
+                ('猫', 'neko', 'cat', '[]');
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def query(app, sql):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute(sql)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def test_batch_records_all_reviews(client):
+    reviews = [{'word_id': 1, 'correct': True}] * 30 + [{'word_id': 2, 'correct': False}] * 20
+
+    response = client.post('/api/study-sessions/1/reviews', json=reviews)
+
+    assert response.status_code == 201
+    assert response.get_json()['recorded'] == 50
+    assert response.get_json()['errors'] == []
+    assert query(client.application, 'SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id') == [(1, 30, 0), (2, 0, 20)]
+    assert query(client.application, 'SELECT reviews_count, correct_count FROM daily_activity') == [(50, 30)]
+
+def test_batch_reports_invalid_items(client):
+    response = client.post('/api/study-sessions/1/reviews', json={'reviews': [
+        {'word_id': 1, 'correct': True},
+        {'word_id': 999, 'correct': True},
+        {'word_id': 2},
+        {'word_id': 2, 'correct': False, 'answered_at': 'yesterday'},
+        'nope',
+        {'word_id': 2, 'correct': False, 'answered_at': '2025-03-01T09:30:00+09:00'},
+    ]})
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['recorded'] == 2
+    assert [error['index'] for error in data['errors']] == [1, 2, 3, 4]
+    assert data['errors'][0]['error'] == 'Word not found'
+    assert query(client.application, 'SELECT word_id, created_at FROM word_review_items WHERE word_id = 2') == [(2, '2025-03-01 00:30:00')]
+
+def test_batch_with_no_valid_items(client):
+    response = client.post('/api/study-sessions/1/reviews', json=[{'word_id': 999, 'correct': True}])
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 0, 'error': 'Word not found'}]
+
+def test_batch_unknown_session(client):
+    response = client.post('/api/study-sessions/999/reviews', json=[{'word_id': 1, 'correct': True}])
+    assert response.status_code == 404
+
+@pytest.mark.parametrize('body', [{}, [], {'reviews': 'x'}, 42])
+def test_batch_malformed_body(client, body):
+    response = client.post('/api/study-sessions/1/reviews', json=body)
+    assert response.status_code == 400
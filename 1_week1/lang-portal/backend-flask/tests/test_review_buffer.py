@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+import pytest
+from lib.review_buffer import ReviewBuffer
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'words.db'),
+        'REVIEW_BUFFER_ENABLED': True,
+        'REVIEW_BUFFER_FLUSH_MS': 20
+    })
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        app.db.migrate(cursor)
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]');
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+        ''')
+        app.db.commit()
+
+    yield app
+    app.db.review_buffer.close()
+    app.db.pool.close()
+
+def counters(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id')
+        return [tuple(row) for row in cursor.fetchall()]
+
+def test_concurrent_reviews_are_group_committed(app):
+    buffer = app.db.review_buffer
+    tickets = []
+    lock = threading.Lock()
+
+    def learner(word_id):
+        for _ in range(20):
+            ticket = buffer.submit([(word_id, 1, word_id == 1, None)])
+            with lock:
+                tickets.append(ticket)
+
+    threads = [threading.Thread(target=learner, args=(1 + i % 2,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for ticket in tickets:
+        ticket.wait(timeout=5)
+
+    assert buffer.rows_written == 200
+    assert buffer.flushes < 200
+    assert counters(app) == [(1, 100, 0), (2, 0, 100)]
+
+def test_review_route_waits_for_the_commit(app):
+    client = app.test_client()
+
+    response = client.post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': True})
+    assert response.status_code == 201
+    response = client.post('/api/study-sessions/1/reviews', json=[{'word_id': 2, 'correct': False}] * 3)
+    assert response.status_code == 201
+
+    assert counters(app) == [(1, 1, 0), (2, 0, 3)]
+
+def test_failed_rows_do_not_drop_the_batch(app):
+    buffer = ReviewBuffer(app.db, flush_interval_ms=50)
+    good = buffer.submit([(1, 1, True, None)])
+    bad = buffer.submit([(None, 1, True, None)])  # word_id is NOT NULL
+
+    good.wait(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.wait(timeout=5)
+    buffer.close()
+
+    assert counters(app) == [(1, 1, 0)]
+
+def test_buffered_durability_acknowledges_before_the_commit(app):
+    app.db.review_buffer.close()
+    app.db.default.review_buffer = ReviewBuffer(app.db.default, flush_interval_ms=10000, durability='buffered')
+
+    response = app.test_client().post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': True})
+    assert response.status_code == 202
+    assert counters(app) == []
+
+    # Shutting down drains the queue
+    app.db.review_buffer.close()
+    assert counters(app) == [(1, 1, 0)]
+
+def test_sync_submitters_cannot_starve_the_flusher(tmp_path):
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'words.db'),
+        'DB_POOL_SIZE': 2,
+        'DB_POOL_TIMEOUT': 1.0,
+        'REVIEW_BUFFER_ENABLED': True,
+        'REVIEW_BUFFER_FLUSH_MS': 200
+    })
+    with app.app_context():
+        cursor = app.db.cursor()
+        app.db.setup_tables(cursor)
+        app.db.migrate(cursor)
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]');
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+        ''')
+        app.db.commit()
+
+    # Every pooled connection is held by a request waiting for the flush
+    statuses = []
+    def review():
+        response = app.test_client().post('/api/study-sessions/1/review', json={'word_id': 1, 'correct': True})
+        statuses.append(response.status_code)
+    threads = [threading.Thread(target=review) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert statuses == [201] * 3
+    app.db.review_buffer.close()
+    app.db.pool.close()
+
+def test_failed_flush_fails_its_tickets_and_recovers(app, monkeypatch):
+    buffer = ReviewBuffer(app.db, flush_interval_ms=10)
+    def broken():
+        raise sqlite3.OperationalError('unable to open database file')
+    monkeypatch.setattr(app.db.pool, 'connect', broken)
+    with pytest.raises(sqlite3.OperationalError):
+        buffer.submit([(1, 1, True, None)]).wait(timeout=5)
+
+    monkeypatch.undo()
+    buffer.submit([(1, 1, True, None)]).wait(timeout=5)
+    buffer.close()
+    assert buffer.rows_written == 1
+
+def test_unknown_word_is_refused_before_queueing(app):
+    response = app.test_client().post('/api/study-sessions/1/review', json={'word_id': 999, 'correct': True})
+    assert response.status_code == 404
+    assert app.db.review_buffer.flushes == 0
+
+def test_retried_batch_is_committed_once_and_reported(app, monkeypatch):
+    commits = []
+    app.db.on_commit(commits.append)
+    buffer = ReviewBuffer(app.db, flush_interval_ms=50)
+
+    # Nothing may be committed before Connection.commit runs
+    open_at_commit = []
+    connect = app.db.pool.connect
+    def spied_connect():
+        connection = connect()
+        commit = connection.commit
+        def spied_commit():
+            open_at_commit.append(connection.in_transaction)
+            commit()
+        connection.commit = spied_commit
+        return connection
+    monkeypatch.setattr(app.db.pool, 'connect', spied_connect)
+    good = buffer.submit([(1, 1, True, None)])
+    bad = buffer.submit([(None, 1, True, None)])
+
+    good.wait(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.wait(timeout=5)
+    buffer.close()
+
+    # The good reviews were committed through Connection.commit, which
+    # reports them and bumps their data versions
+    assert open_at_commit == [True]
+    assert len(commits) == 1 and 'word_review_items' in commits[0]
+    with app.app_context():
+        versions = app.db.data_versions(['word_review_items'])
+    assert versions['word_review_items'][0] > 0
+    assert counters(app) == [(1, 1, 0)]
@@ -0,0 +1,109 @@
+import pytest
+
+from lib.counters import check_counters
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A'), ('Group B');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES
+                ('犬', 'inu', 'dog', '[]'), ('猫', 'neko', 'cat', '[]'),
+                ('鳥', 'tori', 'bird', '[]'), ('魚', 'sakana', 'fish', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1), (3, 1), (4, 1), (1, 2);
+            INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1);
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def query(app, sql):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute(sql)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def review(client, *reviews):
+    response = client.post('/api/study-sessions/1/reviews', json=[
+        {'word_id': word_id, 'correct': correct, 'answered_at': answered_at}
+        for word_id, correct, answered_at in reviews
+    ])
+    assert response.status_code == 201
+
+def test_reviews_follow_sm2(client):
+    review(
+        client,
+        (1, True, '2025-01-01T10:00:00'),
+        (1, True, '2025-01-02T10:00:00'),
+        (1, True, '2025-01-08T10:00:00'),
+        (2, True, '2025-01-01T10:00:00'),
+        (2, False, '2025-01-02T10:00:00'),
+    )
+
+    assert query(client.application, '''
+        SELECT word_id, repetitions, interval_days, round(ease, 2), next_due_at FROM word_schedule ORDER BY word_id
+    ''') == [
+        (1, 3, 16.0, 2.8, '2025-01-24 10:00:00'),
+        (2, 0, 1.0, 2.28, '2025-01-03 10:00:00'),
+    ]
+    # Every group of the word gets the due time
+    assert query(client.application, '''
+        SELECT group_id, word_id, next_due_at FROM word_group_schedule WHERE word_id = 1 ORDER BY group_id
+    ''') == [(1, 1, '2025-01-24 10:00:00'), (2, 1, '2025-01-24 10:00:00')]
+
+def test_ease_has_a_floor(client):
+    review(client, *[(3, False, f'2025-01-{day:02d}T10:00:00') for day in range(1, 11)])
+    assert query(client.application, 'SELECT ease FROM word_schedule WHERE word_id = 3') == [(1.3,)]
+
+def test_due_words_come_before_new_ones(client):
+    review(
+        client,
+        (2, True, '2025-01-05T10:00:00'),
+        (1, True, '2025-01-01T10:00:00'),
+        (3, True, '2999-01-01T10:00:00'),
+    )
+
+    data = client.get('/groups/1/due?limit=3').get_json()
+    assert data['due_count'] == 2
+    # Longest overdue first, then never reviewed; 鳥 is not due yet
+    assert [word['kanji'] for word in data['words']] == ['犬', '猫', '魚']
+    assert data['words'][0]['next_due_at'] == '2025-01-02 10:00:00'
+    assert data['words'][2]['next_due_at'] is None
+
+    assert len(client.get('/groups/1/due?limit=1').get_json()['words']) == 1
+    assert client.get('/groups/2/due').get_json()['words'][0]['id'] == 1
+    assert client.get('/groups/99/due').status_code == 404
+
+def test_links_keep_the_queue_in_step(client):
+    review(client, (4, True, '2025-01-01T10:00:00'))
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (4, 2)')
+        cursor.execute('DELETE FROM word_groups WHERE word_id = 1 AND group_id = 2')
+        client.application.db.commit()
+
+    assert query(client.application, 'SELECT word_id, next_due_at FROM word_group_schedule WHERE group_id = 2') == [
+        (4, '2025-01-02 10:00:00')
+    ]
+
+def test_rebuild_replays_the_history(client):
+    review(client, *[(word_id % 4 + 1, word_id % 3 != 0, f'2025-02-{word_id % 28 + 1:02d}T08:00:00') for word_id in range(40)])
+    app = client.application
+    before = query(app, 'SELECT * FROM word_schedule ORDER BY word_id')
+
+    with app.app_context():
+        app.db.rebuild_word_schedule(app.db.cursor())
+        assert check_counters(app.db)['word_schedule'] == 0
+
+    assert query(app, 'SELECT * FROM word_schedule ORDER BY word_id') == before
+
+def test_reset_clears_the_schedule(client):
+    review(client, (1, True, '2025-01-01T10:00:00'))
+    assert client.post('/api/study-sessions/reset').status_code == 200
+
+    assert query(client.application, 'SELECT COUNT(*) FROM word_schedule') == [(0,)]
+    assert client.get('/groups/1/due').get_json()['due_count'] == 0
+    assert len(client.get('/groups/1/due').get_json()['words']) == 4
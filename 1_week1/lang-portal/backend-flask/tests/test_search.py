@@ -0,0 +1,73 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executemany(
+            'INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)',
+            [
+                ('食べる', 'taberu', 'to eat', '[]'),
+                ('食べ物', 'tabemono', 'food', '[]'),
+                ('飲む', 'nomu', 'to drink', '[]'),
+                ('東京', 'Tōkyō', 'Tokyo', '[]'),
+            ]
+        )
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def search(client, query, **params):
+    response = client.get('/words/search', query_string={'q': query, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def test_prefix_search(client):
+    ids = [word['id'] for word in search(client, 'tab')['words']]
+    assert sorted(ids) == [1, 2]
+
+def test_search_matches_kanji_and_english(client):
+    assert [word['romaji'] for word in search(client, '食べ物')['words']] == ['tabemono']
+    assert [word['kanji'] for word in search(client, 'dri')['words']] == ['飲む']
+
+def test_search_terms_are_anded(client):
+    assert [word['id'] for word in search(client, 'to ea')['words']] == [1]
+
+def test_search_ignores_diacritics(client):
+    assert [word['id'] for word in search(client, 'tokyo')['words']] == [4]
+    assert [word['id'] for word in search(client, 'tōk')['words']] == [4]
+
+def test_search_treats_fts_syntax_literally(client):
+    assert search(client, '"tab OR * NEAR(')['words'] == []
+
+def test_search_requires_a_query(client):
+    response = client.get('/words/search?q=%20')
+    assert response.status_code == 400
+
+def test_search_pages_with_cursor(client):
+    first = search(client, 'to', limit=1)
+    assert len(first['words']) == 1
+    assert first['prev_cursor'] is None
+
+    second = search(client, 'to', limit=1, cursor=first['next_cursor'])
+    assert second['next_cursor'] is not None
+    third = search(client, 'to', limit=1, cursor=second['next_cursor'])
+    assert third['next_cursor'] is None
+
+    ids = [page['words'][0]['id'] for page in (first, second, third)]
+    assert sorted(ids) == [1, 3, 4]
+
+    back = search(client, 'to', limit=1, cursor=second['prev_cursor'])
+    assert back['words'] == first['words']
+
+def test_search_index_follows_writes(client):
+    with client.application.app_context():
+        cursor = client.application.db.cursor()
+        cursor.execute("UPDATE words SET english = 'meal' WHERE id = 2")
+        cursor.execute('DELETE FROM words WHERE id = 3')
+        client.application.db.commit()
+
+    assert [word['id'] for word in search(client, 'meal')['words']] == [2]
+    assert search(client, 'food')['words'] == []
+    assert search(client, 'nomu')['words'] == []
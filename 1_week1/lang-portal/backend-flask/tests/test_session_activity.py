@@ -0,0 +1,88 @@
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Group A');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts) VALUES ('犬', 'inu', 'dog', '[]');
+            INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES
+                (1, 1, '2025-01-01 10:00:00'),
+                (1, 1, '2025-01-02 10:00:00');
+            INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES
+                (1, 1, 1, '2025-01-01 10:05:00'),
+                (1, 1, 0, '2025-01-01 10:20:00'),
+                (1, 1, 1, '2025-01-01 10:12:00');
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def test_reviews_maintain_session_activity(app, client):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('SELECT id, last_activity_at, review_items_count FROM study_sessions ORDER BY id')
+        sessions = [tuple(row) for row in cursor.fetchall()]
+
+    assert sessions == [
+        (1, '2025-01-01 10:20:00', 3),
+        (2, None, 0)
+    ]
+
+def test_group_sessions_use_the_stored_end_time(client):
+    sessions = client.get('/groups/1/study_sessions?sort_by=startTime&order=asc').get_json()['study_sessions']
+
+    assert [(s['id'], s['end_time'], s['review_items_count']) for s in sessions] == [
+        (1, '2025-01-01 10:20:00', 3),
+        (2, '2025-01-02 10:30:00', 0)  # No reviews: 30 minutes after the start
+    ]
+
+def test_session_listings_report_real_end_times(client):
+    items = client.get('/api/study-sessions').get_json()['items']
+    assert [(s['id'], s['end_time'], s['review_items_count']) for s in items] == [
+        (2, '2025-01-02 10:00:00', 0),
+        (1, '2025-01-01 10:20:00', 3)
+    ]
+
+    items = client.get('/api/study-activities/1/sessions').get_json()['items']
+    assert [(s['id'], s['end_time']) for s in items] == [(2, '2025-01-02 10:00:00'), (1, '2025-01-01 10:20:00')]
+
+    session = client.get('/api/study-sessions/1').get_json()['session']
+    assert (session['end_time'], session['review_items_count']) == ('2025-01-01 10:20:00', 3)
+
+def test_group_sessions_run_a_fixed_number_of_queries(app, client):
+    def statements_for(path):
+        connection = app.db.pool.acquire()
+        statements = []
+        connection.set_trace_callback(statements.append)
+        try:
+            assert client.get(path).status_code == 200
+        finally:
+            connection.set_trace_callback(None)
+        return [statement for statement in statements if 'data_versions' not in statement]
+
+    before = len(statements_for('/groups/1/study_sessions'))
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executemany(
+            'INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)',
+            [()] * 5
+        )
+        app.db.commit()
+
+    assert len(statements_for('/groups/1/study_sessions')) == before
+
+def test_sorting_by_end_time_and_review_count(client):
+    sessions = client.get('/groups/1/study_sessions?sort_by=endTime&order=desc').get_json()['study_sessions']
+    assert [s['id'] for s in sessions] == [2, 1]
+
+    sessions = client.get('/groups/1/study_sessions?sort_by=reviewItemsCount&order=desc').get_json()['study_sessions']
+    assert [s['id'] for s in sessions] == [1, 2]
+
+def test_invalid_order_is_ignored(client):
+    response = client.get('/groups/1/study_sessions?order=desc;DROP TABLE groups')
+    assert response.status_code == 200
@@ -0,0 +1,57 @@
+import shutil
+
+import pytest
+
+from lib.pagination import Keyset
+from lib.languages import LANGUAGES
+from lib.statements import SQL_DIR, Statements, StatementError, count_parameters, for_language
+
+statements = for_language(LANGUAGES['ja'])
+
+@pytest.fixture
+def registry(tmp_path):
+    # A registry over a copy of the real sql/ directory
+    shutil.copytree(SQL_DIR, tmp_path / 'sql')
+    return Statements(LANGUAGES['ja'], root=str(tmp_path / 'sql'))
+
+def test_sql_files_are_read_once(app, monkeypatch):
+    text = app.db.sql('setup/create_table_words.sql')
+
+    def no_open(*args, **kwargs):
+        raise AssertionError('sql() read a file')
+    monkeypatch.setattr('builtins.open', no_open)
+
+    assert app.db.sql('setup/create_table_words.sql') == text
+    with pytest.raises(FileNotFoundError):
+        app.db.sql('setup/missing.sql')
+
+def test_migrations_are_listed_in_order():
+    migrations = statements.files('migrations')
+    assert migrations == sorted(migrations)
+    assert migrations[0] == '0001_add_indexes.sql'
+
+def test_every_registered_statement_prepares():
+    assert len(statements) > 0
+    statements.check()
+
+def test_keyset_variants_are_prebuilt():
+    first = Keyset('kanji', 'asc', 'w.kanji', 'w.id')
+    sql = statements.keyset('words.list', first)
+    assert '1 = 1' in sql and 'w.kanji ASC, w.id ASC' in sql
+    # The same page always gets the very same statement text
+    assert statements.keyset('words.list', Keyset('kanji', 'asc', 'w.kanji', 'w.id')) is sql
+
+def test_sorted_variants_cover_both_orders():
+    assert 'ORDER BY words_count DESC' in statements.get('groups.list', 'words_count', 'desc')
+    with pytest.raises(KeyError):
+        statements.get('groups.list', 'id; DROP TABLE groups', 'asc')
+
+def test_broken_statement_fails_check(registry):
+    registry.define('ok', 'SELECT id FROM words WHERE id = ?')
+    registry.check()
+    registry.define_sorted('broken', 'SELECT id FROM words ORDER BY {order_by}', {'missing': 'no_such_column'})
+    with pytest.raises(StatementError, match="broken"):
+        registry.check()
+
+def test_count_parameters_ignores_literals():
+    assert count_parameters("SELECT '?', \"a?\" FROM t -- ?\nWHERE a = ? AND b = ?") == 2
@@ -94,9 +94,11 @@ def test_review_study_session_missing_fields(client):
 
 @pytest.fixture
 def client():
-    from app import app
-    app.config['TESTING'] = True
-    app.config['DATABASE'] = ':memory:'  # Use in-memory SQLite database for testing
+    from app import create_app
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': ':memory:'  # Use in-memory SQLite database for testing
+    })
     
     with app.test_client() as client:
         # Set up test database tables
@@ -0,0 +1,81 @@
+import json
+import pytest
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.executescript('''
+            INSERT INTO groups (name) VALUES ('Test Group');
+            INSERT INTO study_activities (name, url) VALUES ('Test Activity', 'http://localhost:8080');
+            INSERT INTO words (kanji, romaji, english, parts)
+            VALUES
+                ('犬', 'inu', 'dog', '[]'),
+                ('猫', 'neko', 'cat', '[]');
+            INSERT INTO word_groups (word_id, group_id) VALUES (1, 1), (2, 1);
+        ''')
+        app.db.commit()
+
+    with app.test_client() as client:
+        yield client
+
+def create_session(client):
+    response = client.post('/api/study-sessions', json={'group_id': 1, 'study_activity_id': 1})
+    return json.loads(response.data)['id']
+
+def word_counts(client, word_id):
+    word = json.loads(client.get(f'/words/{word_id}').data)['word']
+    return word['correct_count'], word['wrong_count']
+
+def test_review_updates_word_counters(client):
+    session_id = create_session(client)
+
+    for correct in (True, True, False):
+        response = client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': 1, 'correct': correct})
+        assert response.status_code == 201
+
+    assert word_counts(client, 1) == (2, 1)
+    assert word_counts(client, 2) == (0, 0)
+
+def test_rebuild_word_reviews_matches_incremental_counters(client, app):
+    session_id = create_session(client)
+    for word_id, correct in ((1, True), (2, False), (2, False), (1, False)):
+        client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': word_id, 'correct': correct})
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        cursor.execute('SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id')
+        incremental = [tuple(row) for row in cursor.fetchall()]
+
+        # Corrupt the counters, then rebuild them from the review history
+        cursor.execute('UPDATE word_reviews SET correct_count = 99')
+        app.db.commit()
+        app.db.rebuild_word_reviews(cursor)
+
+        cursor.execute('SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id')
+        assert [tuple(row) for row in cursor.fetchall()] == incremental == [(1, 1, 1), (2, 0, 2)]
+
+def test_reset_clears_word_counters(client):
+    session_id = create_session(client)
+    client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': 1, 'correct': True})
+
+    response = client.post('/api/study-sessions/reset')
+    assert response.status_code == 200
+    assert word_counts(client, 1) == (0, 0)
+
+def test_failed_rebuild_leaves_the_counters_alone(client, app):
+    session_id = create_session(client)
+    client.post(f'/api/study-sessions/{session_id}/review', json={'word_id': 1, 'correct': True})
+
+    with app.app_context():
+        cursor = app.db.cursor()
+        # Fail the repopulating INSERT, after the DELETE ran
+        cursor.execute('''
+            CREATE TEMP TRIGGER fail_rebuild BEFORE INSERT ON word_reviews
+            BEGIN SELECT RAISE(ABORT, 'rebuild failed'); END
+        ''')
+        with pytest.raises(Exception, match='rebuild failed'):
+            app.db.rebuild_word_reviews(cursor)
+        cursor.execute('DROP TRIGGER temp.fail_rebuild')
+
+    assert word_counts(client, 1) == (1, 0)
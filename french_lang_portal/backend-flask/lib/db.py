@@ -59,6 +59,25 @@ class Db:
     cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
     self.get().commit()
 
+    cursor.executescript(self.sql('setup/create_trigger_word_reviews.sql'))
+    self.get().commit()
+
+  # Recompute the word_reviews counters from the review history in one pass.
+  # Also installs the trigger that keeps them exact on databases created
+  # before it existed. All in one transaction, so nobody sees the counters
+  # emptied by the DELETE before the INSERT refilled them.
+  def rebuild_word_reviews(self, cursor):
+    try:
+      cursor.executescript(
+        'BEGIN IMMEDIATE;\n'
+        + self.sql('maintenance/rebuild_word_reviews.sql') + ';\n'
+        + self.sql('setup/create_trigger_word_reviews.sql')
+      )
+      self.get().commit()
+    except Exception:
+      self.get().rollback()
+      raise
+
   def import_study_activities_json(self,cursor,data_json_path):
     study_actvities = self.load_json(data_json_path)
     for activity in study_actvities:
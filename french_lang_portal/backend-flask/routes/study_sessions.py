@@ -217,33 +217,11 @@ def load(app):
     if not cursor.fetchone():
         return jsonify({"error": "Study session not found"}), 404
 
-    # Insert the individual review attempt into word_review_items
+    # Insert the individual review attempt into word_review_items.
+    # The word_reviews counters are updated by a trigger in the same statement.
     cursor.execute('''
         INSERT INTO word_review_items (word_id, correct, study_session_id) VALUES (?, ?, ?)
     ''', (word_id, correct, id))
-    
-    # Update or insert aggregate review record in word_reviews
-    cursor.execute('''
-        SELECT * FROM word_reviews WHERE word_id = ?
-    ''', (word_id,))
-    review = cursor.fetchone()
-
-    if review:
-        # Update existing record
-        if correct:
-            cursor.execute('''
-           UPDATE word_reviews SET correct_count = correct_count + 1, last_reviewed = ? WHERE word_id = ?
-            ''', (datetime.now(), word_id))
-        else:
-            cursor.execute('''
-                UPDATE word_reviews SET wrong_count = wrong_count + 1, last_reviewed = ? WHERE word_id = ?
-            ''', (datetime.now(), word_id))
-    else:
-        # Insert new record
-        cursor.execute('''
-            INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
-            VALUES (?, ?, ?, ?)
-        ''', (word_id, 1 if correct else 0, 0 if correct else 1, datetime.now()))
 
     app.db.commit()
     return jsonify({"message": "Review logged successfully"})
@@ -259,6 +237,9 @@ def load(app):
       
       # Then delete all study sessions
       cursor.execute('DELETE FROM study_sessions')
+
+      # The per-word counters are derived from the deleted reviews
+      cursor.execute('DELETE FROM word_reviews')
       
       app.db.commit()
       
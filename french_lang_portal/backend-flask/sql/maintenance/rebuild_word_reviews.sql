@@ -0,0 +1,10 @@
+-- Recompute every word_reviews row from word_review_items in one pass
+DELETE FROM word_reviews;
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+SELECT
+  word_id,
+  SUM(correct != 0),
+  SUM(correct = 0),
+  COALESCE(MAX(created_at), CURRENT_TIMESTAMP)
+FROM word_review_items
+GROUP BY word_id;
\ No newline at end of file
@@ -0,0 +1,20 @@
+-- word_reviews holds one row of review counters per word. It is kept exact by
+-- a trigger on word_review_items, so every review write updates it in the same
+-- statement (and transaction) as the review itself.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_word_reviews
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (
+    NEW.word_id,
+    NEW.correct != 0,
+    NEW.correct = 0,
+    COALESCE(NEW.created_at, CURRENT_TIMESTAMP)
+  )
+  ON CONFLICT(word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = excluded.last_reviewed;
+END;
\ No newline at end of file
@@ -6,4 +6,12 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task
+def rebuild_word_reviews(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.rebuild_word_reviews(db.cursor())
+  print("Word review counters rebuilt successfully.")
\ No newline at end of file